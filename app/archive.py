@@ -0,0 +1,391 @@
+# time_management/app/archive.py
+"""
+Cold storage for old attendance events.
+
+`python -m app.archive` moves every whole UTC month that ended more than
+ARCHIVE_HORIZON_DAYS ago out of attendance_events into a zstd-compressed
+Parquet file in ARCHIVE_DIR (attendance_events_YYYY-MM.parquet) and records
+it in manifest.json (rows, time range, checksum). A month is written and
+fsynced before its rows are deleted, so a crash in between leaves the rows
+in both places; readers drop the duplicates by event id. Rows that show up
+later in an archived month (back-dated corrections) are merged into the
+month's file on the next run. On a partitioned table (app.partitions) a
+month partition emptied by the archiver is detached and dropped.
+
+Readers: the report engines and the exports call archive_store.covers()
+and, when the requested range reaches an archived month, merge
+archive_store.read_events() into the database rows. The paginated event
+list (crud.get_filtered_attendance_events) asks events_for_page() instead,
+which only reads the files once a page runs past the live rows. Archived rows are ArchivedEvent objects (read-only, not ORM rows)
+carrying the username at archive time.
+
+pyarrow is optional; without it the archiver refuses to run, and archived
+months cannot be read.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models, partitions
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - depends on the environment
+    pa = None
+
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "archive"))
+ARCHIVE_HORIZON_DAYS = int(os.getenv("ARCHIVE_HORIZON_DAYS", 90))
+ARCHIVE_COMPRESSION = os.getenv("ARCHIVE_COMPRESSION", "zstd")
+ARCHIVE_DELETE_BATCH = 1000  # Event ids per DELETE statement
+
+MANIFEST_NAME = "manifest.json"
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None or value.tzinfo is not None:
+        return value
+    return value.replace(tzinfo=timezone.utc)
+
+
+def archive_schema():
+    return pa.schema([
+        ("id", pa.int64()),
+        ("user_id", pa.int32()),
+        ("username", pa.string()),
+        ("event_type", pa.string()),
+        ("timestamp", pa.timestamp("us", tz="UTC")),
+        ("manual", pa.bool_()),
+        ("notes", pa.string()),
+    ])
+
+
+@dataclass(frozen=True)
+class ArchivedEmployee:
+    id: int
+    username: Optional[str]
+
+
+@dataclass(frozen=True)
+class ArchivedEvent:
+    """An archived attendance event, shaped like AttendanceEvent for templates and responses."""
+    id: int
+    user_id: int
+    username: Optional[str]
+    event_type: str
+    timestamp: datetime
+    manual: Optional[bool]
+    notes: Optional[str]
+    archived: bool = True
+
+    @property
+    def employee(self) -> ArchivedEmployee:
+        return ArchivedEmployee(id=self.user_id, username=self.username)
+
+
+def month_key(month: date) -> str:
+    return f"{month.year:04d}-{month.month:02d}"
+
+
+class ArchiveStore:
+    def __init__(self, directory: str = ARCHIVE_DIR):
+        self.directory = directory
+        self._manifest: Optional[dict] = None
+        self._manifest_mtime: Optional[int] = None
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.directory, MANIFEST_NAME)
+
+    def manifest(self) -> dict:
+        """The manifest, re-read only when the file changed (the archiver may run in another process)."""
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return {"months": {}}
+        if mtime != self._manifest_mtime:
+            with open(self.manifest_path) as handle:
+                self._manifest = json.load(handle)
+            self._manifest_mtime = mtime
+        return self._manifest
+
+    def months(self) -> List[date]:
+        return sorted(date.fromisoformat(f"{key}-01") for key in self.manifest()["months"])
+
+    def months_in_range(self, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> List[date]:
+        start_date, end_date = _as_utc(start_date), _as_utc(end_date)
+        overlapping = []
+        for month in self.months():
+            month_start, month_end = partitions.month_bounds(month)
+            if (start_date is None or start_date < month_end) and (end_date is None or end_date >= month_start):
+                overlapping.append(month)
+        return overlapping
+
+    def covers(self, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> bool:
+        """True when part of the range has been archived."""
+        return bool(self.months_in_range(start_date, end_date))
+
+    def events_for_page(
+        self,
+        live_rows: list,
+        limit: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        before: Optional[Tuple[datetime, int]] = None,
+        **filters,
+    ) -> List[ArchivedEvent]:
+        """
+        Archived events that can still make a newest-first page of limit
+        rows, given the live rows (at most limit + 1) already read for it
+        and the page cursor as (timestamp, id). Nothing is read while the
+        live rows fill the page without reaching an archived month; the
+        cursor and the oldest live row bound the files' row filter.
+        """
+        upper = _as_utc(end_date)
+        if before is not None:
+            upper = _as_utc(before[0]) if upper is None else min(upper, _as_utc(before[0]))
+        months = self.months_in_range(start_date, upper)
+        if not months:
+            return []
+        lower = _as_utc(start_date)
+        if len(live_rows) > limit:
+            oldest = _as_utc(live_rows[-1].timestamp)
+            if oldest >= partitions.month_bounds(months[-1])[1]:
+                return []
+            lower = oldest if lower is None else max(lower, oldest)
+        archived = self.read_events(lower, upper, **filters)
+        return rows_before(archived, *before) if before is not None else archived
+
+    def read_events(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        event_type: Optional[str] = None,
+        user_id: Optional[int] = None,
+        username: Optional[str] = None,
+        manual: Optional[bool] = None,
+    ) -> List[ArchivedEvent]:
+        """Archived events matching the attendance filters, ordered by (timestamp, id)."""
+        months = self.months_in_range(start_date, end_date)
+        if not months:
+            return []
+        if pa is None:
+            raise RuntimeError("Reading archived attendance requires the pyarrow package")
+
+        conditions = []
+        if start_date:
+            conditions.append(pc.field("timestamp") >= pa.scalar(_as_utc(start_date), pa.timestamp("us", tz="UTC")))
+        if end_date:
+            conditions.append(pc.field("timestamp") <= pa.scalar(_as_utc(end_date), pa.timestamp("us", tz="UTC")))
+        if event_type:
+            conditions.append(pc.field("event_type") == event_type)
+        if user_id:
+            conditions.append(pc.field("user_id") == user_id)
+        if username:
+            conditions.append(pc.field("username") == username)
+        if manual is not None:
+            conditions.append(pc.field("manual") == manual)
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+
+        events = []
+        entries = self.manifest()["months"]
+        for month in months:
+            path = os.path.join(self.directory, entries[month_key(month)]["file"])
+            table = pq.read_table(path, filters=expression, schema=archive_schema())
+            events.extend(ArchivedEvent(**row) for row in table.to_pylist())
+        events.sort(key=lambda event: (event.timestamp, event.id))
+        return events
+
+    def count_events(self, **filters) -> int:
+        return len(self.read_events(**filters))
+
+    def write_month(self, month: date, rows: Iterable[dict]) -> dict:
+        """
+        Write (or merge into) a month's file and record it in the manifest.
+        Rows already in the file keep their place unless the new rows carry
+        the same id, in which case the new row wins.
+        """
+        if pa is None:
+            raise RuntimeError("Archiving attendance requires the pyarrow package")
+        os.makedirs(self.directory, exist_ok=True)
+        key = month_key(month)
+        filename = f"attendance_events_{key}.parquet"
+        path = os.path.join(self.directory, filename)
+
+        merged: Dict[int, dict] = {}
+        if key in self.manifest()["months"]:
+            for row in pq.read_table(path, schema=archive_schema()).to_pylist():
+                merged[row["id"]] = row
+        for row in rows:
+            merged[row["id"]] = {**row, "timestamp": _as_utc(row["timestamp"])}
+        ordered = sorted(merged.values(), key=lambda row: (row["timestamp"], row["id"]))
+
+        table = pa.Table.from_pylist(ordered, schema=archive_schema())
+        with open(path + ".part", "wb") as handle:
+            pq.write_table(table, handle, compression=ARCHIVE_COMPRESSION)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(path + ".part", path)
+
+        with open(path, "rb") as handle:
+            checksum = hashlib.sha256(handle.read()).hexdigest()
+        entry = {
+            "file": filename,
+            "rows": len(ordered),
+            "first": ordered[0]["timestamp"].isoformat() if ordered else None,
+            "last": ordered[-1]["timestamp"].isoformat() if ordered else None,
+            "sha256": checksum,
+            "archived_at": datetime.now(timezone.utc).isoformat(),
+        }
+        manifest = dict(self.manifest())
+        manifest["months"] = {**manifest["months"], key: entry}
+        self._write_manifest(manifest)
+        return entry
+
+    def _write_manifest(self, manifest: dict):
+        with open(self.manifest_path + ".part", "w") as handle:
+            json.dump(manifest, handle, indent=2, sort_keys=True)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(self.manifest_path + ".part", self.manifest_path)
+
+
+# Shared instance used by crud, the reports and the exports
+archive_store = ArchiveStore()
+
+
+# --- Merging archived and live rows ---
+
+def event_key(row):
+    return (_as_utc(row.timestamp), row.id)
+
+
+def rows_before(rows: list, timestamp: datetime, event_id: int) -> list:
+    """Rows that sort before (timestamp, event_id) in newest-first order, i.e. older ones."""
+    bound = (_as_utc(timestamp), event_id)
+    return [row for row in rows if event_key(row) < bound]
+
+
+def merge_event_lists(live_rows: list, archived_rows: list, key=event_key, reverse: bool = False) -> list:
+    """Sorted union of live and archived rows; a live row replaces an archived one with the same id."""
+    live_ids = {row.id for row in live_rows}
+    rows = list(live_rows) + [row for row in archived_rows if row.id not in live_ids]
+    rows.sort(key=key, reverse=reverse)
+    return rows
+
+
+async def merge_event_stream(live_rows, archived_rows: list, key=event_key):
+    """
+    Merge an ascending async stream of live rows with an ascending list of
+    archived rows. Each event id is yielded once.
+    """
+    archived_ids = {row.id for row in archived_rows}
+    emitted = set()
+    position = 0
+    async for row in live_rows:
+        row_key = key(row)
+        while position < len(archived_rows) and key(archived_rows[position]) < row_key:
+            archived = archived_rows[position]
+            position += 1
+            if archived.id not in emitted:
+                emitted.add(archived.id)
+                yield archived
+        if row.id in archived_ids:
+            if row.id in emitted:
+                continue
+            emitted.add(row.id)
+        yield row
+    for archived in archived_rows[position:]:
+        if archived.id not in emitted:
+            yield archived
+
+
+# --- Archiver ---
+
+def archive_cutoff(horizon_days: int = ARCHIVE_HORIZON_DAYS, now: Optional[datetime] = None) -> date:
+    """First month that stays in the database: the month containing now - horizon."""
+    now = now or datetime.now(timezone.utc)
+    return (now - timedelta(days=horizon_days)).date().replace(day=1)
+
+
+async def _month_rows(db: AsyncSession, month: date) -> List[dict]:
+    events = models.AttendanceEvent
+    start, end = partitions.month_bounds(month)
+    result = await db.execute(
+        select(
+            events.id, events.user_id, models.Employee.username, events.event_type,
+            events.timestamp, events.manual, events.notes,
+        )
+        .outerjoin(models.Employee, events.user_id == models.Employee.id)
+        .where(events.timestamp >= start, events.timestamp < end)
+        .order_by(events.timestamp, events.id)
+    )
+    return [dict(row._mapping) for row in result.all()]
+
+
+async def _drop_empty_partition(db: AsyncSession, month: date):
+    def drop(connection):
+        name = partitions.partition_name(month)
+        if not partitions.is_partitioned(connection) or name not in partitions.existing_partitions(connection):
+            return
+        if connection.execute(text(f"SELECT EXISTS (SELECT 1 FROM {name})")).scalar():
+            return
+        connection.execute(text(f"ALTER TABLE {partitions.PARENT_TABLE} DETACH PARTITION {name}"))
+        connection.execute(text(f"DROP TABLE {name}"))
+    await db.run_sync(lambda session: drop(session.connection()))
+
+
+async def archive_old_events(
+    session_factory,
+    horizon_days: int = ARCHIVE_HORIZON_DAYS,
+    now: Optional[datetime] = None,
+    store: Optional[ArchiveStore] = None,
+) -> Dict[str, int]:
+    """Archive every month before archive_cutoff(). Returns rows archived per month."""
+    store = store or archive_store
+    cutoff = archive_cutoff(horizon_days, now)
+    cutoff_start, _ = partitions.month_bounds(cutoff)
+    archived = {}
+
+    async with session_factory() as db:
+        events = models.AttendanceEvent
+        oldest = (await db.execute(select(func.min(events.timestamp)).where(events.timestamp < cutoff_start))).scalar()
+        if oldest is None:
+            return archived
+
+        for month in partitions.months_between(_as_utc(oldest).date(), partitions.add_months(cutoff, -1)):
+            rows = await _month_rows(db, month)
+            if not rows:
+                continue
+            store.write_month(month, rows)
+            # The file is durable now; only the rows that went into it are removed
+            ids = [row["id"] for row in rows]
+            for offset in range(0, len(ids), ARCHIVE_DELETE_BATCH):
+                await db.execute(delete(events).where(events.id.in_(ids[offset:offset + ARCHIVE_DELETE_BATCH])))
+            await db.commit()
+            await _drop_empty_partition(db, month)
+            await db.commit()
+            archived[month_key(month)] = len(rows)
+            print(f"Archived {len(rows)} events from {month_key(month)}")
+    return archived
+
+
+if __name__ == "__main__":
+    from app.database import AsyncSessionLocal
+
+    parser = argparse.ArgumentParser(description="Move old attendance events to compressed monthly archive files")
+    parser.add_argument("--horizon-days", type=int, default=ARCHIVE_HORIZON_DAYS, help="Keep at least this many days in the database")
+    args = parser.parse_args()
+    result = asyncio.run(archive_old_events(AsyncSessionLocal, horizon_days=args.horizon_days))
+    print(f"Archived {sum(result.values())} events in {len(result)} months to {archive_store.directory}")
@@ -1,21 +1,22 @@
 # time_management/app/auth.py (Corrected)
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 from app import crud, models, security
-from app.database import get_db # Use the synchronous session getter
+from app.database import get_async_db
 
 # Define the router
 router = APIRouter()
 
 @router.post("/token")
-def login_for_access_token(
+async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db) # Correctly uses sync session
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = crud.get_employee_by_username_sync(db, form_data.username)
-    if not user or not security.pwd_context.verify(form_data.password, user.hashed_password):
+    # bcrypt runs on the password pool, not on the event loop
+    user = await crud.authenticate_employee(db, form_data.username, form_data.password)
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -0,0 +1,123 @@
+# time_management/app/bootstrap.py
+"""
+One-time database bootstrap, run from the application lifespan.
+
+Every worker process calls bootstrap_database() when it starts, but the
+work itself (schema, default admin) is needed once per deployment. A worker
+first checks cheaply whether anything is missing and returns right away if
+not, so a restart of an established deployment does no DDL and no bcrypt.
+Otherwise it takes a PostgreSQL advisory lock (BOOTSTRAP_LOCK_NAMESPACE):
+one worker does the work while the others wait, re-check and find nothing
+left to do.
+
+BOOTSTRAP_SCHEMA picks how the schema is brought up:
+
+* "create_all" (default): create missing tables from the models.
+* "migrate": upgrade to the latest Alembic revision (app.migrations).
+* "none": leave it to an explicit `python -m app.migrations`.
+"""
+import asyncio
+import os
+
+from sqlalchemy import inspect, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app import crud, models, schemas
+from app.database import Base, AsyncSessionLocal, async_engine
+
+BOOTSTRAP_SCHEMA = os.getenv("BOOTSTRAP_SCHEMA", "create_all")  # "create_all", "migrate" or "none"
+BOOTSTRAP_LOCK_NAMESPACE = 7304
+
+DEFAULT_ADMIN_USERNAME = os.getenv("DEFAULT_ADMIN_USERNAME", "admin")
+DEFAULT_ADMIN_EMAIL = os.getenv("DEFAULT_ADMIN_EMAIL", "admin@example.com")
+DEFAULT_ADMIN_PASSWORD = os.getenv("DEFAULT_ADMIN_PASSWORD", "adminpassword")
+
+
+def _schema_is_current(connection) -> bool:
+    if BOOTSTRAP_SCHEMA == "none":
+        return True
+    if BOOTSTRAP_SCHEMA == "migrate":
+        from alembic.runtime.migration import MigrationContext
+        from alembic.script import ScriptDirectory
+        from app.migrations import alembic_config
+
+        head = ScriptDirectory.from_config(alembic_config()).get_current_head()
+        return MigrationContext.configure(connection).get_current_revision() == head
+    inspector = inspect(connection)
+    return all(inspector.has_table(table.name) for table in Base.metadata.sorted_tables)
+
+
+async def is_bootstrapped(engine=async_engine) -> bool:
+    """True when the schema is current and the default admin exists."""
+    async with engine.connect() as connection:
+        if not await connection.run_sync(_schema_is_current):
+            return False
+        if not DEFAULT_ADMIN_USERNAME:
+            return True
+        if not await connection.run_sync(lambda sync_connection: inspect(sync_connection).has_table("employees")):
+            # Only reachable with BOOTSTRAP_SCHEMA=none: nothing we can do until migrations run
+            return True
+        result = await connection.execute(
+            select(models.Employee.id).where(models.Employee.username == DEFAULT_ADMIN_USERNAME)
+        )
+        return result.first() is not None
+
+
+async def _lock(connection: AsyncConnection):
+    if connection.dialect.name == "postgresql":
+        await connection.execute(text("SELECT pg_advisory_lock(:namespace, 0)"), {"namespace": BOOTSTRAP_LOCK_NAMESPACE})
+
+
+async def _unlock(connection: AsyncConnection):
+    if connection.dialect.name == "postgresql":
+        await connection.execute(text("SELECT pg_advisory_unlock(:namespace, 0)"), {"namespace": BOOTSTRAP_LOCK_NAMESPACE})
+
+
+async def create_schema(engine=async_engine):
+    if BOOTSTRAP_SCHEMA == "migrate":
+        from app.migrations import upgrade_database
+
+        print("Applying database migrations...")
+        await asyncio.to_thread(upgrade_database)
+    elif BOOTSTRAP_SCHEMA == "create_all":
+        print("Creating missing database tables...")
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+
+
+async def create_default_admin(session_factory=AsyncSessionLocal):
+    """Creates the default admin user if one doesn't exist."""
+    if not DEFAULT_ADMIN_USERNAME:
+        return
+    async with session_factory() as db:
+        if await crud.get_employee_by_username(db, DEFAULT_ADMIN_USERNAME):
+            return
+        if not DEFAULT_ADMIN_PASSWORD:
+            print("ERROR: DEFAULT_ADMIN_PASSWORD is not set in the environment. Cannot create admin user.")
+            return
+        admin_data = schemas.EmployeeCreate(
+            username=DEFAULT_ADMIN_USERNAME,
+            email=DEFAULT_ADMIN_EMAIL,
+            rfid="DEFAULT_ADMIN_RFID", # Assign a unique default RFID
+            password=DEFAULT_ADMIN_PASSWORD,
+            is_admin=True
+        )
+        created_user = await crud.create_employee(db, admin_data)
+        print(f"Default admin user '{created_user.username}' created successfully.")
+
+
+async def bootstrap_database(engine=async_engine, session_factory=AsyncSessionLocal) -> bool:
+    """Bring up the schema and default admin if needed. Returns True if this worker did the work."""
+    if await is_bootstrapped(engine):
+        return False
+    async with engine.connect() as lock_connection:
+        await _lock(lock_connection)
+        try:
+            # Another worker may have finished while we waited for the lock
+            if await is_bootstrapped(engine):
+                return False
+            await create_schema(engine)
+            await create_default_admin(session_factory)
+            return True
+        finally:
+            await _unlock(lock_connection)
@@ -0,0 +1,378 @@
+# time_management/app/cache.py
+"""
+Process-local caches for the RFID scan hot path and the admin pages.
+
+Each worker keeps its own copy. The crud write paths keep it up to date,
+and anything not found here falls back to the database.
+"""
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+
+
+@dataclass(frozen=True)
+class EmployeeEntry:
+    """Lightweight, immutable view of an employee row (no password hash)."""
+    id: int
+    username: str
+    rfid: Optional[str]
+    is_admin: bool
+
+    @classmethod
+    def from_model(cls, employee: models.Employee) -> "EmployeeEntry":
+        return cls(
+            id=employee.id,
+            username=employee.username,
+            rfid=employee.rfid,
+            is_admin=bool(employee.is_admin),
+        )
+
+
+class EmployeeDirectory:
+    """RFID / user_id / username lookup table with hit and miss counters."""
+
+    def __init__(self):
+        self._by_id: Dict[int, EmployeeEntry] = {}
+        self._by_rfid: Dict[str, EmployeeEntry] = {}
+        self._by_username: Dict[str, EmployeeEntry] = {}
+        self.hits = 0
+        self.misses = 0
+        self.warmed = False
+
+    async def warm(self, db: AsyncSession) -> int:
+        """Load every employee into the directory. Returns the number of entries."""
+        result = await db.execute(
+            select(
+                models.Employee.id,
+                models.Employee.username,
+                models.Employee.rfid,
+                models.Employee.is_admin,
+            )
+        )
+        self.clear()
+        for row in result.all():
+            self._add(EmployeeEntry(id=row.id, username=row.username, rfid=row.rfid, is_admin=bool(row.is_admin)))
+        self.warmed = True
+        return len(self._by_id)
+
+    def clear(self):
+        self._by_id.clear()
+        self._by_rfid.clear()
+        self._by_username.clear()
+        self.warmed = False
+
+    def _add(self, entry: EmployeeEntry):
+        self._by_id[entry.id] = entry
+        if entry.rfid:
+            self._by_rfid[entry.rfid] = entry
+        if entry.username:
+            self._by_username[entry.username] = entry
+
+    def put(self, employee: models.Employee):
+        """Insert or replace an employee, dropping any stale RFID/username keys."""
+        self.remove(employee.id)
+        self._add(EmployeeEntry.from_model(employee))
+
+    def remove(self, user_id: int):
+        entry = self._by_id.pop(user_id, None)
+        if entry is None:
+            return
+        if entry.rfid and self._by_rfid.get(entry.rfid) is entry:
+            del self._by_rfid[entry.rfid]
+        if entry.username and self._by_username.get(entry.username) is entry:
+            del self._by_username[entry.username]
+
+    def _count(self, entry: Optional[EmployeeEntry]) -> Optional[EmployeeEntry]:
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def get_by_rfid(self, rfid: str) -> Optional[EmployeeEntry]:
+        return self._count(self._by_rfid.get(rfid))
+
+    def get_by_id(self, user_id: int) -> Optional[EmployeeEntry]:
+        return self._count(self._by_id.get(user_id))
+
+    def get_by_username(self, username: str) -> Optional[EmployeeEntry]:
+        return self._count(self._by_username.get(username))
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._by_id),
+            "warmed": self.warmed,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Treat naive timestamps (e.g. from SQLite) as UTC so they compare with aware ones."""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+@dataclass(frozen=True)
+class LastEventState:
+    """Latest attendance event of an employee. All fields are None if they have no events."""
+    event_type: Optional[str] = None
+    timestamp: Optional[datetime] = None
+    event_id: Optional[int] = None
+
+    @classmethod
+    def from_event(cls, event: Optional[models.AttendanceEvent]) -> "LastEventState":
+        if event is None:
+            return cls()
+        return cls(event_type=event.event_type, timestamp=_as_utc(event.timestamp), event_id=event.id)
+
+
+class LastEventCache:
+    """
+    Per-employee latest event, used for the scan cooldown and checkin/checkout toggle.
+
+    A missing key means "unknown" and must be read from the database. Only
+    events newer than the cached one replace it. Edits and deletes drop the
+    entry because the previous event cannot be recovered from memory.
+    """
+
+    def __init__(self):
+        self._states: Dict[int, LastEventState] = {}
+        self.hits = 0
+        self.misses = 0
+        self.warmed = False
+
+    async def warm(self, db: AsyncSession) -> int:
+        """Load the latest event of every employee. Returns the number of entries."""
+        latest = (
+            select(
+                models.AttendanceEvent.user_id,
+                func.max(models.AttendanceEvent.timestamp).label("max_timestamp"),
+            )
+            .group_by(models.AttendanceEvent.user_id)
+            .subquery()
+        )
+        result = await db.execute(
+            select(
+                models.AttendanceEvent.id,
+                models.AttendanceEvent.user_id,
+                models.AttendanceEvent.event_type,
+                models.AttendanceEvent.timestamp,
+            )
+            .join(
+                latest,
+                (models.AttendanceEvent.user_id == latest.c.user_id)
+                & (models.AttendanceEvent.timestamp == latest.c.max_timestamp),
+            )
+            .order_by(models.AttendanceEvent.id)
+        )
+        self._states.clear()
+        for row in result.all():
+            # Ties on timestamp resolve to the highest id
+            self._states[row.user_id] = LastEventState(
+                event_type=row.event_type, timestamp=_as_utc(row.timestamp), event_id=row.id
+            )
+        self.warmed = True
+        return len(self._states)
+
+    def get(self, user_id: int) -> Optional[LastEventState]:
+        state = self._states.get(user_id)
+        if state is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return state
+
+    def set(self, user_id: int, state: LastEventState):
+        self._states[user_id] = state
+
+    def record(self, event: models.AttendanceEvent):
+        """Apply a newly written event. Back-dated events leave a newer cached state alone."""
+        current = self._states.get(event.user_id)
+        if current is None:
+            return
+        new_state = LastEventState.from_event(event)
+        if current.timestamp is None or new_state.timestamp >= current.timestamp:
+            self._states[event.user_id] = new_state
+
+    def invalidate(self, user_id: int):
+        self._states.pop(user_id, None)
+
+    def clear(self):
+        self._states.clear()
+        self.warmed = False
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._states),
+            "warmed": self.warmed,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+ROSTER_TTL_SECONDS = int(os.getenv("ROSTER_TTL_SECONDS", 60))
+
+
+@dataclass(frozen=True)
+class RosterEntry:
+    id: int
+    username: str
+
+
+@dataclass(frozen=True)
+class RosterSnapshot:
+    """Immutable (id, username) list for the admin dropdowns, ordered by username."""
+    version: int
+    employees: Tuple[RosterEntry, ...]
+    etag: str
+    loaded_at: float
+
+    def as_json(self) -> list:
+        return [{"id": entry.id, "username": entry.username} for entry in self.employees]
+
+
+class EmployeeRoster:
+    """
+    Shared roster snapshot. Employee writes in crud call invalidate(); the
+    TTL bounds how long a write made by another worker process goes unseen.
+    The ETag is a hash of the content, so every worker agrees on it.
+    """
+
+    def __init__(self, ttl_seconds: int = ROSTER_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.version = 0
+        self._snapshot: Optional[RosterSnapshot] = None
+        self.hits = 0
+        self.loads = 0
+
+    async def get(self, db: AsyncSession) -> RosterSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and (not self.ttl_seconds or time.monotonic() - snapshot.loaded_at <= self.ttl_seconds):
+            self.hits += 1
+            return snapshot
+
+        version = self.version
+        result = await db.execute(
+            select(models.Employee.id, models.Employee.username).order_by(models.Employee.username)
+        )
+        employees = tuple(RosterEntry(id=row.id, username=row.username) for row in result.all())
+        body = json.dumps([[entry.id, entry.username] for entry in employees])
+        snapshot = RosterSnapshot(
+            version=version,
+            employees=employees,
+            etag=f'"{hashlib.sha1(body.encode()).hexdigest()}"',
+            loaded_at=time.monotonic(),
+        )
+        self.loads += 1
+        # An employee write during the load makes this copy stale; serve it once but do not keep it
+        if version == self.version:
+            self._snapshot = snapshot
+        return snapshot
+
+    def invalidate(self):
+        self.version += 1
+        self._snapshot = None
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version,
+            "cached": self._snapshot is not None,
+            "entries": len(self._snapshot.employees) if self._snapshot else None,
+            "hits": self.hits,
+            "loads": self.loads,
+        }
+
+
+PRINCIPAL_TTL_SECONDS = int(os.getenv("PRINCIPAL_TTL_SECONDS", 30))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", 1024))
+
+
+class PrincipalCache:
+    """
+    Authenticated employees keyed by (user_id, token id), so the JWT
+    dependencies do not read the employee row on every request. Entries
+    are EmployeeEntry views, not ORM objects. crud drops a user's entries
+    when their row, admin flag or password changes; the TTL bounds how long
+    a change made by another worker process goes unseen.
+    """
+
+    def __init__(self, ttl_seconds: int = PRINCIPAL_TTL_SECONDS, max_entries: int = PRINCIPAL_CACHE_SIZE):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.version = 0
+        self._entries: "OrderedDict[Tuple[int, str], Tuple[float, EmployeeEntry]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, db: AsyncSession, user_id: int, token_id: str) -> Optional[EmployeeEntry]:
+        """The employee behind a verified token, or None if they no longer exist."""
+        key = (user_id, token_id)
+        cached = self._entries.get(key)
+        if cached is not None and time.monotonic() - cached[0] <= self.ttl_seconds:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+
+        version = self.version
+        result = await db.execute(
+            select(
+                models.Employee.id,
+                models.Employee.username,
+                models.Employee.rfid,
+                models.Employee.is_admin,
+            ).where(models.Employee.id == user_id)
+        )
+        row = result.first()
+        if row is None:
+            self._entries.pop(key, None)
+            return None
+        entry = EmployeeEntry(id=row.id, username=row.username, rfid=row.rfid, is_admin=bool(row.is_admin))
+        # An employee write during the load may have been missed; use the row once but do not keep it
+        if version == self.version:
+            self._entries[key] = (time.monotonic(), entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, user_id: int):
+        self.version += 1
+        for key in [key for key in self._entries if key[0] == user_id]:
+            del self._entries[key]
+
+    def clear(self):
+        self.version += 1
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+# Shared instances used by crud and the routes
+employee_directory = EmployeeDirectory()
+last_event_cache = LastEventCache()
+employee_roster = EmployeeRoster()
+principal_cache = PrincipalCache()
@@ -0,0 +1,198 @@
+# time_management/app/columnar_export.py
+"""
+Typed, compressed columnar exports (Parquet or Arrow IPC) of attendance events.
+
+One row per event with user_id, username, event_type, timestamp (UTC),
+manual, notes and session_seconds. session_seconds is set on the checkout
+that closes a work session, using the app.work_sessions pairing rules. Rows
+are read from a server-side cursor ordered by employee and time, and each
+fetch of COLUMNAR_ROW_GROUP_SIZE rows is written out as one row group (or
+record batch) and sent to the client right away. Archived months
+(app.archive) in range are merged into the same order.
+
+pyarrow is optional; without it these formats answer 501.
+"""
+import asyncio
+import os
+from typing import AsyncIterator, Callable, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+from app.archive import event_key, merge_event_stream
+from app.reports import ReportFilters
+from app.work_sessions import SessionBuilder
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - depends on the environment
+    pa = None
+
+COLUMNAR_ROW_GROUP_SIZE = int(os.getenv("COLUMNAR_ROW_GROUP_SIZE", 50000))
+COLUMNAR_COMPRESSION = os.getenv("COLUMNAR_COMPRESSION", "zstd")
+
+FORMATS = {
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.file", "arrow"),
+}
+
+
+def event_schema():
+    return pa.schema([
+        ("user_id", pa.int32()),
+        ("username", pa.dictionary(pa.int32(), pa.string())),
+        ("event_type", pa.dictionary(pa.int8(), pa.string())),
+        ("timestamp", pa.timestamp("us", tz="UTC")),
+        ("manual", pa.bool_()),
+        ("notes", pa.string()),
+        ("session_seconds", pa.float64()),
+    ])
+
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes back in chunks but keeps counting the position."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _event_query(filters: ReportFilters):
+    events = models.AttendanceEvent
+    return (
+        select(
+            events.id, events.user_id, models.Employee.username, events.event_type,
+            events.timestamp, events.manual, events.notes,
+        )
+        .join(models.Employee, events.user_id == models.Employee.id)
+        .where(*filters.conditions())
+        .order_by(events.user_id, events.timestamp, events.id)
+    )
+
+
+def _export_key(row):
+    return (row.user_id, *event_key(row))
+
+
+async def _row_batches(db: AsyncSession, filters: ReportFilters, batch_size: int):
+    """Lists of up to batch_size rows in export order, archived rows included."""
+    result = await db.stream(_event_query(filters).execution_options(yield_per=batch_size))
+    if not filters.reaches_archive():
+        async for partition in result.partitions():
+            yield partition
+        return
+
+    archived = sorted(filters.archived_events(), key=_export_key)
+    batch = []
+    async for row in merge_event_stream(result, archived, key=_export_key):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class _BatchBuilder:
+    """Turns ordered event rows into columns, pairing sessions across fetch boundaries."""
+
+    def __init__(self):
+        self._builder: Optional[SessionBuilder] = None
+
+    def to_columns(self, rows) -> dict:
+        columns = {name: [] for name in event_schema().names}
+        for row in rows:
+            if self._builder is None or self._builder.result.user_id != row.user_id:
+                self._builder = SessionBuilder(row.user_id)
+            session = self._builder.feed(row.event_type, row.timestamp)
+            columns["user_id"].append(row.user_id)
+            columns["username"].append(row.username)
+            columns["event_type"].append(row.event_type)
+            columns["timestamp"].append(row.timestamp)
+            columns["manual"].append(row.manual)
+            columns["notes"].append(row.notes)
+            columns["session_seconds"].append(session.duration_seconds if session is not None else None)
+        return columns
+
+
+def _open_writer(export_format: str, sink: _ChunkSink, schema):
+    if export_format == "parquet":
+        return pq.ParquetWriter(sink, schema, compression=COLUMNAR_COMPRESSION)
+    options = pa.ipc.IpcWriteOptions(compression=COLUMNAR_COMPRESSION)
+    return pa.ipc.new_file(sink, schema, options=options)
+
+
+def _write_columns(writer, export_format: str, columns: dict, schema):
+    table = pa.Table.from_pydict(columns, schema=schema)
+    if export_format == "parquet":
+        writer.write_table(table, row_group_size=max(table.num_rows, 1))
+    else:
+        writer.write_table(table)
+
+
+async def stream_columnar(
+    db: AsyncSession,
+    filters: ReportFilters,
+    export_format: str,
+    batch_size: Optional[int] = None,
+    progress: Optional[Callable[[int], None]] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Yield the encoded file chunk by chunk, one row group per cursor fetch.
+    progress, if given, is called with the number of rows in each row group.
+    """
+    batch_size = batch_size or COLUMNAR_ROW_GROUP_SIZE
+    schema = event_schema()
+    sink = _ChunkSink()
+    writer = _open_writer(export_format, sink, schema)
+    batches = _BatchBuilder()
+
+    async for partition in _row_batches(db, filters, batch_size):
+        columns = batches.to_columns(partition)
+        # Encoding and compression are CPU-bound; keep them off the event loop
+        await asyncio.to_thread(_write_columns, writer, export_format, columns, schema)
+        if progress is not None:
+            progress(len(partition))
+        yield sink.drain()
+
+    await asyncio.to_thread(writer.close)
+    yield sink.drain()
+
+
+def check_format(export_format: str):
+    """Raise the HTTP error for a columnar format this server cannot produce."""
+    if export_format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format: {export_format}")
+    if pa is None:
+        raise HTTPException(status_code=501, detail=f"{export_format} export requires the pyarrow package")
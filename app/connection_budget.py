@@ -0,0 +1,131 @@
+# time_management/app/connection_budget.py
+"""
+How many PostgreSQL connections a deployment can open.
+
+Each worker process has two pools (app.database): the main pool keeps up
+to DB_POOL_SIZE connections open and opens up to DB_MAX_OVERFLOW more
+under load; the report pool does the same with REPORT_DB_POOL_SIZE and
+REPORT_DB_MAX_OVERFLOW. The peak for a deployment is:
+
+    workers x (pool_size + max_overflow + report_pool_size + report_max_overflow)
+    + maintenance connections (cron jobs, migrations: one each)
+    + superuser_reserved_connections
+
+That peak has to stay under the server's max_connections. When reports
+read from a replica (REPORT_DATABASE_URL), the report pool counts against
+the replica instead, so it is left out of the primary's budget.
+
+    python -m app.connection_budget --workers 4 --max-connections 100
+"""
+import argparse
+import os
+from dataclasses import dataclass
+from typing import Tuple
+
+from app.database import (
+    DATABASE_URL, DB_MAX_OVERFLOW, DB_POOL_SIZE,
+    REPORT_DATABASE_URL, REPORT_DB_MAX_OVERFLOW, REPORT_DB_POOL_SIZE,
+)
+
+MAINTENANCE_CONNECTIONS = int(os.getenv("DB_MAINTENANCE_CONNECTIONS", 3))
+RESERVED_CONNECTIONS = 3  # PostgreSQL's default superuser_reserved_connections
+
+
+@dataclass(frozen=True)
+class ConnectionBudget:
+    workers: int
+    pool_size: int
+    max_overflow: int
+    max_connections: int
+    maintenance: int = MAINTENANCE_CONNECTIONS
+    reserved: int = RESERVED_CONNECTIONS
+    report_pool_size: int = 0
+    report_max_overflow: int = 0
+
+    @property
+    def per_worker(self) -> int:
+        return self.pool_size + self.max_overflow + self.report_pool_size + self.report_max_overflow
+
+    @property
+    def steady(self) -> int:
+        """Connections held open with every pool at pool_size."""
+        return self.workers * (self.pool_size + self.report_pool_size) + self.maintenance + self.reserved
+
+    @property
+    def peak(self) -> int:
+        return self.workers * self.per_worker + self.maintenance + self.reserved
+
+    @property
+    def headroom(self) -> int:
+        return self.max_connections - self.peak
+
+    @property
+    def fits(self) -> bool:
+        return self.headroom >= 0
+
+
+def connection_budget(
+    workers: int,
+    max_connections: int,
+    pool_size: int = DB_POOL_SIZE,
+    max_overflow: int = DB_MAX_OVERFLOW,
+    maintenance: int = MAINTENANCE_CONNECTIONS,
+    reserved: int = RESERVED_CONNECTIONS,
+    report_pool_size: int = 0,
+    report_max_overflow: int = 0,
+) -> ConnectionBudget:
+    return ConnectionBudget(
+        workers, pool_size, max_overflow, max_connections, maintenance, reserved, report_pool_size, report_max_overflow
+    )
+
+
+def suggest_pool(
+    workers: int,
+    max_connections: int,
+    maintenance: int = MAINTENANCE_CONNECTIONS,
+    reserved: int = RESERVED_CONNECTIONS,
+    report_connections: int = 0,
+) -> Tuple[int, int]:
+    """
+    Largest main-pool (pool_size, max_overflow) that fits next to
+    report_connections per worker, keeping the configured split between
+    steady and overflow connections.
+    """
+    per_worker = (max_connections - maintenance - reserved) // workers - report_connections
+    if per_worker < 1:
+        raise ValueError(f"{max_connections} connections cannot serve {workers} workers")
+    configured = DB_POOL_SIZE + DB_MAX_OVERFLOW
+    pool_size = max(1, per_worker * DB_POOL_SIZE // configured) if configured else per_worker
+    return pool_size, per_worker - pool_size
+
+
+if __name__ == "__main__":
+    report_on_primary = REPORT_DATABASE_URL == DATABASE_URL
+
+    parser = argparse.ArgumentParser(description="Check database connection use against max_connections")
+    parser.add_argument("--workers", type=int, required=True, help="Worker processes across all app hosts")
+    parser.add_argument("--max-connections", type=int, default=100, help="PostgreSQL max_connections (default 100)")
+    parser.add_argument("--pool-size", type=int, default=DB_POOL_SIZE)
+    parser.add_argument("--max-overflow", type=int, default=DB_MAX_OVERFLOW)
+    parser.add_argument("--report-pool-size", type=int, default=REPORT_DB_POOL_SIZE if report_on_primary else 0,
+                        help="0 when reports use a replica")
+    parser.add_argument("--report-max-overflow", type=int, default=REPORT_DB_MAX_OVERFLOW if report_on_primary else 0)
+    parser.add_argument("--maintenance", type=int, default=MAINTENANCE_CONNECTIONS, help="Connections used by cron jobs and migrations")
+    args = parser.parse_args()
+
+    budget = connection_budget(
+        args.workers, args.max_connections, args.pool_size, args.max_overflow, args.maintenance,
+        report_pool_size=args.report_pool_size, report_max_overflow=args.report_max_overflow,
+    )
+    print(f"Per worker:  {budget.pool_size} pooled + {budget.max_overflow} overflow"
+          f" + {budget.report_pool_size} report + {budget.report_max_overflow} report overflow = {budget.per_worker}")
+    print(f"Steady:      {budget.steady} connections")
+    print(f"Peak:        {budget.peak} of {budget.max_connections} (headroom {budget.headroom})")
+    if not budget.fits:
+        try:
+            report_connections = args.report_pool_size + args.report_max_overflow
+            pool_size, max_overflow = suggest_pool(args.workers, args.max_connections, args.maintenance,
+                                                   report_connections=report_connections)
+            print(f"Over budget. Suggested: DB_POOL_SIZE={pool_size} DB_MAX_OVERFLOW={max_overflow}")
+        except ValueError as e:
+            print(f"Over budget: {e}")
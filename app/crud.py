@@ -3,61 +3,12 @@ from sqlalchemy.orm import Session
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update, delete, and_
 from sqlalchemy.future import select as future_select # If using SQLAlchemy < 2.0 style select with async
-from app import models, schemas
-from passlib.context import CryptContext
+from app import models, schemas, event_changes, pagination, passwords
+from app.archive import archive_store, merge_event_lists
+from app.cache import EmployeeEntry, LastEventState, employee_directory, employee_roster, last_event_cache, principal_cache
 from datetime import datetime
 from sqlalchemy.orm import selectinload
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-
-def get_employee_sync(db: Session, user_id: int): 
-    """Synchronous function to get employee by ID."""
-    if not db: # Add check for None db session
-        return None
-    try:
-        return db.query(models.Employee).filter(models.Employee.id == user_id).first()
-    except Exception as e:
-        print(f"Error in get_employee_sync: {e}")
-        return None
-
-
-def get_employee_by_username_sync(db: Session, username: str): 
-    """Synchronous function to get employee by username."""
-    if not db:
-        return None
-    try:
-        return db.query(models.Employee).filter(models.Employee.username == username).first()
-    except Exception as e:
-        print(f"Error in get_employee_by_username_sync: {e}")
-        return None
-
-def create_employee_sync(db: Session, employee: schemas.EmployeeCreate): 
-    """Synchronous function to create an employee."""
-    if not db:
-        raise ValueError("Database session is required.")
-    try:
-        if employee.is_admin and not employee.password:
-            raise ValueError("Admin users must have a password.")
-
-        hashed_password = pwd_context.hash(employee.password) if employee.password else ""
-
-        db_employee = models.Employee(
-            username=employee.username,
-            email=employee.email,
-            rfid=employee.rfid,
-            hashed_password=hashed_password,
-            is_admin=employee.is_admin
-        )
-        db.add(db_employee)
-        db.commit()
-        db.refresh(db_employee)
-        return db_employee
-    except Exception as e:
-        db.rollback() # Rollback on error
-        print(f"Error in create_employee_sync: {e}")
-        raise # Re-raise the exception after logging/rollback
-
 
 async def get_employees(db: AsyncSession, skip: int = 0, limit: int = 100):
     result = await db.execute(select(models.Employee).offset(skip).limit(limit))
@@ -71,6 +22,17 @@ async def get_employee_by_rfid(db: AsyncSession, rfid: str):
     result = await db.execute(select(models.Employee).filter(models.Employee.rfid == rfid))
     return result.scalars().first()
 
+async def get_employee_entry_by_rfid(db: AsyncSession, rfid: str):
+    """Resolve an RFID tag through the in-memory directory, falling back to the database."""
+    entry = employee_directory.get_by_rfid(rfid)
+    if entry is not None:
+        return entry
+    employee = await get_employee_by_rfid(db, rfid)
+    if not employee:
+        return None
+    employee_directory.put(employee)
+    return EmployeeEntry.from_model(employee)
+
 async def get_employee_by_username(db, username: str): 
     """Modified to handle both sync and async sessions"""
     try:
@@ -85,7 +47,7 @@ async def create_employee(db: AsyncSession, employee: schemas.EmployeeCreate):
     if employee.is_admin and not employee.password:
         raise ValueError("Admin users must have a password.")
 
-    hashed_password = pwd_context.hash(employee.password) if employee.password else ""
+    hashed_password = await passwords.hash_password(employee.password) if employee.password else ""
 
     db_employee = models.Employee(
         username=employee.username,
@@ -97,6 +59,8 @@ async def create_employee(db: AsyncSession, employee: schemas.EmployeeCreate):
     db.add(db_employee)
     await db.commit()
     await db.refresh(db_employee)
+    employee_directory.put(db_employee)
+    employee_roster.invalidate()
     return db_employee
 
 
@@ -109,7 +73,7 @@ async def update_employee(db: AsyncSession, employee_id: int, employee: schemas.
     
     # Handle password separately
     if 'password' in update_data and update_data['password']:
-        update_data['hashed_password'] = pwd_context.hash(update_data['password'])
+        update_data['hashed_password'] = await passwords.hash_password(update_data['password'])
         del update_data['password']
     elif 'password' in update_data:
         del update_data['password']
@@ -120,41 +84,79 @@ async def update_employee(db: AsyncSession, employee_id: int, employee: schemas.
     
     await db.commit()
     await db.refresh(db_employee)
+    employee_directory.put(db_employee)
+    employee_roster.invalidate()
+    principal_cache.invalidate(employee_id)
     return db_employee
 
 async def delete_employee(db: AsyncSession, user_id: int):
     db_employee = await get_employee(db, user_id) 
     if not db_employee: return None
+    await db.execute(delete(models.DailyAttendanceSummary).where(models.DailyAttendanceSummary.user_id == user_id))
     await db.delete(db_employee)
     await db.commit()
+    employee_directory.remove(user_id)
+    employee_roster.invalidate()
+    principal_cache.invalidate(user_id)
+    last_event_cache.invalidate(user_id)
     return db_employee
 
 async def update_password(db: AsyncSession, user_id: int, current_password: str, new_password: str):
     db_employee = await get_employee(db, user_id) 
     if not db_employee: return None
-    if not pwd_context.verify(current_password, db_employee.hashed_password): return False
-    db_employee.hashed_password = pwd_context.hash(new_password)
+    matches, _ = await passwords.verify_password(current_password, db_employee.hashed_password)
+    if not matches: return False
+    db_employee.hashed_password = await passwords.hash_password(new_password)
     await db.commit()
     await db.refresh(db_employee)
+    principal_cache.invalidate(user_id)
+    return db_employee
+
+async def authenticate_employee(db: AsyncSession, username: str, password: str):
+    """The employee if the password matches, else None. Upgrades the stored hash when its cost is outdated."""
+    db_employee = await get_employee_by_username(db, username=username)
+    if not db_employee:
+        # Hash anyway so unknown usernames take as long as wrong passwords
+        await passwords.hash_password(password)
+        return None
+    matches, new_hash = await passwords.verify_password(password, db_employee.hashed_password)
+    if not matches:
+        return None
+    if new_hash:
+        db_employee.hashed_password = new_hash
+        await db.commit()
+        await db.refresh(db_employee)
     return db_employee
 
 async def get_latest_attendance_event(db: AsyncSession, user_id: int):
     result = await db.execute(select(models.AttendanceEvent).filter(models.AttendanceEvent.user_id == user_id).order_by(models.AttendanceEvent.timestamp.desc()).limit(1))
     return result.scalars().first()
 
+async def get_latest_event_state(db: AsyncSession, user_id: int) -> LastEventState:
+    """Latest event type/timestamp for an employee, served from the last-event cache when possible."""
+    state = last_event_cache.get(user_id)
+    if state is not None:
+        return state
+    latest_event = await get_latest_attendance_event(db, user_id)
+    state = LastEventState.from_event(latest_event)
+    last_event_cache.set(user_id, state)
+    return state
+
 async def create_attendance_event(db: AsyncSession, event_data: models.AttendanceEvent):
     db.add(event_data)
+    await db.flush()
+    await event_changes.events_changed(db, {event_data.user_id: [event_data.timestamp]})
     await db.commit()
-    await db.refresh(event_data)
+    # No refresh needed: every column is set client-side and the session
+    # does not expire objects on commit, so this stays a single INSERT.
+    last_event_cache.record(event_data)
     return event_data
 
-async def get_checkin_events(db: AsyncSession):
-    result = await db.execute(select(models.AttendanceEvent).filter(models.AttendanceEvent.event_type == "checkin"))
-    return result.scalars().all()
+async def get_checkin_events(db: AsyncSession, limit: int = None, cursor: str = None):
+    return await get_filtered_attendance_events(db, event_type="checkin", limit=limit, cursor=cursor)
 
-async def get_checkout_events(db: AsyncSession):
-    result = await db.execute(select(models.AttendanceEvent).filter(models.AttendanceEvent.event_type == "checkout"))
-    return result.scalars().all()
+async def get_checkout_events(db: AsyncSession, limit: int = None, cursor: str = None):
+    return await get_filtered_attendance_events(db, event_type="checkout", limit=limit, cursor=cursor)
 
 async def get_filtered_attendance_events(
     db: AsyncSession,
@@ -163,12 +165,48 @@ async def get_filtered_attendance_events(
     event_type: str = None,
     user_id: int = None,
     username: str = None,
-    manual: bool = None
-):
-    """Get attendance events with filters applied"""
+    manual: bool = None,
+    limit: int = None,
+    cursor: str = None
+) -> pagination.EventPage:
+    """Get one page of attendance events with filters applied, newest first.
+    Raises pagination.InvalidCursor for a cursor this API did not hand out."""
+    limit = pagination.clamp_page_size(limit)
     query = select(models.AttendanceEvent).options(selectinload(models.AttendanceEvent.employee)).join(models.Employee)
     
-    # Build filter conditions
+    conditions = build_attendance_filters(start_date, end_date, event_type, user_id, username, manual)
+    if cursor:
+        conditions.append(pagination.after_cursor(cursor))
+    
+    # Apply all conditions if any exist
+    if conditions:
+        query = query.filter(and_(*conditions))
+    
+    # Order by (timestamp, id) descending and read one row past the page
+    query = query.order_by(*pagination.newest_first()).limit(limit + 1)
+    
+    result = await db.execute(query)
+    rows = result.scalars().all()
+    
+    # Months moved to cold storage by app.archive are merged in once the page runs past the live rows
+    archived = archive_store.events_for_page(
+        rows, limit, start_date, end_date, pagination.decode_cursor(cursor) if cursor else None,
+        event_type=event_type, user_id=user_id, username=username, manual=manual,
+    )
+    if archived:
+        rows = merge_event_lists(rows, archived, reverse=True)[:limit + 1]
+    return pagination.page_from_rows(rows, limit)
+
+def build_attendance_filters(
+    start_date: datetime = None,
+    end_date: datetime = None,
+    event_type: str = None,
+    user_id: int = None,
+    username: str = None,
+    manual: bool = None
+):
+    """Filter conditions shared by the event listing, reports and exports.
+    The username condition needs the query to be joined with Employee."""
     conditions = []
     
     if start_date:
@@ -189,15 +227,7 @@ async def get_filtered_attendance_events(
     if manual is not None:  # Check if it's explicitly True or False
         conditions.append(models.AttendanceEvent.manual == manual)
     
-    # Apply all conditions if any exist
-    if conditions:
-        query = query.filter(and_(*conditions))
-    
-    # Order by timestamp descending (newest first)
-    query = query.order_by(models.AttendanceEvent.timestamp.desc())
-    
-    result = await db.execute(query)
-    return result.scalars().all()
+    return conditions
 
 async def get_attendance_event(db: AsyncSession, event_id: int):
     """Get a single attendance event by ID"""
@@ -215,12 +245,22 @@ async def update_attendance_event(db: AsyncSession, event_id: int, event_data: d
     if not event:
         return None
     
+    previous_user_id = event.user_id
+    previous_timestamp = event.timestamp
+    
     # Update fields
     for key, value in event_data.items():
         setattr(event, key, value)
     
+    await db.flush()
+    changes = {previous_user_id: [previous_timestamp]}
+    changes.setdefault(event.user_id, []).append(event.timestamp)
+    await event_changes.events_changed(db, changes)
     await db.commit()
     await db.refresh(event)
+    # The edit may have moved the latest event (back-dating, re-assigning), so re-read on next scan
+    last_event_cache.invalidate(previous_user_id)
+    last_event_cache.invalidate(event.user_id)
     return event
 
 async def delete_attendance_event(db: AsyncSession, event_id: int):
@@ -230,5 +270,8 @@ async def delete_attendance_event(db: AsyncSession, event_id: int):
         return None
     
     await db.delete(event)
+    await db.flush()
+    await event_changes.events_changed(db, {event.user_id: [event.timestamp]})
     await db.commit()
+    last_event_cache.invalidate(event.user_id)
     return event
\ No newline at end of file
@@ -0,0 +1,308 @@
+# time_management/app/daily_summary.py
+"""
+Incrementally maintained daily_attendance_summary table.
+
+One row per (user_id, local_date) holds the first checkin, the last checkout,
+the worked seconds, the number of sessions and the number of events for that
+day, using the pairing rules of app.work_sessions and REPORT_TIMEZONE days.
+
+Edits, deletes and manual entries (the crud helpers) recompute the rows of
+the days they can influence in the same transaction (via app.event_changes).
+Scans only queue the employee's timestamps on summary_refresher, which
+recomputes the same days shortly after the scan has committed, in its own
+transaction, so the scan transaction stays a single INSERT. Queued
+refreshes are per process; a refresh lost to a crash is repaired by the
+backfill below.
+Pairing only ever joins neighbouring events and a session is at most
+MAX_SESSION_HOURS long, so an event at t can only change the days between
+t - MAX_SESSION_HOURS and t + MAX_SESSION_HOURS.
+
+Events in archived months (app.archive) are read back from the archive
+files, so rebuilding those days does not drop them.
+
+Existing history (or a REPORT_TIMEZONE change) needs a backfill:
+
+    python -m app.daily_summary [--user-id ID]
+
+Rows written before split_by_day measured elapsed time were an hour off on
+days next to a DST change. --dst-days recomputes only the days around the
+offset changes of REPORT_TIMEZONE within each employee's history:
+
+    python -m app.daily_summary --dst-days
+"""
+import argparse
+import asyncio
+import os
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, insert, delete, func, cast, Integer
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models, partitions
+from app.archive import archive_store, merge_event_lists
+from app.database import AsyncSessionLocal
+from app.work_sessions import MAX_SESSION_HOURS, REPORT_TIMEZONE, SessionBuilder, split_by_day
+
+# First key of the two-key advisory lock taken while a user's rows are rewritten
+SUMMARY_LOCK_NAMESPACE = 7302
+
+SUMMARY_REFRESH_DELAY_MS = int(os.getenv("SUMMARY_REFRESH_DELAY_MS", 1000))  # Coalescing window for scan refreshes
+
+
+def _as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _local_midnight(day: date, tz) -> datetime:
+    return datetime.combine(day, datetime.min.time(), tzinfo=tz)
+
+
+def summarize_events(
+    user_id: int,
+    events: Iterable[Tuple[str, datetime]],
+    max_session_hours: Optional[float] = MAX_SESSION_HOURS,
+    tz=REPORT_TIMEZONE,
+) -> Dict[date, dict]:
+    """Build summary rows (column dicts) from (event_type, timestamp) pairs in timestamp order."""
+    days: Dict[date, dict] = {}
+
+    def row_for(day: date) -> dict:
+        if day not in days:
+            days[day] = {
+                "user_id": user_id, "local_date": day, "first_in": None, "last_out": None,
+                "worked_seconds": 0.0, "session_count": 0, "event_count": 0,
+            }
+        return days[day]
+
+    builder = SessionBuilder(user_id, max_session_hours=max_session_hours, tz=tz)
+    for event_type, timestamp in events:
+        timestamp = _as_utc(timestamp)
+        row = row_for(timestamp.astimezone(tz).date())
+        row["event_count"] += 1
+        if event_type == "checkin" and (row["first_in"] is None or timestamp < row["first_in"]):
+            row["first_in"] = timestamp
+        if event_type == "checkout" and (row["last_out"] is None or timestamp > row["last_out"]):
+            row["last_out"] = timestamp
+
+        session = builder.feed(event_type, timestamp)
+        if session is None:
+            continue
+        row_for(session.start.astimezone(tz).date())["session_count"] += 1
+        for day, seconds in split_by_day(session.start, session.end, tz):
+            row_for(day)["worked_seconds"] += seconds
+    return days
+
+
+async def _lock_user(db: AsyncSession, user_id: int):
+    if db.bind is not None and db.bind.dialect.name == "postgresql":
+        await db.execute(
+            select(func.pg_advisory_xact_lock(cast(SUMMARY_LOCK_NAMESPACE, Integer), cast(user_id, Integer)))
+        )
+
+
+async def _load_events(db: AsyncSession, user_id: int, start: Optional[datetime] = None, end: Optional[datetime] = None):
+    """(event_type, timestamp) of one employee's events in [start, end), archived months included."""
+    events = models.AttendanceEvent
+    query = select(events.id, events.event_type, events.timestamp).where(events.user_id == user_id)
+    if start is not None:
+        query = query.where(events.timestamp >= start)
+    if end is not None:
+        query = query.where(events.timestamp < end)
+    rows = (await db.execute(query.order_by(events.timestamp, events.id))).all()
+    if archive_store.covers(start, end):
+        # Otherwise rebuilding a range that reaches an archived month would wipe its days
+        archived = [
+            event for event in archive_store.read_events(start, end, user_id=user_id)
+            if end is None or _as_utc(event.timestamp) < _as_utc(end)
+        ]
+        rows = merge_event_lists(rows, archived)
+    return [(row.event_type, row.timestamp) for row in rows]
+
+
+async def _replace_rows(db: AsyncSession, user_id: int, rows: List[dict], first_day=None, last_day=None):
+    # Core statements, so rows loaded into the session earlier never clash with the new ones
+    summary = models.DailyAttendanceSummary
+    conditions = [summary.user_id == user_id]
+    if first_day is not None:
+        conditions += [summary.local_date >= first_day, summary.local_date <= last_day]
+    await db.execute(delete(summary).where(*conditions))
+    if rows:
+        await db.execute(insert(summary), rows)
+
+
+async def refresh_user_days(db: AsyncSession, user_id: int, timestamps: List[datetime]):
+    """
+    Recompute the summary rows around changed events of one employee.
+
+    Pass the timestamps of every inserted, edited (old and new) or deleted
+    event. Runs inside the caller's transaction and does not commit.
+    """
+    if not timestamps:
+        return
+    if not MAX_SESSION_HOURS:
+        # Sessions are unbounded, so any day may change
+        await rebuild_user(db, user_id)
+        return
+
+    tz = REPORT_TIMEZONE
+    margin = timedelta(hours=MAX_SESSION_HOURS)
+    first_day = (_as_utc(min(timestamps)) - margin).astimezone(tz).date()
+    last_day = (_as_utc(max(timestamps)) + margin).astimezone(tz).date()
+
+    # Any session touching those days starts and ends within one margin of them
+    window_start = _local_midnight(first_day, tz) - margin
+    window_end = _local_midnight(last_day + timedelta(days=1), tz) + margin
+
+    await _lock_user(db, user_id)
+    events = await _load_events(db, user_id, window_start, window_end)
+    days = summarize_events(user_id, events, tz=tz)
+
+    rows = [row for day, row in days.items() if first_day <= day <= last_day]
+    await _replace_rows(db, user_id, rows, first_day, last_day)
+
+
+async def rebuild_user(db: AsyncSession, user_id: int) -> int:
+    """Recompute every summary row of one employee. Does not commit."""
+    await _lock_user(db, user_id)
+    days = summarize_events(user_id, await _load_events(db, user_id))
+    await _replace_rows(db, user_id, list(days.values()))
+    return len(days)
+
+
+def offset_changes(start: datetime, end: datetime, tz=REPORT_TIMEZONE) -> List[datetime]:
+    """Local noon (in UTC) of each day between start and end on which tz changes its UTC offset."""
+    changes = []
+    day = _as_utc(start).astimezone(tz).date()
+    last_day = _as_utc(end).astimezone(tz).date()
+    previous = _local_midnight(day, tz).utcoffset()
+    while day <= last_day:
+        following = _local_midnight(day + timedelta(days=1), tz).utcoffset()
+        if following != previous:
+            changes.append((_local_midnight(day, tz) + timedelta(hours=12)).astimezone(timezone.utc))
+        previous = following
+        day += timedelta(days=1)
+    return changes
+
+
+async def refresh_offset_change_days(db: AsyncSession, user_id: int) -> int:
+    """Recompute the summary rows around every DST change in one employee's history. Does not commit."""
+    events = models.AttendanceEvent
+    first, last = (await db.execute(
+        select(func.min(events.timestamp), func.max(events.timestamp)).where(events.user_id == user_id)
+    )).one()
+    archived_months = archive_store.months()
+    if archived_months:
+        archived_start, _ = partitions.month_bounds(archived_months[0])
+        _, archived_end = partitions.month_bounds(archived_months[-1])
+        first = archived_start if first is None else min(_as_utc(first), archived_start)
+        last = archived_end if last is None else max(_as_utc(last), archived_end)
+    if first is None:
+        return 0
+    changes = offset_changes(first, last)
+    for change in changes:
+        await refresh_user_days(db, user_id, [change])
+    return len(changes)
+
+
+class SummaryRefresher:
+    """
+    Deferred refresh_user_days() for scans. Timestamps queued within
+    delay_ms are coalesced per employee and refreshed one transaction per
+    employee.
+    """
+
+    def __init__(self, session_factory, delay_ms: int = SUMMARY_REFRESH_DELAY_MS):
+        self.session_factory = session_factory
+        self.delay = delay_ms / 1000
+        self._pending: Dict[int, List[datetime]] = {}
+        self._task: Optional[asyncio.Task] = None
+        # Counters
+        self.refreshed = 0
+        self.failed = 0
+
+    def schedule(self, changes: Dict[int, List[datetime]]):
+        """Queue timestamps per user_id. Safe to call from synchronous code on the event loop."""
+        for user_id, timestamps in changes.items():
+            self._pending.setdefault(user_id, []).extend(timestamps)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # No loop (sync caller); picked up by the next scheduled or explicit flush
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        while self._pending:
+            await asyncio.sleep(self.delay)
+            await self.flush()
+
+    async def flush(self):
+        """Refresh everything queued so far."""
+        pending, self._pending = self._pending, {}
+        for user_id in sorted(pending):
+            try:
+                async with self.session_factory() as db:
+                    await refresh_user_days(db, user_id, pending[user_id])
+                    await db.commit()
+                self.refreshed += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"Daily summary refresh failed for user {user_id}: {e}. Run python -m app.daily_summary --user-id {user_id}")
+
+    async def stop(self):
+        """Cancel the timer and refresh what is queued before the worker exits."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending_employees": len(self._pending),
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+        }
+
+
+async def backfill(session_factory, user_id: Optional[int] = None, dst_days: bool = False):
+    """
+    Rebuild the table from the raw events, one transaction per employee.
+    With dst_days only the days around DST changes are recomputed.
+    """
+    async with session_factory() as db:
+        query = select(models.Employee.id).order_by(models.Employee.id)
+        if user_id is not None:
+            query = query.where(models.Employee.id == user_id)
+        user_ids = (await db.execute(query)).scalars().all()
+
+    total_rows = 0
+    for current_id in user_ids:
+        async with session_factory() as db:
+            if dst_days:
+                total_rows += await refresh_offset_change_days(db, current_id)
+            else:
+                total_rows += await rebuild_user(db, current_id)
+            await db.commit()
+    if dst_days:
+        print(f"Daily summary backfill: {total_rows} DST changes refreshed for {len(user_ids)} employees")
+    else:
+        print(f"Daily summary backfill: {total_rows} rows for {len(user_ids)} employees")
+    return total_rows
+
+
+summary_refresher = SummaryRefresher(AsyncSessionLocal)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild daily_attendance_summary from attendance events")
+    parser.add_argument("--user-id", type=int, default=None, help="Only rebuild this employee")
+    parser.add_argument("--dst-days", action="store_true", help="Only recompute the days around DST changes")
+    args = parser.parse_args()
+    asyncio.run(backfill(AsyncSessionLocal, user_id=args.user_id, dst_days=args.dst_days))
@@ -0,0 +1,69 @@
+# time_management/app/dashboard.py
+"""
+Data service behind the admin dashboard (/admin/).
+
+The counters come from a single aggregate query (employee count as a
+scalar subquery, today's checkins/checkouts as COUNT(*) FILTER) and the
+activity list from one LIMIT query, so rendering the dashboard does not
+load rows in proportion to the number of employees or events.
+"""
+from dataclasses import dataclass
+from datetime import datetime, time, timezone
+from typing import List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+from app import models
+
+RECENT_EVENTS_LIMIT = 10
+
+
+@dataclass
+class DashboardData:
+    employee_count: int
+    checkin_count: int
+    checkout_count: int
+    recent_events: List[models.AttendanceEvent]
+
+
+def today_bounds(now: Optional[datetime] = None):
+    """Start and end of the current UTC day."""
+    now = now or datetime.now(timezone.utc)
+    return (
+        datetime.combine(now.date(), time.min).replace(tzinfo=timezone.utc),
+        datetime.combine(now.date(), time.max).replace(tzinfo=timezone.utc),
+    )
+
+
+async def dashboard_data(db: AsyncSession, now: Optional[datetime] = None) -> DashboardData:
+    today_start, today_end = today_bounds(now)
+    events = models.AttendanceEvent
+    in_today = (events.timestamp >= today_start, events.timestamp <= today_end)
+
+    counts = (await db.execute(
+        select(
+            select(func.count(models.Employee.id)).scalar_subquery(),
+            func.count().filter(events.event_type == "checkin"),
+            func.count().filter(events.event_type == "checkout"),
+        )
+        .select_from(events)
+        .where(*in_today)
+    )).one()
+
+    result = await db.execute(
+        select(events)
+        .options(joinedload(events.employee))
+        .where(*in_today)
+        .order_by(events.timestamp.desc(), events.id.desc())
+        .limit(RECENT_EVENTS_LIMIT)
+    )
+
+    employee_count, checkin_count, checkout_count = counts
+    return DashboardData(
+        employee_count=employee_count,
+        checkin_count=checkin_count,
+        checkout_count=checkout_count,
+        recent_events=list(result.scalars()),
+    )
@@ -0,0 +1,120 @@
+# time_management/app/event_changes.py
+"""
+Bookkeeping for attendance events written in the current transaction.
+
+Every write path calls one of these right before committing, with the
+timestamps of the events it inserted, edited (old and new values) or
+deleted. The crud helpers (manual entries, edits, deletes) call
+events_changed(); live and batch scans call events_appended(), which keeps
+the summary work out of the scan transaction:
+
+* daily_attendance_summary rows around those timestamps are recomputed,
+  in the same transaction for events_changed() and by
+  daily_summary.summary_refresher once the scan has committed for
+  events_appended();
+* edits, deletes and backdated writes leave a changed_at mark on each UTC
+  day they touch (event_change_marks). Report jobs compare those marks,
+  and the timestamps of live events, with their own start time when they
+  are read (changed_since()), so nothing is written to report_jobs here;
+* cached report downloads covering them are dropped once the transaction
+  commits (app.report_cache).
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import event, exists, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app import models, daily_summary
+from app.report_cache import note_changed_range
+
+_PENDING_SUMMARY = "pending_summary_refresh"
+
+# A live scan's timestamp is taken shortly before it commits; an event this
+# much older than a job's start may still have been invisible to the job
+CHANGE_MARGIN = timedelta(seconds=60)
+
+
+def _as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+async def events_changed(db: AsyncSession, changes: Dict[int, List[datetime]]):
+    """changes maps user_id to the timestamps touched for that employee. Does not commit."""
+    changes = {user_id: timestamps for user_id, timestamps in changes.items() if timestamps}
+    if not changes:
+        return
+    # Sorted, so concurrent writers take the per-employee locks in the same order
+    for user_id in sorted(changes):
+        await daily_summary.refresh_user_days(db, user_id, changes[user_id])
+
+    all_timestamps = [timestamp for timestamps in changes.values() for timestamp in timestamps]
+    await _mark_days(db, all_timestamps)
+    note_changed_range(db, min(all_timestamps), max(all_timestamps))
+
+
+async def events_appended(db: AsyncSession, changes: Dict[int, List[datetime]]):
+    """Like events_changed() for newly scanned events; the summary refresh runs after commit."""
+    changes = {user_id: timestamps for user_id, timestamps in changes.items() if timestamps}
+    if not changes:
+        return
+    pending = db.info.setdefault(_PENDING_SUMMARY, {})
+    for user_id, timestamps in changes.items():
+        pending.setdefault(user_id, []).extend(timestamps)
+    all_timestamps = [timestamp for timestamps in changes.values() for timestamp in timestamps]
+    # Live scans are recognised by their timestamps; only backlog replays need a mark
+    backdated_before = datetime.now(timezone.utc) - CHANGE_MARGIN
+    await _mark_days(db, [timestamp for timestamp in all_timestamps if _as_utc(timestamp) < backdated_before])
+    note_changed_range(db, min(all_timestamps), max(all_timestamps))
+
+
+async def _mark_days(db: AsyncSession, timestamps: Iterable[datetime]):
+    days = sorted({_as_utc(timestamp).date() for timestamp in timestamps})
+    if not days:
+        return
+    marks = models.EventChangeMark.__table__
+    dialect = postgresql if db.bind is not None and db.bind.dialect.name == "postgresql" else sqlite
+    statement = dialect.insert(marks).values([{"day": day, "changed_at": datetime.now(timezone.utc)} for day in days])
+    await db.execute(statement.on_conflict_do_update(
+        index_elements=[marks.c.day], set_={"changed_at": statement.excluded.changed_at}
+    ))
+
+
+async def changed_since(
+    db: AsyncSession, range_start: Optional[datetime], range_end: Optional[datetime], since: datetime
+) -> bool:
+    """True if an event in [range_start, range_end] may have been written after since."""
+    since = _as_utc(since) - CHANGE_MARGIN
+    range_start = _as_utc(range_start) if range_start is not None else None
+    range_end = _as_utc(range_end) if range_end is not None else None
+
+    events = models.AttendanceEvent
+    live = [events.timestamp > max(since, range_start) if range_start is not None else events.timestamp > since]
+    if range_end is not None:
+        live.append(events.timestamp <= range_end)
+
+    marks = models.EventChangeMark
+    marked = [marks.changed_at > since]
+    if range_start is not None:
+        marked.append(marks.day >= range_start.date())
+    if range_end is not None:
+        marked.append(marks.day <= range_end.date())
+
+    result = await db.execute(select(or_(exists().where(*live), exists().where(*marked))))
+    return bool(result.scalar())
+
+
+@event.listens_for(Session, "after_commit")
+def _schedule_summary_refresh(session):
+    pending = session.info.pop(_PENDING_SUMMARY, None)
+    if pending:
+        daily_summary.summary_refresher.schedule(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_summary_refresh(session):
+    session.info.pop(_PENDING_SUMMARY, None)
@@ -0,0 +1,165 @@
+# time_management/app/ingest_queue.py
+"""
+Write-behind queue for RFID scans (group commit).
+
+With SCAN_INGEST_MODE=queued, /api/scan acknowledges a scan once it is in
+this in-process queue. A background task drains the queue in micro-batches
+(SCAN_QUEUE_BATCH_SIZE scans, or whatever arrived within
+SCAN_QUEUE_MAX_LATENCY_MS). Each micro-batch is written with the batch scan
+engine in one transaction, so a burst of scans shares one WAL flush instead
+of paying one commit each. The cooldown and toggle rules are still decided
+by the database at flush time.
+"""
+import asyncio
+import os
+import time
+from typing import List, Optional
+
+from app import schemas, scan_engine
+from app.database import AsyncSessionLocal
+
+SCAN_INGEST_MODE = os.getenv("SCAN_INGEST_MODE", "direct")  # "direct" or "queued"
+SCAN_QUEUE_BATCH_SIZE = int(os.getenv("SCAN_QUEUE_BATCH_SIZE", 200))
+SCAN_QUEUE_MAX_LATENCY_MS = int(os.getenv("SCAN_QUEUE_MAX_LATENCY_MS", 50))
+SCAN_QUEUE_MAX_DEPTH = int(os.getenv("SCAN_QUEUE_MAX_DEPTH", 10000))
+SCAN_QUEUE_FLUSH_ATTEMPTS = 3
+
+_STOP = object()
+
+
+class QueueFull(Exception):
+    """Raised when the queue is at SCAN_QUEUE_MAX_DEPTH (or not running)."""
+
+
+class ScanIngestQueue:
+    def __init__(
+        self,
+        session_factory,
+        batch_size: int = SCAN_QUEUE_BATCH_SIZE,
+        max_latency_ms: int = SCAN_QUEUE_MAX_LATENCY_MS,
+        max_depth: int = SCAN_QUEUE_MAX_DEPTH,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.max_latency = max_latency_ms / 1000
+        self.max_depth = max_depth
+        self.cooldown_seconds = 0
+        self.running = False
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        # Counters
+        self.enqueued = 0
+        self.recorded = 0
+        self.rejected = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_flush_ms = None
+        self.max_flush_ms = 0.0
+        self.last_wait_ms = None  # Time the oldest scan of the last batch spent waiting for its commit
+
+    async def start(self, cooldown_seconds: int):
+        if self.running:
+            return
+        self.cooldown_seconds = cooldown_seconds
+        self._queue = asyncio.Queue()
+        self.running = True
+        self._worker = asyncio.create_task(self._run())
+        print(f"Scan ingest queue started (batch size {self.batch_size}, max latency {self.max_latency * 1000:.0f} ms)")
+
+    async def stop(self):
+        """Stop accepting scans and wait until everything already queued is committed."""
+        if not self.running:
+            return
+        self.running = False
+        self._queue.put_nowait(_STOP)
+        await self._worker
+        self._worker = None
+        print(f"Scan ingest queue drained and stopped ({self.recorded} recorded, {self.failed} failed)")
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def enqueue(self, item: schemas.BatchScanItem):
+        if not self.running:
+            raise QueueFull("Scan ingest queue is not running")
+        if self.depth >= self.max_depth:
+            raise QueueFull(f"Scan ingest queue is full ({self.max_depth} scans pending)")
+        self._queue.put_nowait((item, time.monotonic()))
+        self.enqueued += 1
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            entry = await self._queue.get()
+            if entry is _STOP:
+                break
+            batch = [entry]
+            deadline = loop.time() + self.max_latency
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    entry = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+            await self._flush(batch)
+
+        # Drain whatever raced in before the stop marker
+        remaining = []
+        while not self._queue.empty():
+            entry = self._queue.get_nowait()
+            if entry is not _STOP:
+                remaining.append(entry)
+        for start in range(0, len(remaining), self.batch_size):
+            await self._flush(remaining[start:start + self.batch_size])
+
+    async def _flush(self, batch: List[tuple]):
+        items = [item for item, _ in batch]
+        started = time.monotonic()
+        for attempt in range(1, SCAN_QUEUE_FLUSH_ATTEMPTS + 1):
+            try:
+                async with self.session_factory() as db:
+                    results = await scan_engine.record_scan_batch(db, items, self.cooldown_seconds)
+                break
+            except Exception as e:
+                print(f"Scan ingest queue: attempt {attempt} to write {len(items)} scans failed: {e}")
+                if attempt == SCAN_QUEUE_FLUSH_ATTEMPTS:
+                    # These scans were already acknowledged; make the loss visible in the stats
+                    self.failed += len(items)
+                    return
+                await asyncio.sleep(0.5 * attempt)
+        finished = time.monotonic()
+
+        recorded = sum(1 for result in results if result.status == "recorded")
+        self.recorded += recorded
+        self.rejected += len(results) - recorded
+        self.batches += 1
+        self.last_flush_ms = (finished - started) * 1000
+        self.max_flush_ms = max(self.max_flush_ms, self.last_flush_ms)
+        self.last_wait_ms = (finished - min(enqueued_at for _, enqueued_at in batch)) * 1000
+
+    def stats(self) -> dict:
+        return {
+            "mode": SCAN_INGEST_MODE,
+            "running": self.running,
+            "depth": self.depth,
+            "enqueued": self.enqueued,
+            "recorded": self.recorded,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "batches": self.batches,
+            "last_flush_ms": round(self.last_flush_ms, 2) if self.last_flush_ms is not None else None,
+            "max_flush_ms": round(self.max_flush_ms, 2),
+            "last_wait_ms": round(self.last_wait_ms, 2) if self.last_wait_ms is not None else None,
+        }
+
+
+# Shared instance, started by app.main when SCAN_INGEST_MODE=queued
+scan_queue = ScanIngestQueue(AsyncSessionLocal)
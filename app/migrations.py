@@ -0,0 +1,60 @@
+# time_management/app/migrations.py
+"""
+Versioned schema migrations (Alembic, scripts in migrations/versions).
+
+upgrade_database() brings a database to the latest revision. A database
+that was created by Base.metadata.create_all before migrations existed
+has the tables but no alembic_version row; it is stamped at the baseline
+revision first, so only the later migrations run against it.
+
+Usage:
+    python -m app.migrations                # upgrade to head
+    python -m app.migrations --revision 0001
+    alembic downgrade -1                    # the usual Alembic commands work too
+"""
+import argparse
+import os
+from typing import Optional
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, inspect, pool
+
+from app.database import DATABASE_URL
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_REVISION = "0001"
+
+
+def alembic_config(url: Optional[str] = None, configure_logger: bool = False) -> Config:
+    config = Config(os.path.join(PROJECT_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(PROJECT_DIR, "migrations"))
+    config.set_main_option("sqlalchemy.url", (url or DATABASE_URL).replace("%", "%%"))
+    # Keep the application's own logging setup when called from the app or tests
+    config.attributes["configure_logger"] = configure_logger
+    return config
+
+
+def needs_baseline_stamp(url: Optional[str] = None) -> bool:
+    """True for a database created by create_all that has never been migrated."""
+    engine = create_engine(url or DATABASE_URL, poolclass=pool.NullPool)
+    try:
+        inspector = inspect(engine)
+        return inspector.has_table("employees") and not inspector.has_table("alembic_version")
+    finally:
+        engine.dispose()
+
+
+def upgrade_database(url: Optional[str] = None, revision: str = "head", configure_logger: bool = False):
+    config = alembic_config(url, configure_logger)
+    if needs_baseline_stamp(url):
+        print(f"Existing schema without migration history; stamping revision {BASELINE_REVISION}")
+        command.stamp(config, BASELINE_REVISION)
+    command.upgrade(config, revision)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply schema migrations")
+    parser.add_argument("--revision", default="head", help="Target revision (default: head)")
+    args = parser.parse_args()
+    upgrade_database(revision=args.revision, configure_logger=True)
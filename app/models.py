@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Date, Float, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 from .database import Base
@@ -35,3 +35,73 @@ class AttendanceEvent(Base):
     notes = Column(String, nullable=True)  # Add notes field
 
     employee = relationship("Employee", back_populates="attendance_events")
+
+
+# Created by migrations/versions/0002_attendance_event_indexes.py and 0005_event_list_indexes.py
+# Latest event per employee (scan toggle/cooldown, last-event cache)
+Index(
+    "ix_attendance_events_user_ts",
+    AttendanceEvent.user_id, AttendanceEvent.timestamp.desc(), AttendanceEvent.id.desc(),
+)
+# Range scans for reports and exports; tiny because rows arrive in time order
+Index("ix_attendance_events_ts_brin", AttendanceEvent.timestamp, postgresql_using="brin")
+# Event lists (unfiltered, and by event type) paged newest first by (timestamp, id)
+Index("ix_attendance_events_ts_id", AttendanceEvent.timestamp.desc(), AttendanceEvent.id.desc())
+Index(
+    "ix_attendance_events_type_ts",
+    AttendanceEvent.event_type, AttendanceEvent.timestamp.desc(), AttendanceEvent.id.desc(),
+)
+# Manual corrections listed newest first
+Index(
+    "ix_attendance_events_manual_ts",
+    AttendanceEvent.timestamp.desc(), AttendanceEvent.id.desc(),
+    postgresql_where=AttendanceEvent.manual == True,  # noqa: E712
+    sqlite_where=AttendanceEvent.manual == True,  # noqa: E712
+)
+
+
+class DailyAttendanceSummary(Base):
+    """Per-employee, per-day totals kept up to date by app.daily_summary"""
+    __tablename__ = "daily_attendance_summary"
+
+    user_id = Column(Integer, ForeignKey("employees.id", ondelete="CASCADE"), primary_key=True)
+    local_date = Column(Date, primary_key=True)  # Calendar day in REPORT_TIMEZONE
+    first_in = Column(DateTime(timezone=True), nullable=True)  # Earliest checkin on the day
+    last_out = Column(DateTime(timezone=True), nullable=True)  # Latest checkout on the day
+    worked_seconds = Column(Float, nullable=False, default=0.0)
+    session_count = Column(Integer, nullable=False, default=0)  # Sessions that started on the day
+    event_count = Column(Integer, nullable=False, default=0)
+
+
+class ReportJob(Base):
+    """Background report/export computed by app.report_jobs"""
+    __tablename__ = "report_jobs"
+
+    id = Column(String, primary_key=True)  # uuid4 hex
+    params_key = Column(String, index=True)  # Hash of the normalized parameters, for reuse
+    params = Column(JSON, nullable=False)
+    status = Column(String, index=True, nullable=False, default="queued")  # queued, running, done, failed
+    stale = Column(Boolean, nullable=False, default=False)  # Superseded by a newer result; see also event_changes.changed_since
+    range_start = Column(DateTime(timezone=True), nullable=True)  # None means unbounded
+    range_end = Column(DateTime(timezone=True), nullable=True)
+    rows_done = Column(Integer, nullable=False, default=0)
+    rows_total = Column(Integer, nullable=True)
+    file_path = Column(String, nullable=True)
+    file_size = Column(Integer, nullable=True)
+    media_type = Column(String, nullable=True)
+    filename = Column(String, nullable=True)
+    error = Column(String, nullable=True)
+    created_by = Column(Integer, ForeignKey("employees.id", ondelete="SET NULL"), nullable=True)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)  # Renewed while running; past it the runner is presumed dead
+
+
+
+class EventChangeMark(Base):
+    """Last time an event on a UTC day was edited, deleted or written backdated (app.event_changes)"""
+    __tablename__ = "event_change_marks"
+
+    day = Column(Date, primary_key=True)
+    changed_at = Column(DateTime(timezone=True), nullable=False)
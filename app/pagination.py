@@ -0,0 +1,77 @@
+# time_management/app/pagination.py
+"""
+Keyset pagination for attendance event lists.
+
+Lists are ordered newest first by (timestamp, id). The cursor is an opaque
+token for the last row of a page, and the next page is read with
+(timestamp, id) < cursor. Each list shape has a matching btree index, so a
+page is an index range scan of limit + 1 entries no matter how far into
+the list it is: (timestamp DESC, id DESC) for unfiltered lists,
+(event_type, timestamp DESC, id DESC) for /api/checkin and /api/checkout,
+(user_id, timestamp DESC, id DESC) per employee and the partial manual
+index for manual entries. Other filter combinations (username, date
+ranges on their own) walk the (timestamp, id) index and filter as they go.
+"""
+import base64
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import tuple_
+
+from app import models
+
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", 100))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 1000))
+
+
+class InvalidCursor(ValueError):
+    """The cursor was not produced by encode_cursor."""
+
+
+@dataclass
+class EventPage:
+    events: List[models.AttendanceEvent]
+    next_cursor: Optional[str]  # None on the last page
+
+
+def encode_cursor(timestamp: datetime, event_id: int) -> str:
+    raw = f"{timestamp.isoformat()}|{event_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, event_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(timestamp), int(event_id)
+    except ValueError as e:  # Covers binascii.Error and UnicodeDecodeError
+        raise InvalidCursor("Invalid pagination cursor") from e
+
+
+def clamp_page_size(limit: Optional[int]) -> int:
+    if not limit or limit < 1:
+        return DEFAULT_PAGE_SIZE
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def after_cursor(cursor: str):
+    """Condition selecting the rows that come after the cursor (newest first)."""
+    timestamp, event_id = decode_cursor(cursor)
+    events = models.AttendanceEvent
+    return tuple_(events.timestamp, events.id) < tuple_(timestamp, event_id)
+
+
+def newest_first():
+    events = models.AttendanceEvent
+    return events.timestamp.desc(), events.id.desc()
+
+
+def page_from_rows(rows: list, limit: int) -> EventPage:
+    """Build a page from up to limit + 1 rows; the extra row only says there is more."""
+    if len(rows) <= limit:
+        return EventPage(events=rows, next_cursor=None)
+    rows = rows[:limit]
+    last = rows[-1]
+    return EventPage(events=rows, next_cursor=encode_cursor(last.timestamp, last.id))
@@ -0,0 +1,163 @@
+# time_management/app/partitions.py
+"""
+Monthly range partitioning of attendance_events on PostgreSQL.
+
+Migration 0003 (which carries its own copy of the conversion DDL) turns
+attendance_events into a table partitioned by RANGE (timestamp), one
+partition per UTC calendar month named attendance_events_yYYYYmMM, plus
+attendance_events_default for anything outside the created months. The
+ORM mapping and every query stay the same; queries with a timestamp range
+only touch the months they cover.
+
+ensure_partitions() creates the partitions for the current month and the
+next PARTITION_MONTHS_AHEAD months. It runs at startup and should also run
+daily from cron (python -m app.partitions). Rows that already landed in the
+default partition for a month are moved into the new partition.
+
+Retention is a DETACH: detach_partitions_before() turns old months into
+standalone tables that can be archived and dropped without a mass DELETE.
+
+Everything here is a no-op on other databases (SQLite in the tests).
+"""
+import argparse
+import asyncio
+import os
+import re
+from datetime import date, datetime, timezone
+from typing import List, Optional, Set
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+PARENT_TABLE = "attendance_events"
+DEFAULT_PARTITION = "attendance_events_default"
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", 3))
+PARTITION_LOCK_NAMESPACE = 7303
+
+_PARTITION_NAME = re.compile(r"^attendance_events_y(\d{4})m(\d{2})$")
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"attendance_events_y{month.year:04d}m{month.month:02d}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    match = _PARTITION_NAME.match(name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+def month_bounds(month: date):
+    """UTC timestamps [start, end) covered by a month's partition."""
+    start = datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+    following = add_months(month, 1)
+    return start, datetime(following.year, following.month, 1, tzinfo=timezone.utc)
+
+
+def months_between(first: date, last: date) -> List[date]:
+    months = []
+    month = first.replace(day=1)
+    while month <= last:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def is_partitioned(connection: Connection) -> bool:
+    if connection.dialect.name != "postgresql":
+        return False
+    return bool(connection.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+        "WHERE c.relname = :table AND pg_table_is_visible(c.oid))"
+    ), {"table": PARENT_TABLE}).scalar())
+
+
+def existing_partitions(connection: Connection) -> Set[str]:
+    result = connection.execute(text(
+        "SELECT child.relname FROM pg_inherits i "
+        "JOIN pg_class child ON child.oid = i.inhrelid "
+        "JOIN pg_class parent ON parent.oid = i.inhparent "
+        "WHERE parent.relname = :table AND pg_table_is_visible(parent.oid)"
+    ), {"table": PARENT_TABLE})
+    return set(result.scalars())
+
+
+def _lock(connection: Connection):
+    """Serialize partition DDL between workers/cron for the rest of the transaction."""
+    connection.execute(text("SELECT pg_advisory_xact_lock(:namespace, 0)"), {"namespace": PARTITION_LOCK_NAMESPACE})
+
+
+def create_month_partition(connection: Connection, month: date):
+    """
+    Create and attach one month. Built as a standalone table first so rows
+    already in the default partition can be moved over before ATTACH
+    checks the default partition's constraint.
+    """
+    name = partition_name(month)
+    start, end = month_bounds(month)
+    connection.execute(text(f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS)"))
+    if DEFAULT_PARTITION in existing_partitions(connection):
+        connection.execute(text(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE timestamp >= :start AND timestamp < :end RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ), {"start": start, "end": end})
+    connection.execute(text(
+        f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    ))
+
+
+def ensure_partitions(connection: Connection, months_ahead: int = PARTITION_MONTHS_AHEAD, today: Optional[date] = None) -> List[str]:
+    """Create missing partitions from the current month through months_ahead. Returns the new names."""
+    if not is_partitioned(connection):
+        return []
+    _lock(connection)
+    current = (today or datetime.now(timezone.utc).date()).replace(day=1)
+    present = existing_partitions(connection)
+    created = []
+    for month in months_between(current, add_months(current, months_ahead)):
+        if partition_name(month) not in present:
+            create_month_partition(connection, month)
+            created.append(partition_name(month))
+    return created
+
+
+def detach_partitions_before(connection: Connection, cutoff: date) -> List[str]:
+    """Detach every month before cutoff's month; the tables stay behind for archiving or DROP."""
+    if not is_partitioned(connection):
+        return []
+    _lock(connection)
+    detached = []
+    for name in sorted(existing_partitions(connection)):
+        month = partition_month(name)
+        if month is not None and month < cutoff.replace(day=1):
+            connection.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+            detached.append(name)
+    return detached
+
+
+async def _run_cli(args):
+    from app.database import async_engine
+
+    async with async_engine.begin() as connection:
+        if not await connection.run_sync(is_partitioned):
+            print("attendance_events is not partitioned; nothing to do")
+            return
+        created = await connection.run_sync(ensure_partitions, args.months_ahead)
+        print(f"Partitions created: {', '.join(created) or 'none'}")
+        if args.detach_before:
+            detached = await connection.run_sync(detach_partitions_before, args.detach_before)
+            print(f"Partitions detached: {', '.join(detached) or 'none'}")
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create upcoming attendance_events partitions")
+    parser.add_argument("--months-ahead", type=int, default=PARTITION_MONTHS_AHEAD, help="Months to create beyond the current one")
+    parser.add_argument("--detach-before", type=date.fromisoformat, default=None, help="Also detach months before this date (YYYY-MM-DD)")
+    args = parser.parse_args()
+    asyncio.run(_run_cli(args))
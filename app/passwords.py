@@ -0,0 +1,90 @@
+# time_management/app/passwords.py
+"""
+Password hashing off the event loop.
+
+bcrypt is deliberately slow (~250ms at the default cost), and a call made
+on the event loop stalls every request on the worker, scans included.
+hash_password() and verify_password() run it on a small dedicated thread
+pool instead: bcrypt releases the GIL while hashing, so the loop keeps
+serving requests, and PASSWORD_HASH_WORKERS bounds how many CPU cores
+logins can take at once. Further callers wait for a free worker.
+
+The cost factor is BCRYPT_ROUNDS. Hashes made with a different cost are
+reported by verify_password() with a replacement hash, so callers can
+store it and existing passwords move to the new cost as users log in.
+"""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+
+
+def password_context(rounds: int = BCRYPT_ROUNDS) -> CryptContext:
+    # min == max == default, so a hash with any other cost needs an update
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+
+pwd_context = password_context()
+
+
+def _verify_and_update(password: str, hashed_password: Optional[str]) -> Tuple[bool, Optional[str]]:
+    # Employees created without a password have an empty hash; they cannot log in
+    if not hashed_password or not pwd_context.identify(hashed_password):
+        return False, None
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+class PasswordHasher:
+    """Runs bcrypt on a bounded thread pool, created on first use."""
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS):
+        self.workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    async def _run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._pool(), function, *args)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(lambda: pwd_context.hash(password))
+
+    async def verify(self, password: str, hashed_password: Optional[str]) -> Tuple[bool, Optional[str]]:
+        return await self._run(_verify_and_update, password, hashed_password)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+# Shared instance for the API and admin routes
+password_hasher = PasswordHasher()
+
+
+async def hash_password(password: str) -> str:
+    return await password_hasher.hash(password)
+
+
+async def verify_password(password: str, hashed_password: Optional[str]) -> Tuple[bool, Optional[str]]:
+    """(matches, new_hash): new_hash is set when the stored hash should be replaced."""
+    return await password_hasher.verify(password, hashed_password)
+
+
+def hash_password_sync(password: str) -> str:
+    """For code that already runs off the event loop (scripts, sync sessions, tests)."""
+    return pwd_context.hash(password)
@@ -0,0 +1,156 @@
+# time_management/app/reader_auth.py
+"""
+Device credentials for RFID readers.
+
+Each reader has its own key, derived from READER_MASTER_KEY and the
+reader id, so the server stores nothing per device:
+
+    python -m app.reader_auth entrance     # prints the key for reader "entrance"
+
+A reader signs every /scan and /scan/batch request instead of logging in:
+
+    X-Reader-Id:        entrance
+    X-Reader-Timestamp: 1717171717              (unix seconds)
+    X-Reader-Signature: hex HMAC-SHA256(key, canonical_request(...))
+
+The server re-derives the key and compares signatures in constant time:
+no database lookup, no bcrypt and no token to expire. Requests older (or
+newer) than READER_SIGNATURE_MAX_AGE_SECONDS are rejected, and a signature
+is accepted once per worker inside that window. Readers listed in
+READER_REVOKED_IDS are refused; to rotate every key, change the master key.
+
+READER_AUTH_MODE="optional" (default) still accepts unsigned scans, as
+before; "required" rejects them.
+
+A refused signature is answered with 401 and an X-Reader-Auth-Error
+header naming the reason. Only "invalid_signature" and "revoked" mean the
+device key itself is wrong; the others (expired, bad_timestamp, replayed,
+not_configured) can pass on a retry once clocks or the server are fixed,
+so readers keep those scans.
+"""
+import argparse
+import hashlib
+import hmac
+import os
+import time
+from typing import Dict, Optional
+
+from fastapi import HTTPException, Request, status
+
+READER_MASTER_KEY = os.getenv("READER_MASTER_KEY", "")
+READER_AUTH_MODE = os.getenv("READER_AUTH_MODE", "optional")  # "optional" or "required"
+READER_SIGNATURE_MAX_AGE_SECONDS = int(os.getenv("READER_SIGNATURE_MAX_AGE_SECONDS", 300))
+READER_REVOKED_IDS = frozenset(filter(None, (item.strip() for item in os.getenv("READER_REVOKED_IDS", "").split(","))))
+
+READER_ID_HEADER = "X-Reader-Id"
+TIMESTAMP_HEADER = "X-Reader-Timestamp"
+SIGNATURE_HEADER = "X-Reader-Signature"
+AUTH_ERROR_HEADER = "X-Reader-Auth-Error"
+
+# Reasons that a retry of the same scan cannot fix
+PERMANENT_REASONS = frozenset({"invalid_signature", "revoked"})
+
+
+class SignatureError(Exception):
+    """A reader signature that must not be accepted; reason is sent in AUTH_ERROR_HEADER."""
+
+    def __init__(self, message: str, reason: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+def device_key(reader_id: str, master_key: Optional[str] = None) -> str:
+    master_key = master_key if master_key is not None else READER_MASTER_KEY
+    if not master_key:
+        raise SignatureError("Reader keys are not configured (READER_MASTER_KEY)", "not_configured")
+    return hmac.new(master_key.encode(), f"reader:{reader_id}".encode(), hashlib.sha256).hexdigest()
+
+
+def canonical_request(method: str, path: str, timestamp: str, body: bytes) -> bytes:
+    return "\n".join([method.upper(), path, timestamp, hashlib.sha256(body).hexdigest()]).encode()
+
+
+def sign(key: str, method: str, path: str, timestamp: str, body: bytes) -> str:
+    return hmac.new(key.encode(), canonical_request(method, path, timestamp, body), hashlib.sha256).hexdigest()
+
+
+class ReplayGuard:
+    """Signatures seen in the last max_age seconds (process-local)."""
+
+    def __init__(self, max_age_seconds: int = READER_SIGNATURE_MAX_AGE_SECONDS):
+        self.max_age_seconds = max_age_seconds
+        self._seen: Dict[str, float] = {}
+
+    def check(self, signature: str, now: float):
+        if len(self._seen) > 1000:
+            self._seen = {seen: expires for seen, expires in self._seen.items() if expires > now}
+        expires = self._seen.get(signature)
+        if expires is not None and expires > now:
+            raise SignatureError("Request was already used", "replayed")
+        # Past the window the timestamp check rejects the request anyway
+        self._seen[signature] = now + 2 * self.max_age_seconds
+
+    def clear(self):
+        self._seen.clear()
+
+
+replay_guard = ReplayGuard()
+
+
+def verify_signature(
+    reader_id: str,
+    timestamp: str,
+    signature: str,
+    method: str,
+    path: str,
+    body: bytes,
+    now: Optional[float] = None,
+) -> str:
+    """Return reader_id if the signature is valid, else raise SignatureError."""
+    now = time.time() if now is None else now
+    if reader_id in READER_REVOKED_IDS:
+        raise SignatureError(f"Reader {reader_id} is revoked", "revoked")
+    try:
+        signed_at = int(timestamp)
+    except (TypeError, ValueError):
+        raise SignatureError("Invalid timestamp", "bad_timestamp")
+    if abs(now - signed_at) > READER_SIGNATURE_MAX_AGE_SECONDS:
+        raise SignatureError("Signature expired", "expired")
+    expected = sign(device_key(reader_id), method, path, timestamp, body)
+    if not hmac.compare_digest(expected, signature.lower()):
+        raise SignatureError("Invalid signature", "invalid_signature")
+    replay_guard.check(signature.lower(), now)
+    return reader_id
+
+
+async def get_scan_reader(request: Request) -> Optional[str]:
+    """
+    Dependency for the scan endpoints: the id of the reader that signed the
+    request, or None for an unsigned request (allowed in "optional" mode).
+    """
+    reader_id = request.headers.get(READER_ID_HEADER)
+    if reader_id is None:
+        if READER_AUTH_MODE == "required":
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Signed reader request required")
+        return None
+    try:
+        return verify_signature(
+            reader_id,
+            request.headers.get(TIMESTAMP_HEADER),
+            request.headers.get(SIGNATURE_HEADER, ""),
+            request.method,
+            request.url.path,
+            await request.body(),
+        )
+    except SignatureError as e:
+        print(f"Rejected scan from reader {reader_id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail=str(e), headers={AUTH_ERROR_HEADER: e.reason}
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print the device key of an RFID reader")
+    parser.add_argument("reader_id", help="Reader id, sent as X-Reader-Id")
+    args = parser.parse_args()
+    print(device_key(args.reader_id))
@@ -0,0 +1,203 @@
+# time_management/app/report_cache.py
+"""
+In-memory cache of finished report/export downloads.
+
+Entries are keyed by the normalized parameter fingerprint used for report
+jobs (app.report_jobs.params_key), so "last month" clicked twice is served
+from memory the second time. The cache is LRU-ordered and bounded by
+REPORT_CACHE_MAX_BYTES. Results larger than REPORT_CACHE_MAX_ENTRY_BYTES
+are streamed but not kept.
+
+Writers note the timestamps they touched with note_changed_range() (called
+by app.event_changes). After the transaction commits, every entry whose
+date range contains one of them is dropped. A result whose computation
+overlapped an invalidation is not stored, so an entry never predates a
+committed write it should reflect. Writes outside an entry's range (today's
+scans for last month's report) do not affect it.
+
+That invalidation is per process. Writes committed by other worker
+processes are caught when an entry is served: the endpoint asks
+app.event_changes.changed_since() whether an event in the entry's range
+may have been written since its computation started, and drops it if so.
+REPORT_CACHE_TTL_SECONDS additionally bounds an entry's age (0 keeps
+entries until they are evicted or invalidated).
+"""
+import os
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+REPORT_CACHE_MAX_BYTES = int(os.getenv("REPORT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+REPORT_CACHE_MAX_ENTRY_BYTES = int(os.getenv("REPORT_CACHE_MAX_ENTRY_BYTES", 16 * 1024 * 1024))
+REPORT_CACHE_TTL_SECONDS = int(os.getenv("REPORT_CACHE_TTL_SECONDS", 0))
+RECENT_INVALIDATIONS = 1000  # Ranges remembered for results still being computed
+
+_CHANGED_RANGES = "report_cache_changed_ranges"
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None or value.tzinfo is not None:
+        return value
+    return value.replace(tzinfo=timezone.utc)
+
+
+@dataclass
+class CachedResult:
+    body: bytes
+    media_type: str
+    range_start: Optional[datetime]  # None means unbounded
+    range_end: Optional[datetime]
+    created: float
+    computed_at: datetime  # Wall clock when the computation started, for changed_since()
+
+    def overlaps(self, earliest: datetime, latest: datetime) -> bool:
+        return _overlaps(self.range_start, self.range_end, earliest, latest)
+
+
+def _overlaps(range_start, range_end, earliest: datetime, latest: datetime) -> bool:
+    return (range_start is None or range_start <= latest) and (range_end is None or range_end >= earliest)
+
+
+class ReportResultCache:
+    def __init__(self, max_bytes: int = REPORT_CACHE_MAX_BYTES, max_entry_bytes: int = REPORT_CACHE_MAX_ENTRY_BYTES, ttl_seconds: int = REPORT_CACHE_TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = min(max_entry_bytes, max_bytes)
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, CachedResult]" = OrderedDict()
+        self.size = 0
+        self.generation = 0  # Bumped by every invalidation
+        self._recent = deque(maxlen=RECENT_INVALIDATIONS)  # (generation, earliest, latest)
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: str) -> Optional[CachedResult]:
+        entry = self._entries.get(key)
+        if entry is not None and self.ttl_seconds and time.monotonic() - entry.created > self.ttl_seconds:
+            self._drop(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(
+        self, key: str, body: bytes, media_type: str, range_start, range_end, generation: int,
+        computed_at: Optional[datetime] = None,
+    ) -> bool:
+        """
+        Store a result whose computation started at `generation` (and at
+        computed_at, now if not given). Refused if it is too big or a write
+        to its range was committed in the meantime.
+        """
+        range_start, range_end = _as_utc(range_start), _as_utc(range_end)
+        if len(body) > self.max_entry_bytes or self._changed_since(generation, range_start, range_end):
+            return False
+        if key in self._entries:
+            self._drop(key)
+        computed_at = computed_at or datetime.now(timezone.utc)
+        self._entries[key] = CachedResult(body, media_type, range_start, range_end, time.monotonic(), computed_at)
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+        return True
+
+    def invalidate_range(self, earliest: datetime, latest: datetime) -> int:
+        earliest, latest = _as_utc(earliest), _as_utc(latest)
+        self.generation += 1
+        self._recent.append((self.generation, earliest, latest))
+        stale = [key for key, entry in self._entries.items() if entry.overlaps(earliest, latest)]
+        for key in stale:
+            self._drop(key)
+        self.invalidations += len(stale)
+        return len(stale)
+
+    def discard(self, key: str):
+        """
+        Drop an entry that get() just returned but the caller found stale (a
+        write committed by another process); that lookup counts as a miss.
+        """
+        if key in self._entries:
+            self._drop(key)
+            self.invalidations += 1
+            self.hits -= 1
+            self.misses += 1
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+        self.generation += 1
+        self._recent.append((self.generation, None, None))
+
+    def _changed_since(self, generation: int, range_start, range_end) -> bool:
+        if generation == self.generation:
+            return False
+        if not self._recent or self._recent[0][0] > generation + 1:
+            return True  # Some invalidations were already forgotten; assume the worst
+        for changed_at, earliest, latest in self._recent:
+            if changed_at > generation and (earliest is None or _overlaps(range_start, range_end, earliest, latest)):
+                return True
+        return False
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key)
+        self.size -= len(entry.body)
+
+    async def tee(self, chunks, key: str, media_type: str, range_start, range_end):
+        """Pass chunks through to the client and keep a copy if the result fits in the cache."""
+        generation = self.generation
+        computed_at = datetime.now(timezone.utc)
+        parts = []
+        kept = 0
+        async for chunk in chunks:
+            if parts is not None:
+                data = chunk.encode() if isinstance(chunk, str) else chunk
+                kept += len(data)
+                if kept > self.max_entry_bytes:
+                    parts = None
+                else:
+                    parts.append(data)
+            yield chunk
+        if parts is not None:
+            self.put(key, b"".join(parts), media_type, range_start, range_end, generation, computed_at)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+# Shared instance used by the report/export endpoints
+report_cache = ReportResultCache()
+
+
+def note_changed_range(db, earliest: datetime, latest: datetime):
+    """Remember event timestamps touched in this transaction; matching entries go on commit."""
+    db.info.setdefault(_CHANGED_RANGES, []).append((earliest, latest))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    for earliest, latest in session.info.pop(_CHANGED_RANGES, ()):
+        report_cache.invalidate_range(earliest, latest)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(session):
+    session.info.pop(_CHANGED_RANGES, None)
@@ -0,0 +1,384 @@
+# time_management/app/report_jobs.py
+"""
+Background report jobs.
+
+POST /api/reports/jobs stores a report_jobs row and hands it to the
+in-process ReportJobRunner, which computes at most REPORT_JOB_WORKERS
+reports at a time. Each job reads through its own report-pool session
+(holding a report_limiter slot while it does) and spools its
+output (CSV, Parquet or Arrow, with the same layouts as the synchronous
+endpoints) to REPORT_JOB_DIR. Progress is written back to the row, so any
+API worker can answer status polls. Downloads are served from the file,
+with Range support.
+
+A running job holds a lease of REPORT_JOB_LEASE_SECONDS, renewed with
+every progress write and by a heartbeat while the job waits on queries.
+A running job whose lease has run out belonged to a process that died: it
+is never reused, and resume() puts it back in the queue.
+
+A job is reused for identical parameters while it is queued, running
+(with a live lease) or done. A finished job is stale once an event in its date range may have
+been written after it started (app.event_changes.changed_since, checked
+when the job is read); a stale job is no longer reused.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models, schemas, reports, columnar_export, event_changes
+from app.database import AsyncSessionLocal, ReportSessionLocal
+from app.report_limiter import report_limiter
+
+REPORT_JOB_DIR = os.getenv("REPORT_JOB_DIR", os.path.join(tempfile.gettempdir(), "time_management_reports"))
+REPORT_JOB_WORKERS = int(os.getenv("REPORT_JOB_WORKERS", 2))
+REPORT_JOB_PROGRESS_SECONDS = 1.0  # Minimum time between progress writes
+REPORT_JOB_LEASE_SECONDS = int(os.getenv("REPORT_JOB_LEASE_SECONDS", 60))
+
+FILTER_FIELDS = ("start_date", "end_date", "username", "event_type", "user_id", "manual")
+EXPORT_ONLY_FIELDS = ("event_type", "user_id", "manual")
+
+
+class InvalidJobRequest(ValueError):
+    """The job parameters cannot produce a report."""
+
+
+def normalize_params(request: schemas.ReportJobRequest) -> dict:
+    """JSON-safe parameters with everything that does not affect the output dropped."""
+    if request.kind not in ("report", "export"):
+        raise InvalidJobRequest("kind must be 'report' or 'export'")
+    if request.format not in ("csv", "parquet", "arrow"):
+        raise InvalidJobRequest("format must be 'csv', 'parquet' or 'arrow'")
+    if request.kind == "report" and (request.start_date is None or request.end_date is None):
+        raise InvalidJobRequest("start_date and end_date are required for reports")
+
+    params = {"kind": request.kind, "format": request.format}
+    for field in FILTER_FIELDS:
+        value = getattr(request, field)
+        if request.kind == "report" and field in EXPORT_ONLY_FIELDS:
+            value = None
+        if isinstance(value, datetime):
+            value = (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).astimezone(timezone.utc).isoformat()
+        params[field] = value
+    # Only the CSV layout has a summary section to stop after
+    params["include_details"] = request.include_details if request.format == "csv" else True
+    return params
+
+
+def params_key(params: dict) -> str:
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+
+def filters_from_params(params: dict) -> reports.ReportFilters:
+    values = {field: params.get(field) for field in FILTER_FIELDS}
+    for field in ("start_date", "end_date"):
+        if values[field] is not None:
+            values[field] = datetime.fromisoformat(values[field])
+    return reports.ReportFilters(**values)
+
+
+def output_name(params: dict) -> Tuple[str, str]:
+    """(filename, media_type) of a job's result, named like the synchronous downloads."""
+    created = datetime.now().strftime("%Y%m%d_%H%M%S")
+    if params["kind"] == "report":
+        start_str = params["start_date"][:10].replace("-", "")
+        end_str = params["end_date"][:10].replace("-", "")
+        user_part = f"{params['username']}_" if params.get("username") else ""
+        stem = f"attendance_report_{user_part}{start_str}_to_{end_str}_{created}"
+    else:
+        stem = f"attendance_export_{created}"
+    if params["format"] == "csv":
+        return f"{stem}.csv", "text/csv"
+    media_type, extension = columnar_export.FORMATS[params["format"]]
+    return f"{stem}.{extension}", media_type
+
+
+def result_stream(db: AsyncSession, params: dict, progress=None):
+    """(chunks, media_type) producing a job's output; chunks is an async iterator of str or bytes."""
+    filters = filters_from_params(params)
+    if params["format"] == "csv":
+        layout = reports.admin_report_csv_rows if params["kind"] == "report" else reports.export_csv_rows
+        rows = layout(db, filters, include_details=params["include_details"], progress=progress)
+        return reports.csv_chunks(rows), "text/csv"
+    media_type, _ = columnar_export.FORMATS[params["format"]]
+    return columnar_export.stream_columnar(db, filters, params["format"], progress=progress), media_type
+
+
+async def job_is_stale(db: AsyncSession, job: models.ReportJob) -> bool:
+    if job.stale:
+        return True
+    if job.status != "done" or job.started_at is None:
+        return False
+    return await event_changes.changed_since(db, job.range_start, job.range_end, job.started_at)
+
+
+def lease_expiry() -> datetime:
+    return datetime.now(timezone.utc) + timedelta(seconds=REPORT_JOB_LEASE_SECONDS)
+
+
+def lease_expired(job: models.ReportJob) -> bool:
+    if job.lease_expires_at is None:
+        return True
+    expires = job.lease_expires_at
+    if expires.tzinfo is None:
+        expires = expires.replace(tzinfo=timezone.utc)
+    return expires < datetime.now(timezone.utc)
+
+
+def job_response(job: models.ReportJob, reused: bool = False, stale: bool = False) -> schemas.ReportJobResponse:
+    progress = None
+    if job.status == "done":
+        progress = 1.0
+    elif job.rows_total:
+        progress = min(job.rows_done / job.rows_total, 1.0)
+    return schemas.ReportJobResponse(
+        id=job.id,
+        status=job.status,
+        stale=stale,
+        reused=reused,
+        params=job.params,
+        rows_done=job.rows_done,
+        rows_total=job.rows_total,
+        progress=progress,
+        file_size=job.file_size,
+        download_url=f"/api/reports/jobs/{job.id}/download" if job.status == "done" else None,
+        error=job.error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+    )
+
+
+class ReportJobRunner:
+    def __init__(self, session_factory, read_session_factory=None, workers: int = REPORT_JOB_WORKERS, directory: str = REPORT_JOB_DIR):
+        self.session_factory = session_factory  # Job rows
+        self.read_session_factory = read_session_factory or session_factory  # Report data
+        self.workers = workers
+        self.directory = directory
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._tasks: Set[asyncio.Task] = set()
+        # Counters
+        self.submitted = 0
+        self.reused = 0
+        self.completed = 0
+        self.failed = 0
+
+    async def submit(self, db: AsyncSession, request: schemas.ReportJobRequest, created_by: Optional[int] = None):
+        """Return (job, reused). Raises InvalidJobRequest for unusable parameters."""
+        params = normalize_params(request)
+        if params["format"] != "csv" and columnar_export.pa is None:
+            raise InvalidJobRequest(f"{params['format']} output requires the pyarrow package")
+        key = params_key(params)
+
+        jobs = models.ReportJob
+        result = await db.execute(
+            select(jobs)
+            .where(jobs.params_key == key, jobs.status.in_(("queued", "running", "done")), jobs.stale.is_(False))
+            .order_by(jobs.created_at.desc())
+        )
+        for job in result.scalars().all():
+            if job.status == "running" and lease_expired(job):
+                continue
+            if job.status != "done" or (job.file_path and os.path.exists(job.file_path) and not await job_is_stale(db, job)):
+                self.reused += 1
+                return job, True
+
+        filters = filters_from_params(params)
+        job = models.ReportJob(
+            id=uuid.uuid4().hex,
+            params_key=key,
+            params=params,
+            status="queued",
+            stale=False,
+            range_start=filters.start_date,
+            range_end=filters.end_date,
+            rows_done=0,
+            created_by=created_by,
+            created_at=datetime.now(timezone.utc),
+        )
+        db.add(job)
+        await db.commit()
+        self.submitted += 1
+        self.schedule(job.id)
+        return job, False
+
+    def schedule(self, job_id: str):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        task = asyncio.create_task(self._run(job_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def resume(self):
+        """
+        Pick up jobs that were queued when the previous process stopped, and
+        running jobs whose lease ran out because their process died.
+        """
+        jobs = models.ReportJob
+        async with self.session_factory() as db:
+            requeued = await db.execute(
+                update(jobs)
+                .where(
+                    jobs.status == "running",
+                    or_(jobs.lease_expires_at.is_(None), jobs.lease_expires_at < datetime.now(timezone.utc)),
+                )
+                .values(status="queued", started_at=None, lease_expires_at=None)
+            )
+            await db.commit()
+            result = await db.execute(select(jobs.id).where(jobs.status == "queued"))
+            job_ids = result.scalars().all()
+        for job_id in job_ids:
+            self.schedule(job_id)
+        if requeued.rowcount:
+            print(f"Report jobs: requeued {requeued.rowcount} running jobs with an expired lease")
+        if job_ids:
+            print(f"Report jobs: resumed {len(job_ids)} queued jobs")
+
+    async def join(self):
+        """Wait until every scheduled job has finished."""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    async def stop(self):
+        """Cancel running jobs; they go back to the queue and resume on the next start."""
+        for task in list(self._tasks):
+            task.cancel()
+        await self.join()
+
+    async def _set(self, job_id: str, **values):
+        async with self.session_factory() as db:
+            await db.execute(update(models.ReportJob).where(models.ReportJob.id == job_id).values(**values))
+            await db.commit()
+
+    async def _claim(self, job_id: str) -> Optional[dict]:
+        """Move a queued job to running. Only one process can win the claim."""
+        async with self.session_factory() as db:
+            jobs = models.ReportJob
+            result = await db.execute(
+                update(jobs)
+                .where(jobs.id == job_id, jobs.status == "queued")
+                .values(
+                    status="running", started_at=datetime.now(timezone.utc), lease_expires_at=lease_expiry(),
+                    rows_done=0, error=None,
+                )
+            )
+            await db.commit()
+            if result.rowcount != 1:
+                return None
+            return (await db.execute(select(jobs.params).where(jobs.id == job_id))).scalar_one()
+
+    async def _run(self, job_id: str):
+        async with self._slots:
+            params = await self._claim(job_id)
+            if params is None:
+                return
+            path = os.path.join(self.directory, job_id)
+            heartbeat = asyncio.create_task(self._heartbeat(job_id))
+            try:
+                await self._compute(job_id, params, path)
+            except asyncio.CancelledError:
+                await asyncio.shield(self._set(job_id, status="queued", started_at=None, lease_expires_at=None))
+                raise
+            except Exception as e:
+                self.failed += 1
+                print(f"Report job {job_id} failed: {e}")
+                await self._set(
+                    job_id, status="failed", error=str(e), finished_at=datetime.now(timezone.utc), lease_expires_at=None
+                )
+            finally:
+                heartbeat.cancel()
+                if os.path.exists(path + ".part"):
+                    os.remove(path + ".part")
+
+    async def _heartbeat(self, job_id: str):
+        """Renew the lease while a long query produces no progress writes."""
+        while True:
+            await asyncio.sleep(REPORT_JOB_LEASE_SECONDS / 3)
+            try:
+                await self._set(job_id, lease_expires_at=lease_expiry())
+            except Exception as e:
+                print(f"Report job {job_id}: could not renew lease: {e}")
+
+    async def _compute(self, job_id: str, params: dict, path: str):
+        filters = filters_from_params(params)
+        filename, media_type = output_name(params)
+        os.makedirs(self.directory, exist_ok=True)
+
+        rows_done = 0
+        last_write = time.monotonic()
+
+        def progress(rows: int):
+            nonlocal rows_done
+            rows_done += rows
+
+        await report_limiter.acquire()
+        try:
+            async with self.read_session_factory() as db:
+                rows_total = await reports.count_events(db, filters) if params["include_details"] else None
+                await self._set(job_id, rows_total=rows_total)
+
+                chunks, _ = result_stream(db, params, progress=progress)
+                with open(path + ".part", "wb") as handle:
+                    async for chunk in chunks:
+                        data = chunk.encode() if isinstance(chunk, str) else chunk
+                        await asyncio.to_thread(handle.write, data)
+                        if time.monotonic() - last_write >= REPORT_JOB_PROGRESS_SECONDS:
+                            last_write = time.monotonic()
+                            await self._set(job_id, rows_done=rows_done, lease_expires_at=lease_expiry())
+                os.replace(path + ".part", path)
+        finally:
+            report_limiter.release()
+
+        await self._set(
+            job_id,
+            status="done",
+            rows_done=rows_done,
+            file_path=path,
+            file_size=os.path.getsize(path),
+            filename=filename,
+            media_type=media_type,
+            finished_at=datetime.now(timezone.utc),
+            lease_expires_at=None,
+        )
+        self.completed += 1
+        await self._remove_superseded(job_id, params_key(params))
+
+    async def _remove_superseded(self, job_id: str, key: str):
+        """Delete the files of older results for the same parameters."""
+        jobs = models.ReportJob
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(jobs.id, jobs.file_path)
+                .where(jobs.params_key == key, jobs.id != job_id, jobs.file_path.is_not(None))
+            )
+            old_jobs = result.all()
+            for old_id, old_path in old_jobs:
+                if os.path.exists(old_path):
+                    os.remove(old_path)
+            if old_jobs:
+                await db.execute(
+                    update(jobs).where(jobs.id.in_([old_id for old_id, _ in old_jobs])).values(file_path=None, stale=True)
+                )
+                await db.commit()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": self.workers,
+            "active": len(self._tasks),
+            "submitted": self.submitted,
+            "reused": self.reused,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+
+# Shared instance, resumed and stopped by app.main
+report_runner = ReportJobRunner(AsyncSessionLocal, ReportSessionLocal)
@@ -0,0 +1,90 @@
+# time_management/app/report_limiter.py
+"""
+Per-process cap on report generation.
+
+Report and export downloads and background report jobs each hold a slot
+(and one report-pool connection) for as long as they read from the
+database. At most REPORT_CONCURRENCY run at once. A download that cannot
+get a slot within REPORT_QUEUE_TIMEOUT_SECONDS is turned away with a 503;
+jobs just wait their turn. Cached downloads never need a slot.
+"""
+import asyncio
+import os
+from typing import AsyncIterator, Optional
+
+REPORT_CONCURRENCY = int(os.getenv("REPORT_CONCURRENCY", 4))
+REPORT_QUEUE_TIMEOUT_SECONDS = float(os.getenv("REPORT_QUEUE_TIMEOUT_SECONDS", 5))
+
+
+class ReportLimiter:
+    def __init__(self, concurrency: int = REPORT_CONCURRENCY, queue_timeout: float = REPORT_QUEUE_TIMEOUT_SECONDS):
+        self.concurrency = concurrency
+        self.queue_timeout = queue_timeout
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.active = 0
+        self.waiting = 0
+        # Counters
+        self.admitted = 0
+        self.rejected = 0
+
+    async def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Take a slot, waiting up to timeout seconds (None waits indefinitely). False if none came free."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        self.waiting += 1
+        acquiring = asyncio.ensure_future(self._slots.acquire())
+        try:
+            await asyncio.wait_for(asyncio.shield(acquiring), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            # The slot may have come free just as the wait gave up or was cancelled; hand it back
+            if not acquiring.cancel() and not acquiring.cancelled():
+                self._slots.release()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.rejected += 1
+            return False
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        self.admitted += 1
+        return True
+
+    def release(self):
+        self.active -= 1
+        self._slots.release()
+
+    async def stream(self, chunks: AsyncIterator) -> AsyncIterator:
+        """
+        Yield a response stream while holding an already-acquired slot. The
+        slot is released in finally: when the stream is exhausted, fails or
+        is closed. Use hold(), which starts the generator so that finally
+        also runs for a response that is never iterated.
+        """
+        try:
+            yield  # Primed by hold()
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            self.release()
+            close = getattr(chunks, "aclose", None)
+            if close is not None:
+                await close()
+
+    async def hold(self, chunks: AsyncIterator) -> AsyncIterator:
+        """Wrap an already-acquired slot around a response stream; the slot is freed when the stream ends."""
+        stream = self.stream(chunks)
+        # A started async generator is closed (running its finally) by the event loop even if dropped unread
+        await stream.asend(None)
+        return stream
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+report_limiter = ReportLimiter()
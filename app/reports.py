@@ -0,0 +1,463 @@
+# time_management/app/reports.py
+"""
+Data services behind /api/admin/report and /api/export/csv.
+
+REPORT_ENGINE picks how per-employee totals are computed:
+
+* "sql" (default): the database pairs each event with the next one
+  (LEAD over user_id ordered by timestamp), splits sessions at local midnight
+  with a recursive CTE and rolls them up, so only one summary row per
+  employee comes back. PostgreSQL handles any REPORT_TIMEZONE. SQLite (the
+  test suite) handles UTC and otherwise falls back to the Python engine.
+* "python": loads (user_id, event_type, timestamp) rows and pairs them with
+  app.work_sessions. This is the reference implementation.
+* "numpy": the same query as "python", but sessions are paired and summed
+  with vectorized NumPy operations (app.vector_sessions). Falls back to
+  "python" when numpy is not installed.
+* "summary": reads the precomputed daily_attendance_summary rows (see
+  app.daily_summary), so the cost grows with days x employees instead of
+  events. It works in whole REPORT_TIMEZONE days: every day from the local
+  date of start_date to the local date of end_date is included. Filters on
+  event_type or manual need the raw events and use the "sql" engine.
+
+When the range reaches months moved to cold storage (app.archive), the
+database cannot see those events, so totals are computed by the "numpy" or
+"python" engine over the database rows merged with the archived ones.
+
+All engines apply the pairing rules documented in app.work_sessions.
+
+Detail rows are streamed from a server-side cursor and written out as CSV
+in chunks, so an export's memory use does not depend on the date range.
+"""
+import csv
+import io
+import os
+from collections import namedtuple
+from dataclasses import dataclass, asdict
+from datetime import date, datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, func, case, cast, extract, literal_column, BigInteger, Date, Float
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models, crud, work_sessions, vector_sessions
+from app.archive import archive_store, merge_event_lists, merge_event_stream
+
+REPORT_ENGINE = os.getenv("REPORT_ENGINE", "sql")  # "sql", "python", "numpy" or "summary"
+REPORT_STREAM_BATCH_SIZE = int(os.getenv("REPORT_STREAM_BATCH_SIZE", 1000))  # Rows per cursor fetch
+CSV_CHUNK_SIZE = int(os.getenv("CSV_CHUNK_SIZE", 64 * 1024))  # Characters per streamed chunk
+
+
+@dataclass(frozen=True)
+class ReportFilters:
+    """Normalized filter set shared by reports and exports."""
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    event_type: Optional[str] = None
+    user_id: Optional[int] = None
+    username: Optional[str] = None
+    manual: Optional[bool] = None
+
+    def conditions(self):
+        return crud.build_attendance_filters(**asdict(self))
+
+    def reaches_archive(self) -> bool:
+        return archive_store.covers(self.start_date, self.end_date)
+
+    def archived_events(self):
+        return archive_store.read_events(**asdict(self))
+
+
+@dataclass
+class EmployeeSummary:
+    user_id: int
+    username: str
+    rfid: Optional[str]
+    event_count: int = 0
+    days_present: int = 0
+    total_seconds: float = 0.0
+
+    @property
+    def total_hours(self) -> float:
+        return self.total_seconds / 3600
+
+
+# (event_count, days_present, total_seconds) per user_id
+Totals = Dict[int, Tuple[int, int, float]]
+
+
+async def employee_summaries(
+    db: AsyncSession,
+    filters: ReportFilters,
+    include_inactive: bool = False,
+    engine: Optional[str] = None,
+) -> List[EmployeeSummary]:
+    """
+    One summary per employee, ordered by id. Employees without events in
+    range are included only when include_inactive is set.
+    """
+    employee_query = select(models.Employee.id, models.Employee.username, models.Employee.rfid).order_by(models.Employee.id)
+    if filters.username:
+        employee_query = employee_query.where(models.Employee.username == filters.username)
+    if filters.user_id:
+        employee_query = employee_query.where(models.Employee.id == filters.user_id)
+    employees = (await db.execute(employee_query)).all()
+
+    totals = await employee_totals(db, filters, engine=engine)
+
+    summaries = []
+    for employee in employees:
+        event_count, days_present, total_seconds = totals.get(employee.id, (0, 0, 0.0))
+        if not event_count and not include_inactive:
+            continue
+        summaries.append(EmployeeSummary(
+            user_id=employee.id,
+            username=employee.username,
+            rfid=employee.rfid,
+            event_count=event_count,
+            days_present=days_present,
+            total_seconds=total_seconds,
+        ))
+    return summaries
+
+
+async def employee_totals(db: AsyncSession, filters: ReportFilters, engine: Optional[str] = None) -> Totals:
+    engine = engine or REPORT_ENGINE
+    if filters.reaches_archive():
+        engine = "numpy" if engine == "numpy" and vector_sessions.np is not None else "python"
+    if engine == "summary" and filters.event_type is None and filters.manual is None:
+        return await _summary_employee_totals(db, filters)
+    if engine == "numpy" and vector_sessions.np is not None:
+        return await _numpy_employee_totals(db, filters)
+    if engine in ("sql", "summary") and _sql_engine_supported(db):
+        return await _sql_employee_totals(db, filters)
+    return await _python_employee_totals(db, filters)
+
+
+def detail_query(filters: ReportFilters):
+    """(id, username, event_type, timestamp) rows in chronological order, for the detail section."""
+    events = models.AttendanceEvent
+    return (
+        select(events.id, models.Employee.username, events.event_type, events.timestamp)
+        .join(models.Employee, events.user_id == models.Employee.id)
+        .where(*filters.conditions())
+        .order_by(events.timestamp, events.id)
+    )
+
+
+async def stream_detail_rows(
+    db: AsyncSession,
+    filters: ReportFilters,
+    batch_size: Optional[int] = None,
+    progress: Optional[Callable[[int], None]] = None,
+):
+    """
+    Yield detail rows from a server-side cursor (asyncpg), batch_size rows
+    per fetch, so memory does not grow with the size of the range.
+    progress, if given, is called with the size of each fetched batch.
+    Archived events in range are merged in, in order.
+    """
+    batch_size = batch_size or REPORT_STREAM_BATCH_SIZE
+    rows = _stream_live_detail_rows(db, filters, batch_size, progress)
+    if filters.reaches_archive():
+        archived = filters.archived_events()
+        if progress is not None:
+            progress(len(archived))
+        rows = merge_event_stream(rows, archived)
+    async for row in rows:
+        yield row
+
+
+async def _stream_live_detail_rows(db: AsyncSession, filters: ReportFilters, batch_size: int, progress):
+    result = await db.stream(detail_query(filters).execution_options(yield_per=batch_size))
+    async for partition in result.partitions():
+        for row in partition:
+            yield row
+        if progress is not None:
+            progress(len(partition))
+
+
+async def count_events(db: AsyncSession, filters: ReportFilters) -> int:
+    query = (
+        select(func.count(models.AttendanceEvent.id))
+        .join(models.Employee, models.AttendanceEvent.user_id == models.Employee.id)
+        .where(*filters.conditions())
+    )
+    count = (await db.execute(query)).scalar_one()
+    if filters.reaches_archive():
+        # An event caught between the archive write and the DELETE is in both places
+        id_query = (
+            select(models.AttendanceEvent.id)
+            .join(models.Employee, models.AttendanceEvent.user_id == models.Employee.id)
+            .where(*filters.conditions())
+        )
+        live_ids = set((await db.execute(id_query)).scalars())
+        count += sum(1 for event in filters.archived_events() if event.id not in live_ids)
+    return count
+
+
+# --- CSV Layouts ---
+
+def _format_timestamp(value: datetime) -> str:
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+
+async def export_csv_rows(db: AsyncSession, filters: ReportFilters, include_details: bool = True, progress=None):
+    """Rows of /api/export/csv: per-employee summary, then optionally every event."""
+    # Only employees with records in the filtered period
+    summaries = await employee_summaries(db, filters)
+
+    # First section: Summary with Days Present and Total Hours
+    yield ['Employee Summary']
+    yield ['Employee Name', 'Days Present', 'Total Hours']
+    for summary in summaries:
+        yield [summary.username, summary.days_present, f"{summary.total_hours:.2f}"]
+
+    if include_details:
+        yield []
+        yield ['Detailed Attendance Records']
+        yield ['Employee Name', 'Event Type', 'Timestamp']
+        async for detail in stream_detail_rows(db, filters, progress=progress):
+            yield [detail.username, detail.event_type, _format_timestamp(detail.timestamp)]
+
+
+async def admin_report_csv_rows(db: AsyncSession, filters: ReportFilters, include_details: bool = True, progress=None):
+    """Rows of /api/admin/report: every matching employee, then optionally every event."""
+    # Every (matching) employee, including those without events in range
+    summaries = await employee_summaries(db, filters, include_inactive=True)
+
+    yield ['Username', 'RFID', 'Days Present', 'Total Hours']
+    for summary in summaries:
+        yield [summary.username, summary.rfid, summary.days_present, f"{summary.total_hours:.2f}"]
+
+    if include_details:
+        yield []  # Empty row as separator
+        yield ['Detailed Entries']
+        yield ['Employee', 'Event Type', 'Timestamp']
+        async for detail in stream_detail_rows(db, filters, progress=progress):
+            yield [detail.username, detail.event_type, _format_timestamp(detail.timestamp)]
+
+
+async def csv_chunks(rows, chunk_size: int = CSV_CHUNK_SIZE):
+    """Encode an (async) iterable of rows as CSV text chunks of roughly chunk_size characters."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if not hasattr(rows, "__aiter__"):
+        rows = _aiter(rows)
+    async for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+async def _aiter(rows):
+    for row in rows:
+        yield row
+
+
+# --- Python Engine ---
+
+# Archived events in the shape of _event_rows_query rows
+_EventRow = namedtuple("_EventRow", ["id", "user_id", "event_type", "timestamp"])
+
+
+def _event_rows_query(filters: ReportFilters):
+    events = models.AttendanceEvent
+    return (
+        select(events.id, events.user_id, events.event_type, events.timestamp)
+        .join(models.Employee, events.user_id == models.Employee.id)
+        .where(*filters.conditions())
+    )
+
+
+async def _event_rows(db: AsyncSession, filters: ReportFilters) -> list:
+    rows = (await db.execute(_event_rows_query(filters))).all()
+    if filters.reaches_archive():
+        archived = [_EventRow(e.id, e.user_id, e.event_type, e.timestamp) for e in filters.archived_events()]
+        rows = merge_event_lists(rows, archived)
+    return rows
+
+
+async def _python_employee_totals(db: AsyncSession, filters: ReportFilters) -> Totals:
+    rows = await _event_rows(db, filters)
+    return {
+        user_id: (result.event_count, result.total_days, result.total_seconds)
+        for user_id, result in work_sessions.pair_events(rows).items()
+    }
+
+
+# --- NumPy Engine ---
+
+async def _numpy_employee_totals(db: AsyncSession, filters: ReportFilters) -> Totals:
+    if _dialect(db) == "postgresql" and not filters.reaches_archive():
+        # Let the database convert timestamps to epoch microseconds (exact: extract() is numeric)
+        events = models.AttendanceEvent
+        epoch_us = cast(func.round(extract("epoch", events.timestamp) * 1000000), BigInteger)
+        query = (
+            select(events.id, events.user_id, events.event_type, epoch_us)
+            .join(models.Employee, events.user_id == models.Employee.id)
+            .where(*filters.conditions())
+        )
+        rows = (await db.execute(query)).all()
+        return vector_sessions.compute_totals(*vector_sessions.arrays_from_rows(rows, timestamps_are_us=True))
+    rows = await _event_rows(db, filters)
+    return vector_sessions.compute_totals(*vector_sessions.arrays_from_rows(rows))
+
+
+# --- Summary Engine ---
+
+def _local_date(value: datetime) -> date:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(work_sessions.REPORT_TIMEZONE).date()
+
+
+async def _summary_employee_totals(db: AsyncSession, filters: ReportFilters) -> Totals:
+    summary = models.DailyAttendanceSummary
+    query = (
+        select(
+            summary.user_id,
+            func.sum(summary.event_count),
+            func.sum(case((summary.worked_seconds > 0, 1), else_=0)),
+            func.sum(summary.worked_seconds),
+        )
+        .join(models.Employee, summary.user_id == models.Employee.id)
+        .group_by(summary.user_id)
+    )
+    if filters.start_date:
+        query = query.where(summary.local_date >= _local_date(filters.start_date))
+    if filters.end_date:
+        query = query.where(summary.local_date <= _local_date(filters.end_date))
+    if filters.user_id:
+        query = query.where(summary.user_id == filters.user_id)
+    if filters.username:
+        query = query.where(models.Employee.username == filters.username)
+
+    result = await db.execute(query)
+    return {
+        user_id: (int(event_count), int(days_present), float(total_seconds))
+        for user_id, event_count, days_present, total_seconds in result.all()
+    }
+
+
+# --- SQL Engine ---
+
+def _dialect(db: AsyncSession) -> str:
+    return db.bind.dialect.name if db.bind is not None else ""
+
+
+def _sql_engine_supported(db: AsyncSession) -> bool:
+    dialect = _dialect(db)
+    if dialect == "postgresql":
+        return True
+    # SQLite has window functions and recursive CTEs but no named time zones
+    return dialect == "sqlite" and work_sessions.REPORT_TIMEZONE.key == "UTC"
+
+
+class _DayMath:
+    """Dialect-specific date arithmetic for the SQL engine."""
+
+    def __init__(self, dialect: str):
+        self.dialect = dialect
+        self.tz = work_sessions.REPORT_TIMEZONE.key
+
+    def local_day(self, ts):
+        if self.dialect == "postgresql":
+            return cast(func.timezone(self.tz, ts), Date)
+        return func.date(ts)
+
+    def next_local_midnight(self, ts):
+        if self.dialect == "postgresql":
+            local_midnight = func.date_trunc("day", func.timezone(self.tz, ts))
+            return func.timezone(self.tz, local_midnight + literal_column("INTERVAL '1 day'"))
+        return func.datetime(func.date(ts), "+1 day")
+
+    def seconds_between(self, start, end):
+        if self.dialect == "postgresql":
+            return cast(extract("epoch", end - start), Float)
+        # julianday() is a float day count; round away its sub-millisecond noise
+        return func.round((func.julianday(end) - func.julianday(start)) * 86400.0, 3)
+
+
+async def _sql_employee_totals(db: AsyncSession, filters: ReportFilters) -> Totals:
+    events = models.AttendanceEvent
+    math = _DayMath(_dialect(db))
+
+    # 1. Each event next to its successor for the same employee
+    window = {"partition_by": events.user_id, "order_by": (events.timestamp, events.id)}
+    ordered = (
+        select(
+            events.user_id,
+            events.event_type,
+            events.timestamp.label("ts"),
+            func.lead(events.event_type).over(**window).label("next_type"),
+            func.lead(events.timestamp).over(**window).label("next_ts"),
+        )
+        .join(models.Employee, events.user_id == models.Employee.id)
+        .where(*filters.conditions())
+        .cte("ordered_events")
+    )
+
+    # 2. A session is a checkin immediately followed by a checkout
+    session_conditions = [ordered.c.event_type == "checkin", ordered.c.next_type == "checkout"]
+    if work_sessions.MAX_SESSION_HOURS:
+        session_conditions.append(
+            math.seconds_between(ordered.c.ts, ordered.c.next_ts) <= work_sessions.MAX_SESSION_HOURS * 3600
+        )
+    sessions = (
+        select(ordered.c.user_id, ordered.c.ts.label("piece_start"), ordered.c.next_ts.label("session_end"))
+        .where(*session_conditions)
+        .cte("pieces", recursive=True)
+    )
+
+    # 3. Split sessions at local midnight
+    next_midnight = math.next_local_midnight(sessions.c.piece_start)
+    pieces = sessions.union_all(
+        select(sessions.c.user_id, next_midnight, sessions.c.session_end)
+        .where(next_midnight < sessions.c.session_end)
+    )
+    piece_end = case(
+        (math.next_local_midnight(pieces.c.piece_start) < pieces.c.session_end, math.next_local_midnight(pieces.c.piece_start)),
+        else_=pieces.c.session_end,
+    )
+    daily = (
+        select(
+            pieces.c.user_id,
+            math.local_day(pieces.c.piece_start).label("day"),
+            func.sum(math.seconds_between(pieces.c.piece_start, piece_end)).label("seconds"),
+        )
+        .group_by(pieces.c.user_id, math.local_day(pieces.c.piece_start))
+        .subquery("daily")
+    )
+
+    # 4. Roll up per employee
+    per_employee = (
+        select(
+            daily.c.user_id,
+            func.sum(case((daily.c.seconds > 0, 1), else_=0)).label("days_present"),
+            func.sum(daily.c.seconds).label("total_seconds"),
+        )
+        .group_by(daily.c.user_id)
+        .subquery("per_employee")
+    )
+    counts = (
+        select(ordered.c.user_id, func.count().label("event_count"))
+        .group_by(ordered.c.user_id)
+        .subquery("event_counts")
+    )
+    query = select(
+        counts.c.user_id,
+        counts.c.event_count,
+        func.coalesce(per_employee.c.days_present, 0),
+        func.coalesce(per_employee.c.total_seconds, 0.0),
+    ).outerjoin(per_employee, per_employee.c.user_id == counts.c.user_id)
+
+    result = await db.execute(query)
+    return {
+        user_id: (int(event_count), int(days_present), float(total_seconds))
+        for user_id, event_count, days_present, total_seconds in result.all()
+    }
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, Request, Form, HTTPException, status
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, Response
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
@@ -7,7 +7,8 @@ from datetime import datetime, timedelta, time, timezone
 from typing import Optional
 import urllib.parse
 
-from app import models, schemas, crud, security
+from app import models, schemas, crud, security, dashboard, pagination
+from app.cache import employee_roster
 from app.database import get_async_db
 
 # Create templates instance
@@ -30,9 +31,9 @@ async def admin_login(
     db: AsyncSession = Depends(get_async_db)
 ):
     # Verify credentials
-    user = await crud.get_employee_by_username(db, username=username)
+    user = await crud.authenticate_employee(db, username, password)
     
-    if not user or not security.pwd_context.verify(password, user.hashed_password):
+    if not user:
         return templates.TemplateResponse(
             "admin/login.html", 
             {"request": request, "error": "Invalid username or password"}
@@ -82,12 +83,10 @@ async def get_current_admin(
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-        user_id = security.verify_token(token, credentials_exception)
-        
-        # Get user from DB and verify admin status
-        user = await crud.get_employee(db, user_id=user_id)
+        # Get user (cached per token) and verify admin status
+        user = await security.get_principal(db, token, credentials_exception)
         if not user:
-            print(f"Admin auth failed: User {user_id} not found")
+            print("Admin auth failed: User not found")
             raise HTTPException(
                 status_code=status.HTTP_307_TEMPORARY_REDIRECT,
                 detail="User not found",
@@ -154,6 +153,13 @@ def get_date_ranges():
         "last_month_end": last_month_end.isoformat(),
     }
 
+# Admin lists show one page at a time; a stale or mangled cursor starts over
+async def get_event_page(db: AsyncSession, cursor: Optional[str], **filters) -> pagination.EventPage:
+    try:
+        return await crud.get_filtered_attendance_events(db, cursor=cursor, **filters)
+    except pagination.InvalidCursor:
+        return await crud.get_filtered_attendance_events(db, **filters)
+
 # --- Admin Routes ---
 
 @router.get("/", response_class=HTMLResponse)
@@ -162,53 +168,18 @@ async def admin_dashboard(
     db: AsyncSession = Depends(get_async_db),
     admin_user: models.Employee = Depends(get_current_admin)
 ):
-    # Get dashboard data
-    # 1. Employee count
-    result = await db.execute(select(models.Employee))
-    all_employees = result.scalars().all()
-    employee_count = len(all_employees)
-    
-    # 2. Today's check-ins and check-outs
-    now = datetime.now(timezone.utc)
-    today_start = datetime.combine(now.date(), time.min).replace(tzinfo=timezone.utc)
-    today_end = datetime.combine(now.date(), time.max).replace(tzinfo=timezone.utc)
-    
-    checkin_events = await crud.get_filtered_attendance_events(
-        db, 
-        start_date=today_start, 
-        end_date=today_end, 
-        event_type="checkin"
-    )
-    checkin_count = len(checkin_events)
-    
-    checkout_events = await crud.get_filtered_attendance_events(
-        db, 
-        start_date=today_start, 
-        end_date=today_end, 
-        event_type="checkout"
-    )
-    checkout_count = len(checkout_events)
-    
-    # 3. Recent activity (all events from today)
-    recent_events = await crud.get_filtered_attendance_events(
-        db, 
-        start_date=today_start, 
-        end_date=today_end
-    )
-    # Sort by timestamp, most recent first
-    recent_events.sort(key=lambda x: x.timestamp, reverse=True)
-    # Limit to 10 most recent
-    recent_events = recent_events[:10]
+    # Counts come from one aggregate query, recent activity from a LIMIT query
+    data = await dashboard.dashboard_data(db)
     
     return templates.TemplateResponse(
         "admin/dashboard.html",
         {
             "request": request,
             "active_page": "dashboard",
-            "employee_count": employee_count,
-            "checkin_count": checkin_count,
-            "checkout_count": checkout_count,
-            "recent_events": recent_events
+            "employee_count": data.employee_count,
+            "checkin_count": data.checkin_count,
+            "checkout_count": data.checkout_count,
+            "recent_events": data.recent_events
         }
     )
 
@@ -221,12 +192,14 @@ async def filtered_attendance_view(
     username: Optional[str] = None,
     user_id: Optional[str] = None,
     manual: Optional[str] = None,
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_async_db),
     admin_user: models.Employee = Depends(get_current_admin)
 ):
     events = []
     filtered = False
     query_string = ""
+    next_url = None
     
     # Process input parameters
     parsed_start_date = None
@@ -264,8 +237,9 @@ async def filtered_attendance_view(
     # If any filter is set, query the data
     if any([parsed_start_date, parsed_end_date, event_type, username, parsed_user_id, parsed_manual is not None]):
         filtered = True
-        events = await crud.get_filtered_attendance_events(
+        page = await get_event_page(
             db,
+            cursor,
             start_date=parsed_start_date,
             end_date=parsed_end_date,
             event_type=event_type if event_type else None,
@@ -273,6 +247,7 @@ async def filtered_attendance_view(
             user_id=parsed_user_id,
             manual=parsed_manual
         )
+        events = page.events
         
         # Build query string for export link
         params = {}
@@ -290,10 +265,11 @@ async def filtered_attendance_view(
             params["manual"] = manual
         
         query_string = urllib.parse.urlencode(params)
+        if page.next_cursor:
+            next_url = f"/admin/filtered-attendance?{urllib.parse.urlencode({**params, 'cursor': page.next_cursor})}"
     
     # Fetch all employees for the dropdown
-    result = await db.execute(select(models.Employee))
-    employees = result.scalars().all()
+    employees = (await employee_roster.get(db)).employees
     
     return templates.TemplateResponse(
         "admin/filtered_attendance.html",
@@ -303,6 +279,8 @@ async def filtered_attendance_view(
             "events": events,
             "filtered": filtered,
             "query_string": query_string,
+            "next_url": next_url,
+            "first_url": f"/admin/filtered-attendance?{query_string}" if cursor else None,
             "employees": employees
         }
     )
@@ -317,8 +295,7 @@ async def export_csv_view(
     date_ranges = get_date_ranges()
     
     # Fetch all employees for the dropdown
-    result = await db.execute(select(models.Employee))
-    employees = result.scalars().all()
+    employees = (await employee_roster.get(db)).employees
     
     return templates.TemplateResponse(
         "admin/export_csv.html",
@@ -340,8 +317,7 @@ async def reports_view(
     date_ranges = get_date_ranges()
     
     # Fetch all employees for the dropdown
-    result = await db.execute(select(models.Employee))
-    employees = result.scalars().all()
+    employees = (await employee_roster.get(db)).employees
     
     return templates.TemplateResponse(
         "admin/reports.html",
@@ -353,6 +329,30 @@ async def reports_view(
         }
     )
 
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check: a comma-separated list of entity tags, or "*"."""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        # Weak comparison, as If-None-Match requires
+        if tag == "*" or tag.removeprefix("W/") == etag.removeprefix("W/"):
+            return True
+    return False
+
+@router.get("/roster")
+async def employee_roster_json(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    admin_user: models.Employee = Depends(get_current_admin)
+):
+    """(id, username) list behind the employee dropdowns, for pages that load it lazily."""
+    snapshot = await employee_roster.get(db)
+    headers = {"ETag": snapshot.etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), snapshot.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return JSONResponse(snapshot.as_json(), headers=headers)
+
 @router.get("/employees", response_class=HTMLResponse)
 async def employees_view(
     request: Request,
@@ -587,6 +587,7 @@ async def attendance_view(
     event_type: Optional[str] = None,
     manual: Optional[str] = None,
     username: Optional[str] = None,
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_async_db),
     admin_user: models.Employee = Depends(get_current_admin)
 ):
@@ -647,9 +648,10 @@ async def attendance_view(
         elif manual.lower() == "false":
             manual_bool = False
     
-    # Get filtered events
-    events = await crud.get_filtered_attendance_events(
+    # Get one page of filtered events, most recent first
+    page = await get_event_page(
         db,
+        cursor,
         start_date=start_date,
         end_date=end_date,
         event_type=event_type,
@@ -657,19 +659,27 @@ async def attendance_view(
         username=username
     )
     
-    # Sort by timestamp, most recent first
-    events.sort(key=lambda x: x.timestamp, reverse=True)
+    # Links keep the filters and swap the cursor
+    params = {
+        key: value for key, value in
+        {"date_range": date_range, "event_type": event_type, "manual": manual, "username": username}.items()
+        if value
+    }
+    next_url = None
+    if page.next_cursor:
+        next_url = f"/admin/attendance?{urllib.parse.urlencode({**params, 'cursor': page.next_cursor})}"
     
     # Fetch all employees for the dropdown
-    result = await db.execute(select(models.Employee))
-    employees = result.scalars().all()
+    employees = (await employee_roster.get(db)).employees
     
     return templates.TemplateResponse(
         "admin/attendance.html",
         {
             "request": request,
             "active_page": "attendance",
-            "events": events,
+            "events": page.events,
+            "next_url": next_url,
+            "first_url": f"/admin/attendance?{urllib.parse.urlencode(params)}" if cursor else None,
             "filtered": filtered,
             "date_range": date_range,
             "event_type": event_type,
@@ -688,8 +698,7 @@ async def manual_check_form(
     admin_user: models.Employee = Depends(get_current_admin)
 ):
     # Get all employees for the dropdown
-    result = await db.execute(select(models.Employee))
-    employees = result.scalars().all()
+    employees = (await employee_roster.get(db)).employees
     
     return templates.TemplateResponse(
         "admin/manual_check.html",
@@ -733,8 +742,7 @@ async def manual_check_submit(
         created_event = await crud.create_attendance_event(db, event_data=event)
         
         # Get all employees for the dropdown (for redisplay)
-        result = await db.execute(select(models.Employee))
-        employees = result.scalars().all()
+        employees = (await employee_roster.get(db)).employees
         
         return templates.TemplateResponse(
             "admin/manual_check.html",
@@ -748,8 +756,7 @@ async def manual_check_submit(
         )
     except Exception as e:
         # Get all employees for the dropdown (for redisplay)
-        result = await db.execute(select(models.Employee))
-        employees = result.scalars().all()
+        employees = (await employee_roster.get(db)).employees
         
         return templates.TemplateResponse(
             "admin/manual_check.html",
@@ -777,8 +784,7 @@ async def edit_attendance_form(
         raise HTTPException(status_code=404, detail="Attendance record not found")
     
     # Get all employees for the dropdown
-    result = await db.execute(select(models.Employee))
-    employees = result.scalars().all()
+    employees = (await employee_roster.get(db)).employees
     
     return templates.TemplateResponse(
         "admin/edit_attendance.html",
@@ -810,8 +816,7 @@ async def update_attendance(
     # Validate event type
     if event_type not in ["checkin", "checkout"]:
         # Get all employees for the dropdown for re-rendering the form
-        result = await db.execute(select(models.Employee))
-        employees = result.scalars().all()
+        employees = (await employee_roster.get(db)).employees
         
         return templates.TemplateResponse(
             "admin/edit_attendance.html",
@@ -846,8 +851,7 @@ async def update_attendance(
         )
     except Exception as e:
         # Get all employees for the dropdown for re-rendering the form
-        result = await db.execute(select(models.Employee))
-        employees = result.scalars().all()
+        employees = (await employee_roster.get(db)).employees
         
         return templates.TemplateResponse(
             "admin/edit_attendance.html",
@@ -1,46 +1,85 @@
 # time_management/app/routes/attendance.py
-from fastapi import APIRouter, HTTPException, Depends, Body, Query, Request
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession # Use AsyncSession
-from sqlalchemy import select, and_
-from datetime import datetime, timedelta, timezone
-from app import models, schemas, crud, security
-from app.database import get_async_db # Use async dependency
-from typing import List, Optional, Dict, Any
+from datetime import datetime, timezone
+from app import models, schemas, crud, security, scan_engine, columnar_export, report_jobs, pagination, reader_auth, event_changes
+from app.database import async_engine, report_engine, get_async_db, get_report_db, pool_stats # Use async dependency
+from app.cache import employee_directory, employee_roster, last_event_cache, principal_cache
+from app.daily_summary import summary_refresher
+from app.ingest_queue import QueueFull, scan_queue
+from app.report_cache import report_cache
+from app.report_limiter import report_limiter
+from typing import List, Optional
 import os
 import csv
-import io
-from fastapi.responses import StreamingResponse
+from fastapi.responses import Response, StreamingResponse, JSONResponse
+from fastapi.encoders import jsonable_encoder
 
 ACTION_COOLDOWN_SECONDS = int(os.getenv("ACTION_COOLDOWN_SECONDS", 10))
+SCAN_BATCH_MAX_ITEMS = int(os.getenv("SCAN_BATCH_MAX_ITEMS", 1000))
 
 router = APIRouter(
     tags=["attendance"],
 )
 
-# Helper function to create a CSV StreamingResponse
-def create_csv_response(data: List[List[str]], filename: str) -> StreamingResponse:
-    """Helper function to create a CSV streaming response"""
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write data
-    for row in data:
-        writer.writerow(row)
+# Helper function to create a report/export download
+async def create_report_response(db: AsyncSession, job_request: schemas.ReportJobRequest, filename_stem: str) -> Response:
+    """
+    Serve a report from the result cache, or stream it (CSV chunks or
+    columnar row groups) and keep a copy in the cache on the way out.
+    Streaming needs a report_limiter slot, held until the last chunk.
+    """
+    params = report_jobs.normalize_params(job_request)
+    if params["format"] == "csv":
+        extension = "csv"
+    else:
+        columnar_export.check_format(params["format"])
+        _, extension = columnar_export.FORMATS[params["format"]]
+    headers = {"Content-Disposition": f"attachment; filename={filename_stem}.{extension}"}
     
-    # Reset the pointer to the beginning of the StringIO object
-    output.seek(0)
+    key = report_jobs.params_key(params)
+    cached = report_cache.get(key)
+    # Writes through other worker processes never reached this cache; they show in the change marks
+    if cached is not None and await event_changes.changed_since(db, cached.range_start, cached.range_end, cached.computed_at):
+        report_cache.discard(key)
+        cached = None
+    if cached is not None:
+        return Response(cached.body, media_type=cached.media_type, headers=headers)
     
-    # Return the CSV as a downloadable file
+    if not await report_limiter.acquire(report_limiter.queue_timeout):
+        raise HTTPException(
+            status_code=503,
+            detail="Too many reports are being generated. Try again shortly or use /api/reports/jobs.",
+            headers={"Retry-After": "10"}
+        )
+    chunks, media_type = report_jobs.result_stream(db, params)
+    filters = report_jobs.filters_from_params(params)
     return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+        await report_limiter.hold(report_cache.tee(chunks, key, media_type, filters.start_date, filters.end_date)),
+        media_type=media_type,
+        headers=headers
     )
 
+# Helpers for paginated event lists: the body stays a plain list and the
+# cursor for the next page travels in the X-Next-Cursor and Link headers
+async def load_page(query) -> pagination.EventPage:
+    try:
+        return await query
+    except pagination.InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def page_response(request: Request, response: Response, page: pagination.EventPage):
+    if page.next_cursor:
+        next_url = request.url.include_query_params(cursor=page.next_cursor)
+        response.headers["X-Next-Cursor"] = page.next_cursor
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+    return page.events
+
 @router.post("/scan", response_model=schemas.AttendanceEventResponse)
 async def process_rfid_scan( 
     scan_data: schemas.RFIDScanRequest,
     db: AsyncSession = Depends(get_async_db),
+    reader_id: Optional[str] = Depends(reader_auth.get_scan_reader),
     # Use the async version of get_current_authenticated_user (defined in step 5)
     # current_user: models.Employee = Depends(security.get_current_authenticated_user_async)
 ):
@@ -49,48 +88,98 @@ async def process_rfid_scan(
         raise HTTPException(status_code=400, detail="RFID tag cannot be empty")
 
     # print(f"\nProcessing direct scan request for RFID: {rfid_tag} by user: {current_user.username}")
-    print(f"\nProcessing direct scan request for RFID: {rfid_tag} ")
+    print(f"\nProcessing direct scan request for RFID: {rfid_tag} from reader: {reader_id or 'unsigned'}")
 
 
-    employee = await crud.get_employee_by_rfid(db, rfid_tag)
+    employee = await crud.get_employee_entry_by_rfid(db, rfid_tag)
     if not employee:
         print(f"Employee not found for RFID: {rfid_tag}")
         raise HTTPException(status_code=404, detail="Employee not found")
 
-    latest_event = await crud.get_latest_attendance_event(db, employee.id)
+    if scan_queue.running:
+        return enqueue_scan(rfid_tag, employee)
+
+    try:
+        new_event = await scan_engine.record_scan(db, employee.id, ACTION_COOLDOWN_SECONDS)
+    except scan_engine.CooldownActive as e:
+        print(f"Cooldown active for {rfid_tag}. Ignoring scan.")
+        raise HTTPException(status_code=429, detail=f"Cooldown active. Try again later. Last event: {e.state.event_type} at {e.state.timestamp}")
+
+    print(f"Successfully recorded '{new_event.event_type}' for {rfid_tag}")
 
-    last_event_type = latest_event.event_type if latest_event else None
-    last_event_dt = latest_event.timestamp if latest_event else None
+    return new_event
 
-    if last_event_dt:
-        if last_event_dt.tzinfo is None:
-            last_event_dt = last_event_dt.replace(tzinfo=timezone.utc)
 
-        current_time_utc = datetime.now(timezone.utc)
-        time_since_last_event = current_time_utc - last_event_dt
-        print(f"Time since last event ('{last_event_type}' at {last_event_dt}): {time_since_last_event}")
+def enqueue_scan(rfid_tag: str, employee) -> JSONResponse:
+    """Queued ingestion mode: acknowledge once the scan is in the write-behind queue."""
+    scanned_at = datetime.now(timezone.utc)
 
-        if time_since_last_event.total_seconds() < ACTION_COOLDOWN_SECONDS:
+    # Reject obvious repeats right away; the flush re-checks against the database
+    last_state = last_event_cache.get(employee.id)
+    if last_state is not None and last_state.timestamp is not None:
+        if (scanned_at - last_state.timestamp).total_seconds() < ACTION_COOLDOWN_SECONDS:
             print(f"Cooldown active for {rfid_tag}. Ignoring scan.")
-            raise HTTPException(status_code=429, detail=f"Cooldown active. Try again later. Last event: {last_event_type} at {last_event_dt}")
-        else:
-            print("Cooldown passed.")
-    else:
-        print("No previous event found, proceeding.")
+            raise HTTPException(status_code=429, detail=f"Cooldown active. Try again later. Last event: {last_state.event_type} at {last_state.timestamp}")
 
-    next_action = "checkout" if last_event_type == "checkin" else "checkin"
-    print(f"Determined action for {rfid_tag}: '{next_action}'")
+    try:
+        scan_queue.enqueue(schemas.BatchScanItem(rfid=rfid_tag, scanned_at=scanned_at))
+    except QueueFull as e:
+        print(f"Scan queue rejected {rfid_tag}: {e}")
+        raise HTTPException(status_code=503, detail="Scan queue is full. Try again later.")
 
-    new_event_data = models.AttendanceEvent(
+    print(f"Queued scan for {rfid_tag} (queue depth {scan_queue.depth})")
+    response = schemas.QueuedScanResponse(
+        rfid=rfid_tag,
         user_id=employee.id,
-        event_type=next_action,
-        timestamp=datetime.now(timezone.utc),
-        manual=False
+        username=employee.username,
+        scanned_at=scanned_at
     )
-    new_event = await crud.create_attendance_event(db, new_event_data)
-    print(f"Successfully recorded '{next_action}' for {rfid_tag}")
+    return JSONResponse(status_code=202, content=jsonable_encoder(response))
 
-    return new_event
+
+@router.post("/scan/batch", response_model=schemas.BatchScanResponse)
+async def process_rfid_scan_batch(
+    batch: schemas.BatchScanRequest,
+    db: AsyncSession = Depends(get_async_db),
+    reader_id: Optional[str] = Depends(reader_auth.get_scan_reader),
+):
+    """
+    Ingest a backlog of scans buffered by a reader while it was offline.
+    Each item carries the time the tag was read; results come back in request order.
+    """
+    if not batch.scans:
+        raise HTTPException(status_code=400, detail="Batch must contain at least one scan")
+    if len(batch.scans) > SCAN_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch too large. Maximum is {SCAN_BATCH_MAX_ITEMS} scans")
+
+    print(f"\nProcessing batch of {len(batch.scans)} scans from reader: {reader_id or 'unsigned'}")
+    for item in batch.scans:
+        if item.reader_id is None:
+            item.reader_id = reader_id
+    results = await scan_engine.record_scan_batch(db, batch.scans, ACTION_COOLDOWN_SECONDS)
+    recorded = sum(1 for result in results if result.status == "recorded")
+    print(f"Batch processed: {recorded} of {len(results)} scans recorded")
+
+    return {"recorded": recorded, "results": results}
+
+
+@router.get("/scan/stats")
+async def get_scan_stats(
+    current_admin: models.Employee = Depends(security.get_current_admin_user_async)
+):
+    """Expose hot-path cache counters for monitoring."""
+    return {
+        "employee_directory": employee_directory.stats(),
+        "last_event_cache": last_event_cache.stats(),
+        "ingest_queue": scan_queue.stats(),
+        "daily_summary": summary_refresher.stats(),
+        "report_cache": report_cache.stats(),
+        "employee_roster": employee_roster.stats(),
+        "principal_cache": principal_cache.stats(),
+        "db_pool": pool_stats(async_engine),
+        "report_pool": pool_stats(report_engine),
+        "report_limiter": report_limiter.stats(),
+    }
 
 
 @router.get("/employees/status", response_model=schemas.EmployeeStatusResponse)
@@ -98,19 +187,17 @@ async def get_employee_status(rfid: str,
                               db: AsyncSession = Depends(get_async_db),
                               authenticated_user: models.Employee = Depends(security.get_current_authenticated_user_async)
 ):
-    employee = await crud.get_employee_by_rfid(db, rfid)
+    employee = await crud.get_employee_entry_by_rfid(db, rfid)
     if not employee:
         raise HTTPException(status_code=404, detail="Employee not found")
 
-    latest_event = await crud.get_latest_attendance_event(db, employee.id)
-
-    last_event_type = latest_event.event_type if latest_event else None
+    last_state = await crud.get_latest_event_state(db, employee.id)
 
     return {
         "employee_id": employee.id,
         "username": employee.username,
-        "last_event": last_event_type,
-        "last_event_time": latest_event.timestamp if latest_event else None
+        "last_event": last_state.event_type,
+        "last_event_time": last_state.timestamp
     }
 
 @router.post("/checkin", response_model=schemas.AttendanceEventResponse)
@@ -119,7 +206,7 @@ async def check_in(
     db: AsyncSession = Depends(get_async_db), 
     current_admin: models.Employee = Depends(security.get_current_admin_user_async)
 ):
-    employee = await crud.get_employee_by_rfid(db, rfid)
+    employee = await crud.get_employee_entry_by_rfid(db, rfid)
     if not employee:
         raise HTTPException(status_code=404, detail="Employee not found")
 
@@ -135,10 +222,16 @@ async def check_in(
     return event
 
 @router.get("/checkin", response_model=List[schemas.AttendanceEventResponse])
-async def get_checkins(db: AsyncSession = Depends(get_async_db), authenticated_user: models.Employee = Depends(security.get_current_authenticated_user_async)
+async def get_checkins(
+    request: Request,
+    response: Response,
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE, description="Page size"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    db: AsyncSession = Depends(get_async_db),
+    authenticated_user: models.Employee = Depends(security.get_current_authenticated_user_async)
 ): 
-    events = await crud.get_checkin_events(db)
-    return events
+    page = await load_page(crud.get_checkin_events(db, limit=limit, cursor=cursor))
+    return page_response(request, response, page)
 
 
 @router.post("/checkout", response_model=schemas.AttendanceEventResponse)
@@ -147,7 +240,7 @@ async def check_out(
     db: AsyncSession = Depends(get_async_db), 
     current_admin: models.Employee = Depends(security.get_current_admin_user_async)
 ):
-    employee = await crud.get_employee_by_rfid(db, rfid)
+    employee = await crud.get_employee_entry_by_rfid(db, rfid)
     if not employee:
         raise HTTPException(status_code=404, detail="Employee not found")
 
@@ -164,33 +257,45 @@ async def check_out(
     return event
 
 @router.get("/checkout", response_model=List[schemas.AttendanceEventResponse])
-async def get_checkouts(db: AsyncSession = Depends(get_async_db), authenticated_user: models.Employee = Depends(security.get_current_authenticated_user_async)
+async def get_checkouts(
+    request: Request,
+    response: Response,
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE, description="Page size"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    db: AsyncSession = Depends(get_async_db),
+    authenticated_user: models.Employee = Depends(security.get_current_authenticated_user_async)
 ): 
-    events = await crud.get_checkout_events(db)
-    return events
+    page = await load_page(crud.get_checkout_events(db, limit=limit, cursor=cursor))
+    return page_response(request, response, page)
 
 @router.get("/filtered", response_model=List[schemas.AttendanceEventResponse])
 async def get_filtered_attendance(
+    request: Request,
+    response: Response,
     start_date: Optional[datetime] = Query(None, description="Filter by start date (ISO format)"),
     end_date: Optional[datetime] = Query(None, description="Filter by end date (ISO format)"),
     event_type: Optional[str] = Query(None, description="Filter by event type (checkin/checkout)"),
     user_id: Optional[int] = Query(None, description="Filter by user ID"),
     username: Optional[str] = Query(None, description="Filter by username"),
     manual: Optional[bool] = Query(None, description="Filter by manual flag (true/false)"),
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE, description="Page size"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
     db: AsyncSession = Depends(get_async_db),
     authenticated_user: models.Employee = Depends(security.get_current_authenticated_user_async)
 ):
-    """Get attendance events with filters applied"""
-    events = await crud.get_filtered_attendance_events(
+    """Get one page of attendance events with filters applied, newest first"""
+    page = await load_page(crud.get_filtered_attendance_events(
         db,
         start_date=start_date,
         end_date=end_date,
         event_type=event_type,
         user_id=user_id,
         username=username,
-        manual=manual
-    )
-    return events
+        manual=manual,
+        limit=limit,
+        cursor=cursor
+    ))
+    return page_response(request, response, page)
 
 @router.get("/export/csv", response_class=StreamingResponse)
 async def export_attendance_csv(
@@ -201,78 +306,29 @@ async def export_attendance_csv(
     user_id: Optional[int] = Query(None, description="Filter by user ID"),
     username: Optional[str] = Query(None, description="Filter by username"),
     manual: Optional[bool] = Query(None, description="Filter by manual flag (true/false)"),
-    db: AsyncSession = Depends(get_async_db),
+    include_details: bool = Query(True, description="Include the detailed event section"),
+    export_format: str = Query("csv", alias="format", pattern="^(csv|parquet|arrow)$", description="csv, parquet or arrow (one typed row per event)"),
+    db: AsyncSession = Depends(get_report_db),
     authenticated_user: models.Employee = Depends(security.get_admin_from_cookie)
 ):
-    """Export filtered attendance events as CSV"""
-    # Get filtered events
-    events = await crud.get_filtered_attendance_events(
-        db,
+    """Export filtered attendance events as CSV (or Parquet/Arrow)"""
+    job_request = schemas.ReportJobRequest(
+        kind="export",
+        format=export_format,
         start_date=start_date,
         end_date=end_date,
         event_type=event_type,
         user_id=user_id,
         username=username,
-        manual=manual
+        manual=manual,
+        include_details=include_details
     )
     
-    # Get all employees
-    result = await db.execute(select(models.Employee))
-    employees = result.scalars().all()
-    
-    # Prepare employee statistics
-    employee_data = {}
-    for employee in employees:
-        employee_data[employee.id] = {
-            "username": employee.username,
-            "rfid": employee.rfid,
-            "events": [],
-            "total_days": 0,
-            "total_hours": 0
-        }
-    
-    # Calculate employee statistics
-    calculate_employee_statistics(events, employee_data)
-    
-    # Prepare CSV data with two sections
-    csv_data = [
-        # First section: Summary with Days Present and Total Hours
-        ['Employee Summary'],
-        ['Employee Name', 'Days Present', 'Total Hours'],
-    ]
-    
-    # Add summary rows for each employee
-    for emp_id, data in employee_data.items():
-        # Only include employees with records in the filtered period
-        if data["events"]:
-            csv_data.append([
-                data["username"],
-                data["total_days"],
-                f"{data['total_hours']:.2f}"
-            ])
-    
-    # Add separator between sections
-    csv_data.append([])
-    csv_data.append(['Detailed Attendance Records'])
-    
-    # Add headers for detailed records
-    csv_data.append(['Employee Name', 'Event Type', 'Timestamp'])
-    
-    # Add detailed rows sorted by timestamp
-    sorted_events = sorted(events, key=lambda e: e.timestamp)
-    for event in sorted_events:
-        csv_data.append([
-            event.employee.username,
-            event.event_type,
-            event.timestamp.strftime("%Y-%m-%d %H:%M:%S")
-        ])
-    
     # Generate filename with current timestamp
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"attendance_export_{timestamp}.csv"
     
-    # Return CSV response
-    return create_csv_response(csv_data, filename)
+    # Summary comes from an aggregate query, details are streamed row by row
+    return await create_report_response(db, job_request, f"attendance_export_{timestamp}")
 
 @router.get("/admin/report", response_class=StreamingResponse)
 async def admin_attendance_report(
@@ -280,76 +336,24 @@ async def admin_attendance_report(
     start_date: datetime = Query(..., description="Report start date (ISO format, required)"),
     end_date: datetime = Query(..., description="Report end date (ISO format, required)"),
     username: Optional[str] = Query(None, description="Filter by employee username"),
-    db: AsyncSession = Depends(get_async_db),
+    include_details: bool = Query(True, description="Include the detailed entries section"),
+    export_format: str = Query("csv", alias="format", pattern="^(csv|parquet|arrow)$", description="csv, parquet or arrow (one typed row per event)"),
+    db: AsyncSession = Depends(get_report_db),
     admin_user: models.Employee = Depends(security.get_admin_from_cookie)
 ):
     """
     Generate a comprehensive attendance report for admins.
     Requires admin privileges.
     """
-    # Get all employees
-    result = await db.execute(select(models.Employee))
-    employees = result.scalars().all()
-    
-    # Get all attendance events in date range with optional employee filter
-    events = await crud.get_filtered_attendance_events(
-        db,
+    job_request = schemas.ReportJobRequest(
+        kind="report",
+        format=export_format,
         start_date=start_date,
         end_date=end_date,
-        username=username
+        username=username,
+        include_details=include_details
     )
     
-    # Process data for report
-    employee_data = {}
-    for employee in employees:
-        # If username filter is applied, skip other employees
-        if username and employee.username != username:
-            continue
-            
-        employee_data[employee.id] = {
-            "id": employee.id,
-            "username": employee.username,
-            "rfid": employee.rfid,
-            "events": [],
-            "total_days": 0,
-            "total_hours": 0
-        }
-    
-    # Calculate employee statistics
-    calculate_employee_statistics(events, employee_data)
-    
-    # Prepare CSV data
-    csv_data = [
-        # Main report headers
-        ['Username', 'RFID', 'Days Present', 'Total Hours']
-    ]
-    
-    # Write summary data for each employee
-    for emp_id, data in employee_data.items():
-        csv_data.append([
-            data["username"],
-            data["rfid"],
-            data["total_days"],
-            f"{data['total_hours']:.2f}"
-        ])
-    
-    # Add separator and headers for details
-    csv_data.append([])  # Empty row as separator
-    csv_data.append(['Detailed Entries'])
-    csv_data.append(['Employee', 'Event Type', 'Timestamp'])
-    
-    # Sort all events by timestamp
-    all_events_sorted = sorted(events, key=lambda e: e.timestamp)
-    
-    # Add detail rows
-    for event in all_events_sorted:
-        if event.user_id in employee_data:
-            csv_data.append([
-                employee_data[event.user_id]["username"],
-                event.event_type,
-                event.timestamp.strftime("%Y-%m-%d %H:%M:%S")
-            ])
-    
     # Generate filename with current timestamp and date range
     start_str = start_date.strftime("%Y%m%d")
     end_str = end_date.strftime("%Y%m%d")
@@ -357,65 +361,8 @@ async def admin_attendance_report(
     
     # Add employee name to filename if filtered
     if username:
-        filename = f"attendance_report_{username}_{start_str}_to_{end_str}_{timestamp}.csv"
+        filename_stem = f"attendance_report_{username}_{start_str}_to_{end_str}_{timestamp}"
     else:
-        filename = f"attendance_report_{start_str}_to_{end_str}_{timestamp}.csv"
-    
-    # Return CSV response
-    return create_csv_response(csv_data, filename)
-
-# Helper function for report generation
-def calculate_employee_statistics(events: List[models.AttendanceEvent], employee_data: Dict[int, Dict[str, Any]]):
-    """Calculate statistics for each employee based on their attendance events"""
-    # Group events by employee and date
-    daily_events = {}
-    for event in events:
-        employee_id = event.user_id
-        event_date = event.timestamp.date().isoformat()
-        
-        # Add event to employee data
-        if employee_id in employee_data:
-            employee_data[employee_id]["events"].append(event)
-            
-        # Group by date for daily calculations
-        key = f"{employee_id}_{event_date}"
-        if key not in daily_events:
-            daily_events[key] = []
-        daily_events[key].append(event)
+        filename_stem = f"attendance_report_{start_str}_to_{end_str}_{timestamp}"
     
-    # Calculate daily totals
-    for key, day_events in daily_events.items():
-        # Sort events by timestamp
-        day_events.sort(key=lambda e: e.timestamp)
-        
-        # Process checkins and checkouts
-        checkins = [e for e in day_events if e.event_type == "checkin"]
-        checkouts = [e for e in day_events if e.event_type == "checkout"]
-        
-        employee_id = day_events[0].user_id
-        if employee_id not in employee_data:
-            continue
-            
-        # If we have at least one checkin and checkout, calculate hours
-        if checkins and checkouts:
-            employee_data[employee_id]["total_days"] += 1
-            
-            # Match each checkin with the next checkout
-            total_seconds = 0
-            for i, checkin in enumerate(checkins):
-                # Find the next checkout after this checkin
-                matching_checkout = None
-                for checkout in checkouts:
-                    if checkout.timestamp > checkin.timestamp:
-                        matching_checkout = checkout
-                        break
-                
-                if matching_checkout:
-                    # Calculate duration in seconds
-                    duration = (matching_checkout.timestamp - checkin.timestamp).total_seconds()
-                    total_seconds += duration
-            
-            # Add to employee total hours (convert seconds to hours)
-            if total_seconds > 0:
-                employee_data[employee_id]["total_hours"] += total_seconds / 3600
-
+    return await create_report_response(db, job_request, filename_stem)
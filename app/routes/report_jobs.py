@@ -0,0 +1,65 @@
+# time_management/app/routes/report_jobs.py
+import os
+
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models, schemas, security
+from app.database import get_async_db
+from app.report_jobs import InvalidJobRequest, job_is_stale, job_response, report_runner
+
+router = APIRouter(
+    prefix="/reports/jobs",
+    tags=["reports"],
+)
+
+async def get_job_or_404(db: AsyncSession, job_id: str) -> models.ReportJob:
+    job = await db.get(models.ReportJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    return job
+
+@router.post("", response_model=schemas.ReportJobResponse, status_code=202)
+async def create_report_job(
+    job_request: schemas.ReportJobRequest,
+    db: AsyncSession = Depends(get_async_db),
+    admin_user: models.Employee = Depends(security.get_admin_from_cookie)
+):
+    """
+    Queue a report (or export) to be computed in the background.
+    Identical parameters return the existing job (200) instead of a new one (202).
+    """
+    try:
+        job, reused = await report_runner.submit(db, job_request, created_by=admin_user.id)
+    except InvalidJobRequest as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONResponse(
+        status_code=200 if reused else 202,
+        content=jsonable_encoder(job_response(job, reused=reused))
+    )
+
+@router.get("/{job_id}", response_model=schemas.ReportJobResponse)
+async def get_report_job(
+    job_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    admin_user: models.Employee = Depends(security.get_admin_from_cookie)
+):
+    """Status and progress of a report job"""
+    job = await get_job_or_404(db, job_id)
+    return job_response(job, stale=await job_is_stale(db, job))
+
+@router.get("/{job_id}/download")
+async def download_report_job(
+    job_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    admin_user: models.Employee = Depends(security.get_admin_from_cookie)
+):
+    """Download a finished report. Supports Range requests for resuming large files."""
+    job = await get_job_or_404(db, job_id)
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=f"Report job is {job.status}")
+    if not job.file_path or not os.path.exists(job.file_path):
+        raise HTTPException(status_code=410, detail="Report file is no longer available")
+    return FileResponse(job.file_path, media_type=job.media_type, filename=job.filename)
@@ -0,0 +1,299 @@
+# time_management/app/scan_engine.py
+"""
+Atomic RFID scan recording.
+
+The cooldown check, the checkin/checkout toggle and the insert are a single
+INSERT ... SELECT ... RETURNING statement. On PostgreSQL the transaction
+first takes a transaction-scoped advisory lock on the employee, so two
+readers scanning the same card at once are serialized. The second scan
+then sees the first one's row and hits the cooldown. SQLite (used by the
+test suite) serializes all writers on its database lock, which gives the
+same guarantee.
+
+The daily_attendance_summary rows of the scanned day are refreshed after
+the scan commits, outside its transaction (see app.event_changes).
+"""
+import bisect
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, insert, exists, case, literal, cast, func, text, bindparam, Integer, Boolean, DateTime
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models, crud, schemas, event_changes
+from app.cache import EmployeeEntry, LastEventState, employee_directory, last_event_cache
+
+# First key of the two-key advisory lock, so scan locks never collide with other app locks
+SCAN_LOCK_NAMESPACE = 7301
+
+# Reader clocks drift a little; anything further in the future is rejected
+BATCH_MAX_CLOCK_SKEW_SECONDS = 60
+
+
+class CooldownActive(Exception):
+    """Raised when the employee's latest event is still inside the cooldown window."""
+
+    def __init__(self, state: LastEventState):
+        super().__init__(f"Cooldown active. Last event: {state.event_type} at {state.timestamp}")
+        self.state = state
+
+
+def _is_postgres(db: AsyncSession) -> bool:
+    return db.bind is not None and db.bind.dialect.name == "postgresql"
+
+
+def build_scan_insert(user_id: int, scanned_at: datetime, cooldown_seconds: int):
+    """INSERT the toggled event unless any event falls inside the cooldown window."""
+    events = models.AttendanceEvent.__table__
+    last_event_type = (
+        select(events.c.event_type)
+        .where(events.c.user_id == user_id)
+        .order_by(events.c.timestamp.desc(), events.c.id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    # "Latest event newer than scanned_at - cooldown" is the same as "any such event exists"
+    recent_event = exists().where(
+        events.c.user_id == user_id,
+        events.c.timestamp > scanned_at - timedelta(seconds=cooldown_seconds),
+    )
+    source = select(
+        literal(user_id, Integer),
+        case((last_event_type == "checkin", "checkout"), else_="checkin"),
+        literal(scanned_at, DateTime(timezone=True)),
+        literal(False, Boolean),
+    ).where(~recent_event)
+    return (
+        insert(events)
+        .from_select(["user_id", "event_type", "timestamp", "manual"], source)
+        .returning(events.c.id, events.c.user_id, events.c.event_type, events.c.timestamp, events.c.manual)
+    )
+
+
+async def record_scan(
+    db: AsyncSession,
+    user_id: int,
+    cooldown_seconds: int,
+    scanned_at: Optional[datetime] = None,
+) -> models.AttendanceEvent:
+    """Record a scan for an employee and return the new event, or raise CooldownActive."""
+    scanned_at = scanned_at or datetime.now(timezone.utc)
+
+    # Cheap rejection for repeated reads of the same card within this worker
+    cached = last_event_cache.get(user_id)
+    if cached is not None and cached.timestamp is not None:
+        if (scanned_at - cached.timestamp).total_seconds() < cooldown_seconds:
+            raise CooldownActive(cached)
+
+    try:
+        if _is_postgres(db):
+            await db.execute(
+                select(func.pg_advisory_xact_lock(cast(SCAN_LOCK_NAMESPACE, Integer), cast(user_id, Integer)))
+            )
+        result = await db.execute(build_scan_insert(user_id, scanned_at, cooldown_seconds))
+        row = result.first()
+        if row is not None:
+            await event_changes.events_appended(db, {user_id: [row.timestamp]})
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+    if row is None:
+        # Another scan (possibly from another worker) got there first
+        latest_event = await crud.get_latest_attendance_event(db, user_id)
+        state = LastEventState.from_event(latest_event)
+        last_event_cache.set(user_id, state)
+        raise CooldownActive(state)
+
+    event = models.AttendanceEvent(**row._mapping)
+    # Nothing newer can exist, otherwise the cooldown check would have failed
+    last_event_cache.set(user_id, LastEventState.from_event(event))
+    return event
+
+
+# --- Batch Ingestion ---
+
+def _as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+async def _resolve_rfids(db: AsyncSession, rfids: List[str]) -> Dict[str, EmployeeEntry]:
+    """Resolve RFID tags through the directory, loading all misses with one query."""
+    resolved = {}
+    missing = []
+    for rfid in rfids:
+        entry = employee_directory.get_by_rfid(rfid)
+        if entry is None:
+            missing.append(rfid)
+        else:
+            resolved[rfid] = entry
+    if missing:
+        result = await db.execute(select(models.Employee).filter(models.Employee.rfid.in_(missing)))
+        for employee in result.scalars().all():
+            employee_directory.put(employee)
+            resolved[employee.rfid] = EmployeeEntry.from_model(employee)
+    return resolved
+
+
+async def _lock_employees(db: AsyncSession, user_ids: List[int]):
+    """Take the scan advisory locks for several employees in id order (avoids deadlocks)."""
+    if not _is_postgres(db) or not user_ids:
+        return
+    await db.execute(
+        text(
+            "SELECT pg_advisory_xact_lock(:namespace, user_id) "
+            "FROM (SELECT unnest(:user_ids) AS user_id ORDER BY 1) AS locked"
+        ).bindparams(bindparam("user_ids", type_=ARRAY(Integer))),
+        {"namespace": SCAN_LOCK_NAMESPACE, "user_ids": sorted(user_ids)},
+    )
+
+
+async def _load_event_timelines(
+    db: AsyncSession, user_ids: List[int], window_start: datetime, window_end: datetime
+) -> Dict[int, List[Tuple[datetime, str]]]:
+    """
+    Existing (timestamp, event_type) pairs per employee inside the window, plus
+    the last event before it (needed for the toggle of the earliest scan).
+    """
+    events = models.AttendanceEvent
+    timelines: Dict[int, List[Tuple[datetime, str]]] = {user_id: [] for user_id in user_ids}
+
+    previous = (
+        select(events.user_id, func.max(events.timestamp).label("max_timestamp"))
+        .where(events.user_id.in_(user_ids), events.timestamp < window_start)
+        .group_by(events.user_id)
+        .subquery()
+    )
+    before = select(events.user_id, events.timestamp, events.event_type).join(
+        previous,
+        (events.user_id == previous.c.user_id) & (events.timestamp == previous.c.max_timestamp),
+    )
+    inside = select(events.user_id, events.timestamp, events.event_type).where(
+        events.user_id.in_(user_ids),
+        events.timestamp >= window_start,
+        events.timestamp <= window_end,
+    )
+    result = await db.execute(before.union_all(inside))
+    for user_id, timestamp, event_type in result.all():
+        timelines[user_id].append((_as_utc(timestamp), event_type))
+    for timeline in timelines.values():
+        timeline.sort(key=lambda item: item[0])
+    return timelines
+
+
+async def record_scan_batch(
+    db: AsyncSession,
+    items: List[schemas.BatchScanItem],
+    cooldown_seconds: int,
+) -> List[schemas.BatchScanResult]:
+    """
+    Record a backlog of reader scans and return one result per item, in request order.
+
+    Scans are replayed per employee in scanned_at order, using the same cooldown
+    and toggle rules as live scans. The rules apply against both the stored
+    history and the earlier scans in the batch. Accepted scans go in with one
+    multi-row INSERT.
+    """
+    now = datetime.now(timezone.utc)
+    cooldown = timedelta(seconds=cooldown_seconds)
+    results: List[Optional[schemas.BatchScanResult]] = [None] * len(items)
+
+    # 1. Validate and resolve
+    valid: List[Tuple[int, str, datetime, Optional[str]]] = []
+    for index, item in enumerate(items):
+        rfid = item.rfid.strip()
+        scanned_at = _as_utc(item.scanned_at)
+        if not rfid:
+            results[index] = schemas.BatchScanResult(index=index, rfid=item.rfid, status="invalid", detail="RFID tag cannot be empty")
+        elif scanned_at > now + timedelta(seconds=BATCH_MAX_CLOCK_SKEW_SECONDS):
+            results[index] = schemas.BatchScanResult(index=index, rfid=rfid, status="invalid", detail="scanned_at is in the future")
+        else:
+            valid.append((index, rfid, scanned_at, item.reader_id))
+
+    employees = await _resolve_rfids(db, sorted({rfid for _, rfid, _, _ in valid}))
+
+    scans_by_user: Dict[int, List[Tuple[int, str, datetime, Optional[str]]]] = {}
+    for scan in valid:
+        index, rfid, _, _ = scan
+        employee = employees.get(rfid)
+        if employee is None:
+            results[index] = schemas.BatchScanResult(index=index, rfid=rfid, status="unknown_rfid", detail="Employee not found")
+        else:
+            scans_by_user.setdefault(employee.id, []).append(scan)
+
+    if not scans_by_user:
+        return results
+
+    # 2. Decide every scan against the stored history, under the per-employee locks
+    new_rows = []
+    accepted_indexes = []
+    try:
+        user_ids = sorted(scans_by_user)
+        await _lock_employees(db, user_ids)
+        all_times = [scan[2] for scans in scans_by_user.values() for scan in scans]
+        timelines = await _load_event_timelines(db, user_ids, min(all_times) - cooldown, max(all_times) + cooldown)
+
+        for user_id, scans in scans_by_user.items():
+            timeline = timelines[user_id]
+            timestamps = [timestamp for timestamp, _ in timeline]
+            for index, rfid, scanned_at, reader_id in sorted(scans, key=lambda scan: (scan[2], scan[0])):
+                position = bisect.bisect_right(timestamps, scanned_at)
+                previous = timeline[position - 1] if position > 0 else None
+                following = timeline[position] if position < len(timeline) else None
+                if previous is not None and scanned_at - previous[0] < cooldown:
+                    results[index] = schemas.BatchScanResult(
+                        index=index, rfid=rfid, status="cooldown",
+                        detail=f"Cooldown active. Last event: {previous[1]} at {previous[0]}"
+                    )
+                    continue
+                if following is not None and following[0] - scanned_at < cooldown:
+                    results[index] = schemas.BatchScanResult(
+                        index=index, rfid=rfid, status="cooldown",
+                        detail=f"Duplicate of {following[1]} at {following[0]}"
+                    )
+                    continue
+                event_type = "checkout" if previous is not None and previous[1] == "checkin" else "checkin"
+                timeline.insert(position, (scanned_at, event_type))
+                timestamps.insert(position, scanned_at)
+                new_rows.append({
+                    "user_id": user_id,
+                    "event_type": event_type,
+                    "timestamp": scanned_at,
+                    "manual": False,
+                    "notes": f"Batch scan from reader {reader_id}" if reader_id else None,
+                })
+                accepted_indexes.append((index, rfid))
+
+        # 3. One multi-row INSERT for everything accepted
+        inserted = []
+        if new_rows:
+            table = models.AttendanceEvent.__table__
+            result = await db.execute(
+                insert(table).returning(
+                    table.c.id, table.c.user_id, table.c.event_type, table.c.timestamp, table.c.manual,
+                    sort_by_parameter_order=True,
+                ),
+                new_rows,
+            )
+            inserted = result.all()
+            accepted_times: Dict[int, List[datetime]] = {}
+            for row in new_rows:
+                accepted_times.setdefault(row["user_id"], []).append(row["timestamp"])
+            await event_changes.events_appended(db, accepted_times)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+    for (index, rfid), row in zip(accepted_indexes, inserted):
+        event = models.AttendanceEvent(**row._mapping)
+        last_event_cache.record(event)
+        results[index] = schemas.BatchScanResult(
+            index=index, rfid=rfid, status="recorded",
+            event_id=row.id, event_type=row.event_type, timestamp=row.timestamp
+        )
+    return results
@@ -6,6 +6,34 @@ from typing import Optional, List
 class RFIDScanRequest(BaseModel):
     rfid: str
 
+class QueuedScanResponse(BaseModel):
+    status: str = "queued"
+    rfid: str
+    user_id: int
+    username: str
+    scanned_at: datetime
+
+class BatchScanItem(BaseModel):
+    rfid: str
+    scanned_at: datetime  # Time the reader saw the tag (naive values are treated as UTC)
+    reader_id: Optional[str] = None
+
+class BatchScanRequest(BaseModel):
+    scans: List[BatchScanItem]
+
+class BatchScanResult(BaseModel):
+    index: int  # Position of the item in the request
+    rfid: str
+    status: str  # "recorded", "cooldown", "unknown_rfid" or "invalid"
+    event_id: Optional[int] = None
+    event_type: Optional[str] = None
+    timestamp: Optional[datetime] = None
+    detail: Optional[str] = None
+
+class BatchScanResponse(BaseModel):
+    recorded: int
+    results: List[BatchScanResult]
+
 # Employee Schemas
 class EmployeeBase(BaseModel):
     username: str
@@ -71,4 +99,33 @@ class EmployeeStatusResponse(BaseModel):
     last_event_time: Optional[datetime] = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+# Report Job Schemas
+class ReportJobRequest(BaseModel):
+    kind: str = "report"  # "report" (like /api/admin/report) or "export" (like /api/export/csv)
+    format: str = "csv"  # "csv", "parquet" or "arrow"
+    start_date: Optional[datetime] = None  # Required for "report"
+    end_date: Optional[datetime] = None  # Required for "report"
+    username: Optional[str] = None
+    event_type: Optional[str] = None  # "export" only
+    user_id: Optional[int] = None  # "export" only
+    manual: Optional[bool] = None  # "export" only
+    include_details: bool = True
+
+class ReportJobResponse(BaseModel):
+    id: str
+    status: str  # "queued", "running", "done" or "failed"
+    stale: bool
+    reused: bool = False  # An existing job with identical parameters was returned
+    params: dict
+    rows_done: int
+    rows_total: Optional[int] = None
+    progress: Optional[float] = None  # 0.0 - 1.0 when rows_total is known
+    file_size: Optional[int] = None
+    download_url: Optional[str] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
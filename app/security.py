@@ -1,16 +1,17 @@
 # time_management/app/security.py
+import hashlib
 import os
+import uuid
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session # Keep for sync version if needed
 from sqlalchemy.ext.asyncio import AsyncSession 
 from dotenv import load_dotenv
 
-from app import crud, models
-from app.database import get_db, get_async_db 
+from app import passwords
+from app.cache import EmployeeEntry, principal_cache
+from app.database import get_async_db
 
 load_dotenv()
 
@@ -18,12 +19,11 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/token") 
 
 def get_password_hash(password: str) -> str:
-    """Generate a password hash from a plaintext password"""
-    return pwd_context.hash(password)
+    """Generate a password hash from a plaintext password (blocking; see app.passwords)"""
+    return passwords.hash_password_sync(password)
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
@@ -31,11 +31,13 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    # jti identifies the token in the principal cache
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str, credentials_exception):
+def decode_token(token: str, credentials_exception):
+    """(user_id, token_id) of a valid token; tokens issued without a jti are identified by their hash."""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
@@ -43,11 +45,21 @@ def verify_token(token: str, credentials_exception):
             raise credentials_exception
         # Validate that user_id is an integer before returning
         try:
-            return int(user_id)
+            user_id = int(user_id)
         except (ValueError, TypeError):
              raise credentials_exception
     except JWTError:
         raise credentials_exception
+    token_id = payload.get("jti") or hashlib.sha256(token.encode()).hexdigest()
+    return user_id, token_id
+
+def verify_token(token: str, credentials_exception):
+    return decode_token(token, credentials_exception)[0]
+
+async def get_principal(db: AsyncSession, token: str, credentials_exception):
+    """The employee a token belongs to, from the principal cache (EmployeeEntry) or None."""
+    user_id, token_id = decode_token(token, credentials_exception)
+    return await principal_cache.get(db, user_id, token_id)
 
 # --- Cookie-based Authentication ---
 
@@ -65,9 +77,7 @@ async def get_user_from_cookie(request: Request, db: AsyncSession, cookie_name="
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials"
         )
-        user_id = verify_token(token, credentials_exception)
-        
-        user = await crud.get_employee(db, user_id=user_id)
+        user = await get_principal(db, token, credentials_exception)
         if not user:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
         
@@ -84,52 +94,26 @@ async def get_admin_from_cookie(request: Request, db: AsyncSession = Depends(get
 
 # --- Async Dependency Functions ---
 
-async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> models.Employee:
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> EmployeeEntry:
     """ Dependency to get the current user from token (async version). """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    user_id = verify_token(token, credentials_exception)
-    user = await crud.get_employee(db, user_id=user_id) 
+    user = await get_principal(db, token, credentials_exception)
     if user is None:
         raise credentials_exception
     return user
 
-async def get_current_admin_user_async(current_user: models.Employee = Depends(get_current_user_async)) -> models.Employee:
+async def get_current_admin_user_async(current_user: EmployeeEntry = Depends(get_current_user_async)) -> EmployeeEntry:
     """ Depends on get_current_user_async and checks admin status (async version). """
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     return current_user
 
-async def get_current_authenticated_user_async(current_user: models.Employee = Depends(get_current_user_async)) -> models.Employee:
+async def get_current_authenticated_user_async(current_user: EmployeeEntry = Depends(get_current_user_async)) -> EmployeeEntry:
      """ Alias for get_current_user_async for clarity in routes needing any logged-in user (async version). """
      # This function just relies on get_current_user_async
      return current_user
 
-
-# --- Sync Dependency Functions (Kept if needed for sync parts like /token or admin panel) ---
-
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> models.Employee:
-    """ Dependency to get the current user from token (sync version). """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    user_id = verify_token(token, credentials_exception)
-    user = crud.get_employee_sync(db, user_id=user_id)
-    if user is None:
-        raise credentials_exception
-    return user
-
-def get_current_admin_user(current_user: models.Employee = Depends(get_current_user)) -> models.Employee:
-    """ Depends on get_current_user and checks admin status (sync version). """
-    if not current_user.is_admin:
-        raise HTTPException(status_code=403, detail="Not enough permissions")
-    return current_user
-
-def get_current_authenticated_user(current_user: models.Employee = Depends(get_current_user)) -> models.Employee:
-    """ Alias for get_current_user for clarity (sync version). """
-    return current_user
\ No newline at end of file
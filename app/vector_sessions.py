@@ -0,0 +1,169 @@
+# time_management/app/vector_sessions.py
+"""
+NumPy implementation of the work-session statistics (REPORT_ENGINE=numpy).
+
+Events are loaded into contiguous arrays (user_id, epoch microseconds,
+event type code, id) and processed without a Python loop per event:
+
+1. lexsort by (user_id, timestamp, id);
+2. a session is a checkin whose next checkin/checkout event (same user) is
+   a checkout no more than MAX_SESSION_HOURS later, which is exactly what
+   app.work_sessions.SessionBuilder does one event at a time;
+3. sessions are cut into per-day pieces with np.repeat and summed per
+   (user, day) with np.add.reduceat.
+
+Durations are integer microseconds throughout, so per-day totals are exact.
+Day splitting follows split_by_day: local time only picks the day, piece
+lengths are measured between UTC instants.
+
+numpy is optional; without it the engine falls back to the Python one.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+from app.work_sessions import MAX_SESSION_HOURS, REPORT_TIMEZONE
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+DAY_US = 86400 * 1_000_000
+HOUR_US = 3600 * 1_000_000
+
+CHECKIN = 1
+CHECKOUT = 2
+EVENT_CODES = {"checkin": CHECKIN, "checkout": CHECKOUT}
+
+
+def to_epoch_us(value: datetime) -> int:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return (value - EPOCH) // MICROSECOND
+
+
+def _offset_us(instant_us: int, tz) -> int:
+    moment = EPOCH + timedelta(microseconds=instant_us)
+    return moment.astimezone(tz).utcoffset() // MICROSECOND
+
+
+def utc_offsets(times_us, tz=REPORT_TIMEZONE):
+    """UTC offset (in microseconds) of tz at each instant, vectorized over the array."""
+    if len(times_us) == 0 or getattr(tz, "key", None) == "UTC":
+        return np.zeros(len(times_us), dtype=np.int64)
+
+    # Probe the offset every hour across the range and locate each change to the second
+    first = int(times_us.min()) // HOUR_US * HOUR_US - HOUR_US
+    last = int(times_us.max()) + HOUR_US
+    transitions = []
+    offsets = [_offset_us(first, tz)]
+    probe = first + HOUR_US
+    while probe <= last:
+        offset = _offset_us(probe, tz)
+        if offset != offsets[-1]:
+            low, high = probe - HOUR_US, probe  # offset(low) is the old one, offset(high) the new one
+            while high - low > 1_000_000:
+                middle = (low + high) // 2 // 1_000_000 * 1_000_000
+                if middle <= low:
+                    middle = low + 1_000_000
+                if _offset_us(middle, tz) == offset:
+                    high = middle
+                else:
+                    low = middle
+            transitions.append(high)
+            offsets.append(offset)
+        probe += HOUR_US
+
+    position = np.searchsorted(np.array(transitions, dtype=np.int64), times_us, side="right")
+    return np.array(offsets, dtype=np.int64)[position]
+
+
+def local_midnights(days, tz=REPORT_TIMEZONE):
+    """Epoch microseconds of the local midnight that starts each day (days since 1970-01-01, local)."""
+    wall = days * DAY_US
+    return wall - utc_offsets(wall - utc_offsets(wall, tz), tz)
+
+
+def compute_totals(
+    user_ids,
+    times_us,
+    codes,
+    event_ids=None,
+    max_session_hours: Optional[float] = MAX_SESSION_HOURS,
+    tz=REPORT_TIMEZONE,
+) -> Dict[int, Tuple[int, int, float]]:
+    """
+    (event_count, days_present, total_seconds) per user_id from event arrays.
+    codes uses CHECKIN/CHECKOUT; anything else only counts as an event.
+    """
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    times_us = np.asarray(times_us, dtype=np.int64)
+    codes = np.asarray(codes, dtype=np.int8)
+    if len(user_ids) == 0:
+        return {}
+    event_ids = np.zeros(len(user_ids), dtype=np.int64) if event_ids is None else np.asarray(event_ids, dtype=np.int64)
+
+    order = np.lexsort((event_ids, times_us, user_ids))
+    user_ids, times_us, codes = user_ids[order], times_us[order], codes[order]
+
+    users, event_counts = np.unique(user_ids, return_counts=True)
+    totals = {int(user): [int(count), 0, 0.0] for user, count in zip(users, event_counts)}
+
+    # Sessions: checkin immediately followed by a checkout of the same user
+    paired = codes > 0
+    user_ids, times_us, codes = user_ids[paired], times_us[paired], codes[paired]
+    is_session = (codes[:-1] == CHECKIN) & (codes[1:] == CHECKOUT) & (user_ids[:-1] == user_ids[1:])
+    if max_session_hours:
+        max_us = int(round(max_session_hours * HOUR_US))
+        is_session &= (times_us[1:] - times_us[:-1]) <= max_us
+    starts = np.flatnonzero(is_session)
+    if len(starts) == 0:
+        return {user: tuple(values) for user, values in totals.items()}
+
+    session_users = user_ids[starts]
+    start_us, end_us = times_us[starts], times_us[starts + 1]
+
+    # One piece per local day a session touches; the local offset only picks the day
+    start_day = (start_us + utc_offsets(start_us, tz)) // DAY_US
+    pieces_per_session = (end_us + utc_offsets(end_us, tz)) // DAY_US - start_day + 1
+    piece_session = np.repeat(np.arange(len(starts)), pieces_per_session)
+    first_piece = np.cumsum(pieces_per_session) - pieces_per_session
+    piece_day = start_day[piece_session] + (np.arange(len(piece_session)) - first_piece[piece_session])
+    piece_us = (
+        np.minimum(end_us[piece_session], local_midnights(piece_day + 1, tz))
+        - np.maximum(start_us[piece_session], local_midnights(piece_day, tz))
+    )
+    piece_users = session_users[piece_session]
+
+    # Pieces are already ordered by (user, day); sum each run
+    boundaries = np.flatnonzero(
+        np.concatenate(([True], (piece_users[1:] != piece_users[:-1]) | (piece_day[1:] != piece_day[:-1])))
+    )
+    day_us = np.add.reduceat(piece_us, boundaries)
+    day_users = piece_users[boundaries]
+
+    user_starts = np.flatnonzero(np.concatenate(([True], day_users[1:] != day_users[:-1])))
+    present = np.add.reduceat((day_us > 0).astype(np.int64), user_starts)
+    user_seconds = np.add.reduceat(day_us, user_starts) / 1_000_000
+    for user, days, seconds in zip(day_users[user_starts], present, user_seconds):
+        totals[int(user)][1] = int(days)
+        totals[int(user)][2] = float(seconds)
+    return {user: tuple(values) for user, values in totals.items()}
+
+
+def arrays_from_rows(rows, timestamps_are_us: bool = False):
+    """
+    Build the input arrays from (id, user_id, event_type, timestamp) rows.
+    With timestamps_are_us the database already returned epoch microseconds.
+    """
+    count = len(rows)
+    event_ids = np.fromiter((row[0] or 0 for row in rows), dtype=np.int64, count=count)
+    user_ids = np.fromiter((row[1] for row in rows), dtype=np.int64, count=count)
+    codes = np.fromiter((EVENT_CODES.get(row[2], 0) for row in rows), dtype=np.int8, count=count)
+    if timestamps_are_us:
+        times_us = np.fromiter((row[3] for row in rows), dtype=np.int64, count=count)
+    else:
+        times_us = np.fromiter((to_epoch_us(row[3]) for row in rows), dtype=np.int64, count=count)
+    return user_ids, times_us, codes, event_ids
@@ -0,0 +1,154 @@
+# time_management/app/work_sessions.py
+"""
+Work-session pairing engine used by reports and exports.
+
+Events are grouped per employee and swept once in timestamp order:
+
+* a checkin opens a session. A second checkin while one is open means the
+  earlier checkin never got a checkout, so it is counted as unmatched and
+  the new checkin opens the session instead;
+* a checkout closes the open session, or is unmatched if none is open;
+* a session longer than MAX_SESSION_HOURS is treated as a forgotten
+  checkout and both of its events are counted as unmatched;
+* a checkin still open at the end of the data is unmatched.
+
+Every event belongs to at most one session, so several checkins can never
+share one checkout. A session that crosses midnight (in REPORT_TIMEZONE) is
+split at each day boundary when computing per-day totals.
+"""
+import os
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+REPORT_TIMEZONE = ZoneInfo(os.getenv("REPORT_TIMEZONE", "UTC"))
+MAX_SESSION_HOURS = float(os.getenv("MAX_SESSION_HOURS", 24))
+
+
+@dataclass(frozen=True)
+class WorkSession:
+    user_id: int
+    start: datetime
+    end: datetime
+
+    @property
+    def duration_seconds(self) -> float:
+        return (self.end - self.start).total_seconds()
+
+
+@dataclass
+class EmployeeSessions:
+    """Sessions, unmatched events and per-day totals for one employee."""
+    user_id: int
+    sessions: List[WorkSession] = field(default_factory=list)
+    unmatched_checkins: int = 0
+    unmatched_checkouts: int = 0
+    event_count: int = 0
+    daily_seconds: Dict[date, float] = field(default_factory=dict)
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(self.daily_seconds.values())
+
+    @property
+    def total_hours(self) -> float:
+        return self.total_seconds / 3600
+
+    @property
+    def total_days(self) -> int:
+        return sum(1 for seconds in self.daily_seconds.values() if seconds > 0)
+
+
+def _as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def split_by_day(start: datetime, end: datetime, tz=REPORT_TIMEZONE) -> List[Tuple[date, float]]:
+    """
+    Split [start, end) at local midnights and return (local_date, seconds)
+    pieces. Local midnights only pick the day; the seconds are elapsed time
+    between UTC instants, so a DST change does not add or lose an hour.
+    """
+    pieces = []
+    piece_start = _as_utc(start).astimezone(timezone.utc)
+    end = _as_utc(end).astimezone(timezone.utc)
+    day = piece_start.astimezone(tz).date()
+    last_day = end.astimezone(tz).date()
+    while day < last_day:
+        next_midnight = datetime.combine(day + timedelta(days=1), datetime.min.time(), tzinfo=tz).astimezone(timezone.utc)
+        pieces.append((day, (next_midnight - piece_start).total_seconds()))
+        piece_start = next_midnight
+        day += timedelta(days=1)
+    pieces.append((day, (end - piece_start).total_seconds()))
+    return pieces
+
+
+class SessionBuilder:
+    """
+    Incremental pairing for one employee. Feed events in timestamp order.
+
+    Used directly by streaming code paths that already read events ordered by
+    (user_id, timestamp); pair_events() wraps it for unordered input.
+    """
+
+    def __init__(self, user_id: int, max_session_hours: Optional[float] = MAX_SESSION_HOURS, tz=REPORT_TIMEZONE):
+        self.result = EmployeeSessions(user_id=user_id)
+        self.tz = tz
+        self.max_session = timedelta(hours=max_session_hours) if max_session_hours else None
+        self._open_start: Optional[datetime] = None
+
+    def feed(self, event_type: str, timestamp: datetime) -> Optional[WorkSession]:
+        """Process one event and return the session it closed, if any."""
+        timestamp = _as_utc(timestamp)
+        self.result.event_count += 1
+        if event_type == "checkin":
+            if self._open_start is not None:
+                self.result.unmatched_checkins += 1
+            self._open_start = timestamp
+            return None
+        if event_type != "checkout":
+            return None
+        if self._open_start is None:
+            self.result.unmatched_checkouts += 1
+            return None
+
+        start, self._open_start = self._open_start, None
+        if self.max_session is not None and timestamp - start > self.max_session:
+            self.result.unmatched_checkins += 1
+            self.result.unmatched_checkouts += 1
+            return None
+
+        session = WorkSession(user_id=self.result.user_id, start=start, end=timestamp)
+        self.result.sessions.append(session)
+        for day, seconds in split_by_day(start, timestamp, self.tz):
+            self.result.daily_seconds[day] = self.result.daily_seconds.get(day, 0.0) + seconds
+        return session
+
+    def finish(self) -> EmployeeSessions:
+        if self._open_start is not None:
+            self.result.unmatched_checkins += 1
+            self._open_start = None
+        return self.result
+
+
+def pair_events(events: Iterable, max_session_hours: Optional[float] = MAX_SESSION_HOURS, tz=REPORT_TIMEZONE) -> Dict[int, EmployeeSessions]:
+    """
+    Pair attendance events (anything with user_id, event_type, timestamp and
+    optionally id) into work sessions, keyed by user_id.
+    """
+    by_user: Dict[int, list] = {}
+    for event in events:
+        by_user.setdefault(event.user_id, []).append(event)
+
+    results = {}
+    for user_id, user_events in by_user.items():
+        # id breaks timestamp ties so the result does not depend on input order
+        user_events.sort(key=lambda e: (_as_utc(e.timestamp), getattr(e, "id", None) or 0))
+        builder = SessionBuilder(user_id, max_session_hours=max_session_hours, tz=tz)
+        for event in user_events:
+            builder.feed(event.event_type, event.timestamp)
+        results[user_id] = builder.finish()
+    return results
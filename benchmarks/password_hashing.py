@@ -0,0 +1,73 @@
+"""
+Scan latency on one event loop while logins hash passwords.
+
+    PYTHONPATH=. python benchmarks/password_hashing.py --logins 20
+
+A stand-in scan (a coroutine that sleeps SCAN_INTERVAL and records how
+late it woke up, i.e. how long the loop was busy elsewhere) runs next to
+a burst of concurrent logins. "inline" verifies on the loop, as the login
+routes used to; "pool" uses app.passwords. No database is involved.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from app import passwords
+
+SCAN_INTERVAL = 0.005
+
+
+async def scans(stop: asyncio.Event, latencies: list):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(SCAN_INTERVAL)
+        latencies.append(time.perf_counter() - started - SCAN_INTERVAL)
+
+
+async def inline_login(password: str, hashed: str):
+    return passwords.pwd_context.verify(password, hashed)
+
+
+async def pooled_login(password: str, hashed: str):
+    return (await passwords.verify_password(password, hashed))[0]
+
+
+async def run(login, logins: int, hashed: str):
+    stop = asyncio.Event()
+    latencies = []
+    scanner = asyncio.create_task(scans(stop, latencies))
+    await asyncio.sleep(0.05)
+    started = time.perf_counter()
+    results = await asyncio.gather(*(login("benchmark", hashed) for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await scanner
+    assert all(results)
+    return latencies, elapsed
+
+
+def report(label: str, latencies: list, elapsed: float):
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(
+        f"{label:<8} logins {elapsed * 1000:8.1f} ms   scan delay p50 {statistics.median(ordered) * 1000:7.2f} ms"
+        f"   p99 {p99 * 1000:7.2f} ms   max {ordered[-1] * 1000:7.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--logins", type=int, default=20)
+    args = parser.parse_args()
+
+    hashed = passwords.hash_password_sync("benchmark")
+    print(f"{args.logins} concurrent logins, BCRYPT_ROUNDS={passwords.BCRYPT_ROUNDS}, "
+          f"PASSWORD_HASH_WORKERS={passwords.PASSWORD_HASH_WORKERS}")
+    report("inline", *asyncio.run(run(inline_login, args.logins, hashed)))
+    report("pool", *asyncio.run(run(pooled_login, args.logins, hashed)))
+    passwords.password_hasher.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Compare the Python and NumPy work-session engines on synthetic events.
+
+    PYTHONPATH=. python benchmarks/report_engines.py --events 1000000
+
+No database is involved: both engines get the same in-memory
+(id, user_id, event_type, timestamp) rows that a report query returns.
+"""
+import argparse
+import random
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+from app import vector_sessions
+from app.work_sessions import REPORT_TIMEZONE, pair_events
+
+Row = namedtuple("Row", "id user_id event_type timestamp")
+
+
+def synthetic_rows(count: int, employees: int, seed: int = 1):
+    """Shift-like checkin/checkout pairs with a few missed scans."""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    clock = {user: start + timedelta(minutes=rng.randrange(600)) for user in range(1, employees + 1)}
+    rows = []
+    for event_id in range(1, count + 1):
+        user = rng.randrange(1, employees + 1)
+        clock[user] += timedelta(seconds=rng.randrange(4 * 3600, 14 * 3600))
+        event_type = "checkin" if rng.random() < 0.5 else "checkout"
+        rows.append(Row(event_id, user, event_type, clock[user]))
+    return rows
+
+
+def timed(label, function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {elapsed * 1000:10.1f} ms")
+    return result, elapsed
+
+
+def python_engine(rows):
+    return {
+        user_id: (result.event_count, result.total_days, result.total_seconds)
+        for user_id, result in pair_events(rows).items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--employees", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{args.events} events, {args.employees} employees, REPORT_TIMEZONE={REPORT_TIMEZONE.key}")
+    rows = synthetic_rows(args.events, args.employees)
+
+    expected, python_seconds = timed("python (pair_events)", python_engine, rows)
+    arrays, load_seconds = timed("numpy: rows -> arrays", vector_sessions.arrays_from_rows, rows)
+    actual, compute_seconds = timed("numpy: compute_totals", vector_sessions.compute_totals, *arrays)
+
+    assert actual == expected, "engines disagree"
+    print(f"speedup: {python_seconds / compute_seconds:.1f}x (compute), "
+          f"{python_seconds / (load_seconds + compute_seconds):.1f}x (including array load)")
+
+
+if __name__ == "__main__":
+    main()
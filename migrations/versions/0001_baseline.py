@@ -0,0 +1,52 @@
+"""Baseline: the schema previously created by Base.metadata.create_all
+
+Revision ID: 0001
+Revises:
+Create Date: 2024-05-06
+
+Only the two original tables. Databases that were created by create_all
+before migrations existed are stamped at this revision by app.migrations
+instead of running it; later revisions add everything else, skipping
+tables such a database may already have.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "employees",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("username", sa.String()),
+        sa.Column("email", sa.String()),
+        sa.Column("rfid", sa.String()),
+        sa.Column("hashed_password", sa.String()),
+        sa.Column("is_admin", sa.Boolean()),
+    )
+    op.create_index("ix_employees_id", "employees", ["id"])
+    op.create_index("ix_employees_username", "employees", ["username"], unique=True)
+    op.create_index("ix_employees_email", "employees", ["email"], unique=True)
+    op.create_index("ix_employees_rfid", "employees", ["rfid"], unique=True)
+
+    op.create_table(
+        "attendance_events",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("employees.id"), nullable=False),
+        sa.Column("event_type", sa.String()),
+        sa.Column("timestamp", sa.DateTime(timezone=True)),
+        sa.Column("manual", sa.Boolean()),
+        sa.Column("notes", sa.String(), nullable=True),
+    )
+    op.create_index("ix_attendance_events_id", "attendance_events", ["id"])
+    op.create_index("ix_attendance_events_event_type", "attendance_events", ["event_type"])
+
+
+def downgrade():
+    op.drop_table("attendance_events")
+    op.drop_table("employees")
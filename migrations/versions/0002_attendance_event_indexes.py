@@ -0,0 +1,55 @@
+"""Composite, BRIN and partial indexes on attendance_events
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2024-05-06
+
+* ix_attendance_events_user_ts (user_id, timestamp DESC, id DESC): the
+  scan path and the last-event cache read the newest event per employee.
+* ix_attendance_events_ts_brin: reports and exports range-scan on
+  timestamp. Events are appended in time order, so a BRIN index covers
+  years of rows in a few pages. (Plain btree outside PostgreSQL.)
+* ix_attendance_events_manual_ts (timestamp DESC, id DESC) WHERE manual:
+  manual corrections are a small slice that the admin UI lists on its own.
+
+On PostgreSQL the indexes are built CONCURRENTLY, outside the migration
+transaction, so scans keep being recorded while they build.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+INDEX_NAMES = ("ix_attendance_events_user_ts", "ix_attendance_events_ts_brin", "ix_attendance_events_manual_ts")
+
+
+def upgrade():
+    postgres = op.get_bind().dialect.name == "postgresql"
+    manual = sa.text("manual = true" if postgres else "manual = 1")
+    options = {"if_not_exists": True, "postgresql_concurrently": postgres}
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_attendance_events_user_ts", "attendance_events",
+            ["user_id", sa.text("timestamp DESC"), sa.text("id DESC")], **options,
+        )
+        op.create_index(
+            "ix_attendance_events_ts_brin", "attendance_events",
+            ["timestamp"], postgresql_using="brin", **options,
+        )
+        op.create_index(
+            "ix_attendance_events_manual_ts", "attendance_events",
+            [sa.text("timestamp DESC"), sa.text("id DESC")],
+            postgresql_where=manual, sqlite_where=manual, **options,
+        )
+
+
+def downgrade():
+    postgres = op.get_bind().dialect.name == "postgresql"
+    with op.get_context().autocommit_block():
+        for name in INDEX_NAMES:
+            op.drop_index(name, table_name="attendance_events", if_exists=True, postgresql_concurrently=postgres)
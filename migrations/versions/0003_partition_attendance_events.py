@@ -0,0 +1,154 @@
+"""Partition attendance_events by month on PostgreSQL
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2024-05-20
+
+attendance_events becomes PARTITION BY RANGE (timestamp) with one
+partition per UTC month (named like app.partitions expects). Existing
+rows are copied into the new table, which holds an exclusive lock on
+attendance_events for the duration: run it in a maintenance window on
+large databases.
+
+The primary key becomes (id, timestamp) because PostgreSQL requires the
+partition key in it; ids still come from the same sequence. Other
+databases keep the plain table.
+
+The DDL is kept here, frozen at this revision, rather than taken from
+app.partitions: the indexes recreated are the ones 0001 and 0002 built.
+"""
+from datetime import date, datetime, timezone
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+PARENT_TABLE = "attendance_events"
+DEFAULT_PARTITION = "attendance_events_default"
+MONTHS_AHEAD = 3
+LOCK_NAMESPACE = 7303  # app.partitions.PARTITION_LOCK_NAMESPACE
+
+# Secondary indexes of attendance_events as of 0002
+INDEXES = (
+    "CREATE INDEX ix_attendance_events_id ON attendance_events (id)",
+    "CREATE INDEX ix_attendance_events_event_type ON attendance_events (event_type)",
+    "CREATE INDEX ix_attendance_events_user_ts ON attendance_events (user_id, timestamp DESC, id DESC)",
+    "CREATE INDEX ix_attendance_events_ts_brin ON attendance_events USING brin (timestamp)",
+    "CREATE INDEX ix_attendance_events_manual_ts ON attendance_events (timestamp DESC, id DESC) WHERE manual = true",
+)
+
+
+def _add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _is_partitioned(connection) -> bool:
+    return bool(connection.execute(sa.text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+        "WHERE c.relname = :table AND pg_table_is_visible(c.oid))"
+    ), {"table": PARENT_TABLE}).scalar())
+
+
+def _sequence(connection) -> str:
+    return connection.execute(sa.text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": PARENT_TABLE}).scalar()
+
+
+def _create_month_partition(connection, month: date):
+    name = f"attendance_events_y{month.year:04d}m{month.month:02d}"
+    following = _add_months(month, 1)
+    start = datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+    end = datetime(following.year, following.month, 1, tzinfo=timezone.utc)
+    connection.execute(sa.text(
+        f"CREATE TABLE {name} PARTITION OF {PARENT_TABLE} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    ))
+
+
+def upgrade():
+    if context.is_offline_mode():
+        raise RuntimeError("Partitioning inspects and copies existing rows; run it against a live database")
+    connection = op.get_bind()
+    if connection.dialect.name != "postgresql" or _is_partitioned(connection):
+        return
+    connection.execute(sa.text("SELECT pg_advisory_xact_lock(:namespace, 0)"), {"namespace": LOCK_NAMESPACE})
+    sequence = _sequence(connection)
+    legacy = f"{PARENT_TABLE}_unpartitioned"
+
+    connection.execute(sa.text(f"LOCK TABLE {PARENT_TABLE} IN ACCESS EXCLUSIVE MODE"))
+    connection.execute(sa.text(f"ALTER TABLE {PARENT_TABLE} RENAME TO {legacy}"))
+    connection.execute(sa.text(f"ALTER TABLE {legacy} RENAME CONSTRAINT {PARENT_TABLE}_pkey TO {legacy}_pkey"))
+    connection.execute(sa.text(f"ALTER SEQUENCE {sequence} OWNED BY NONE"))
+    for statement in INDEXES:
+        connection.execute(sa.text(f"DROP INDEX IF EXISTS {statement.split()[2]}"))
+
+    # The partition key has to be part of the primary key
+    connection.execute(sa.text(f"""
+        CREATE TABLE {PARENT_TABLE} (
+            id INTEGER NOT NULL DEFAULT nextval('{sequence}'::regclass),
+            user_id INTEGER NOT NULL REFERENCES employees (id),
+            event_type VARCHAR,
+            timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+            manual BOOLEAN,
+            notes VARCHAR,
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+    """))
+    connection.execute(sa.text(f"ALTER SEQUENCE {sequence} OWNED BY {PARENT_TABLE}.id"))
+    for statement in INDEXES:
+        connection.execute(sa.text(statement))
+    connection.execute(sa.text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {PARENT_TABLE} DEFAULT"))
+
+    # One partition per month from the oldest row through MONTHS_AHEAD months from now
+    current = datetime.now(timezone.utc).date().replace(day=1)
+    oldest = connection.execute(sa.text(f"SELECT min(timestamp) FROM {legacy}")).scalar()
+    month = oldest.astimezone(timezone.utc).date().replace(day=1) if oldest else current
+    while month <= _add_months(current, MONTHS_AHEAD):
+        _create_month_partition(connection, month)
+        month = _add_months(month, 1)
+
+    connection.execute(sa.text(
+        f"INSERT INTO {PARENT_TABLE} (id, user_id, event_type, timestamp, manual, notes) "
+        f"SELECT id, user_id, event_type, timestamp, manual, notes FROM {legacy}"
+    ))
+    connection.execute(sa.text(f"DROP TABLE {legacy}"))
+
+
+def downgrade():
+    if context.is_offline_mode():
+        raise RuntimeError("Merging partitions copies existing rows; run it against a live database")
+    connection = op.get_bind()
+    if connection.dialect.name != "postgresql" or not _is_partitioned(connection):
+        return
+    connection.execute(sa.text("SELECT pg_advisory_xact_lock(:namespace, 0)"), {"namespace": LOCK_NAMESPACE})
+    sequence = _sequence(connection)
+    partitioned = f"{PARENT_TABLE}_partitioned"
+
+    connection.execute(sa.text(f"ALTER TABLE {PARENT_TABLE} RENAME TO {partitioned}"))
+    connection.execute(sa.text(f"ALTER SEQUENCE {sequence} OWNED BY NONE"))
+    for statement in INDEXES:
+        connection.execute(sa.text(f"DROP INDEX IF EXISTS {statement.split()[2]}"))
+    connection.execute(sa.text(f"ALTER TABLE {partitioned} RENAME CONSTRAINT {PARENT_TABLE}_pkey TO {partitioned}_pkey"))
+    connection.execute(sa.text(f"""
+        CREATE TABLE {PARENT_TABLE} (
+            id INTEGER PRIMARY KEY DEFAULT nextval('{sequence}'::regclass),
+            user_id INTEGER NOT NULL REFERENCES employees (id),
+            event_type VARCHAR,
+            timestamp TIMESTAMP WITH TIME ZONE,
+            manual BOOLEAN,
+            notes VARCHAR
+        )
+    """))
+    connection.execute(sa.text(f"ALTER SEQUENCE {sequence} OWNED BY {PARENT_TABLE}.id"))
+    for statement in INDEXES:
+        connection.execute(sa.text(statement))
+    connection.execute(sa.text(
+        f"INSERT INTO {PARENT_TABLE} (id, user_id, event_type, timestamp, manual, notes) "
+        f"SELECT id, user_id, event_type, timestamp, manual, notes FROM {partitioned}"
+    ))
+    connection.execute(sa.text(f"DROP TABLE {partitioned}"))
@@ -0,0 +1,35 @@
+"""Per-day change marks for report job staleness
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2024-06-03
+
+Finished report jobs used to be flagged stale by an UPDATE in every write
+transaction, scans included. Staleness is now worked out when a job is
+read (app.event_changes.changed_since): live scans are found by their own
+timestamps, and edits, deletes and backdated writes leave a changed_at
+mark on the UTC day they touched.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created by create_all (stamped at the baseline) already have it
+    if sa.inspect(op.get_bind()).has_table("event_change_marks"):
+        return
+    op.create_table(
+        "event_change_marks",
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("changed_at", sa.DateTime(timezone=True), nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table("event_change_marks")
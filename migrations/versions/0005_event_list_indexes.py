@@ -0,0 +1,52 @@
+"""Btree indexes for newest-first event lists
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2024-06-03
+
+Keyset pages (app.pagination) are ordered by (timestamp DESC, id DESC).
+The BRIN index cannot produce that order, so unfiltered lists and the
+per-type lists sorted the whole table for every page.
+
+* ix_attendance_events_ts_id (timestamp DESC, id DESC): unfiltered lists.
+* ix_attendance_events_type_ts (event_type, timestamp DESC, id DESC):
+  /api/checkin and /api/checkout.
+
+Built CONCURRENTLY on PostgreSQL, like 0002. On a partitioned table the
+index is created on the parent and cascades to every partition.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+INDEX_NAMES = ("ix_attendance_events_ts_id", "ix_attendance_events_type_ts")
+
+
+def upgrade():
+    postgres = op.get_bind().dialect.name == "postgresql"
+    partitioned = postgres and op.get_bind().execute(sa.text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'attendance_events'::regclass"
+    )).first() is not None
+    # CREATE INDEX CONCURRENTLY is not supported on partitioned parents
+    options = {"if_not_exists": True, "postgresql_concurrently": postgres and not partitioned}
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_attendance_events_ts_id", "attendance_events",
+            [sa.text("timestamp DESC"), sa.text("id DESC")], **options,
+        )
+        op.create_index(
+            "ix_attendance_events_type_ts", "attendance_events",
+            ["event_type", sa.text("timestamp DESC"), sa.text("id DESC")], **options,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name in INDEX_NAMES:
+            op.drop_index(name, table_name="attendance_events", if_exists=True)
@@ -0,0 +1,160 @@
+"""Daily summary and report job tables
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2024-06-10
+
+These used to be created by the baseline, but databases from before
+migrations are stamped at the baseline without running it, so they never
+got them. Each table is created only if missing. A newly created
+daily_attendance_summary is filled from the existing events with the
+pairing rules of app.work_sessions as of this revision (copied below, not
+imported, so later changes to the app cannot change what this revision
+does); REPORT_TIMEZONE and MAX_SESSION_HOURS are read from the environment
+like the app does. `python -m app.daily_summary` rebuilds it with the
+current rules.
+"""
+import os
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def _as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _day_pieces(start: datetime, end: datetime, tz):
+    """(local_date, seconds) pieces of [start, end), measured in elapsed time."""
+    day, last_day = start.astimezone(tz).date(), end.astimezone(tz).date()
+    while day < last_day:
+        midnight = datetime.combine(day + timedelta(days=1), datetime.min.time(), tzinfo=tz).astimezone(timezone.utc)
+        yield day, (midnight - start).total_seconds()
+        start, day = midnight, day + timedelta(days=1)
+    yield day, (end - start).total_seconds()
+
+
+def _summarize(user_id: int, events, tz, max_session_hours: float) -> dict:
+    """Summary rows per local day from (event_type, timestamp) pairs in timestamp order."""
+    days = {}
+    max_session = timedelta(hours=max_session_hours) if max_session_hours else None
+
+    def row_for(day):
+        if day not in days:
+            days[day] = {
+                "user_id": user_id, "local_date": day, "first_in": None, "last_out": None,
+                "worked_seconds": 0.0, "session_count": 0, "event_count": 0,
+            }
+        return days[day]
+
+    open_start = None
+    for event_type, timestamp in events:
+        timestamp = _as_utc(timestamp)
+        row = row_for(timestamp.astimezone(tz).date())
+        row["event_count"] += 1
+        if event_type == "checkin":
+            if row["first_in"] is None or timestamp < row["first_in"]:
+                row["first_in"] = timestamp
+            open_start = timestamp  # An earlier open checkin stays unmatched
+            continue
+        if event_type != "checkout":
+            continue
+        if row["last_out"] is None or timestamp > row["last_out"]:
+            row["last_out"] = timestamp
+        start, open_start = open_start, None
+        if start is None or (max_session is not None and timestamp - start > max_session):
+            continue
+        row_for(start.astimezone(tz).date())["session_count"] += 1
+        for day, seconds in _day_pieces(start, timestamp, tz):
+            row_for(day)["worked_seconds"] += seconds
+    return days
+
+
+def _fill_summary(bind):
+    tz = ZoneInfo(os.getenv("REPORT_TIMEZONE", "UTC"))
+    max_session_hours = float(os.getenv("MAX_SESSION_HOURS", 24))
+    events = sa.table(
+        "attendance_events",
+        sa.column("id", sa.Integer()),
+        sa.column("user_id", sa.Integer()),
+        sa.column("event_type", sa.String()),
+        sa.column("timestamp", sa.DateTime(timezone=True)),
+    )
+    summary = sa.table(
+        "daily_attendance_summary",
+        sa.column("user_id", sa.Integer()),
+        sa.column("local_date", sa.Date()),
+        sa.column("first_in", sa.DateTime(timezone=True)),
+        sa.column("last_out", sa.DateTime(timezone=True)),
+        sa.column("worked_seconds", sa.Float()),
+        sa.column("session_count", sa.Integer()),
+        sa.column("event_count", sa.Integer()),
+    )
+    user_ids = bind.execute(sa.text("SELECT id FROM employees ORDER BY id")).scalars().all()
+    for user_id in user_ids:
+        rows = bind.execute(
+            sa.select(events.c.event_type, events.c.timestamp)
+            .where(events.c.user_id == user_id)
+            .order_by(events.c.timestamp, events.c.id)
+        ).all()
+        days = _summarize(user_id, rows, tz, max_session_hours)
+        if days:
+            bind.execute(sa.insert(summary), list(days.values()))
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if not inspector.has_table("daily_attendance_summary"):
+        op.create_table(
+            "daily_attendance_summary",
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("employees.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("local_date", sa.Date(), primary_key=True),
+            sa.Column("first_in", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("last_out", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("worked_seconds", sa.Float(), nullable=False),
+            sa.Column("session_count", sa.Integer(), nullable=False),
+            sa.Column("event_count", sa.Integer(), nullable=False),
+        )
+        _fill_summary(bind)
+
+    if not inspector.has_table("report_jobs"):
+        op.create_table(
+            "report_jobs",
+            sa.Column("id", sa.String(), primary_key=True),
+            sa.Column("params_key", sa.String()),
+            sa.Column("params", sa.JSON(), nullable=False),
+            sa.Column("status", sa.String(), nullable=False),
+            sa.Column("stale", sa.Boolean(), nullable=False),
+            sa.Column("range_start", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("range_end", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("rows_done", sa.Integer(), nullable=False),
+            sa.Column("rows_total", sa.Integer(), nullable=True),
+            sa.Column("file_path", sa.String(), nullable=True),
+            sa.Column("file_size", sa.Integer(), nullable=True),
+            sa.Column("media_type", sa.String(), nullable=True),
+            sa.Column("filename", sa.String(), nullable=True),
+            sa.Column("error", sa.String(), nullable=True),
+            sa.Column("created_by", sa.Integer(), sa.ForeignKey("employees.id", ondelete="SET NULL"), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True)),
+            sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        )
+        op.create_index("ix_report_jobs_params_key", "report_jobs", ["params_key"])
+        op.create_index("ix_report_jobs_status", "report_jobs", ["status"])
+
+
+def downgrade():
+    op.drop_table("report_jobs")
+    op.drop_table("daily_attendance_summary")
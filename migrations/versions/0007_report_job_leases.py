@@ -0,0 +1,30 @@
+"""Leases for running report jobs
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2024-06-17
+
+A job left "running" by a process that died was never resumed and kept
+being reused for its parameters. Running jobs now hold a lease
+(app.report_jobs); one whose lease has run out is requeued on startup.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created by create_all (stamped at the baseline) already have it
+    columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("report_jobs")}
+    if "lease_expires_at" in columns:
+        return
+    op.add_column("report_jobs", sa.Column("lease_expires_at", sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade():
+    op.drop_column("report_jobs", "lease_expires_at")
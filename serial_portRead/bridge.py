@@ -2,6 +2,8 @@
 import serial
 import httpx
 import asyncio
+import hashlib
+import hmac
 import time
 import sys
 import datetime
@@ -15,6 +17,15 @@ API_BASE_URL = "http://localhost:8000/api"
 # --- Credentials Configuration (Use Environment Variables) ---
 BRIDGE_USERNAME = os.getenv("BRIDGE_USERNAME")
 BRIDGE_PASSWORD = os.getenv("BRIDGE_PASSWORD")
+BRIDGE_READER_ID = os.getenv("BRIDGE_READER_ID", "serial-bridge")
+# Device key from `python -m app.reader_auth <reader id>`; when set, requests are signed and no login is needed
+BRIDGE_READER_KEY = os.getenv("BRIDGE_READER_KEY")
+BATCH_FLUSH_SIZE = 500 # Scans per /scan/batch request when flushing the backlog
+MAX_PENDING_SCANS = int(os.getenv("BRIDGE_MAX_PENDING_SCANS", 50000)) # Oldest scans are dropped past this
+RETRY_BASE_SECONDS = 5 # First delay before retrying the backlog; doubles up to RETRY_MAX_SECONDS
+RETRY_MAX_SECONDS = 300
+# 401 reasons (X-Reader-Auth-Error, see app/reader_auth.py) that mean the device key itself is refused
+PERMANENT_AUTH_ERRORS = {"invalid_signature", "revoked"}
 # --- End Configuration ---
 
 # Use a single client instance
@@ -22,10 +33,33 @@ client = httpx.AsyncClient(base_url=API_BASE_URL, timeout=10.0)
 # Global variable to store the auth token
 _auth_token = None
 _token_lock = asyncio.Lock() # Lock for token refresh
+# Scans that could not be delivered while the API was unreachable
+_pending_scans = []
+_flush_lock = asyncio.Lock()
+_retry_delay = 0
+_retry_at = 0.0 # time.monotonic() before which the backlog is not retried
+
+def signed_request(method, url, **kwargs):
+    """Build a request signed with the bridge's device key (see app/reader_auth.py)."""
+    request = client.build_request(method, url, **kwargs)
+    timestamp = str(int(time.time()))
+    canonical = "\n".join([request.method, request.url.path, timestamp, hashlib.sha256(request.content).hexdigest()])
+    request.headers["X-Reader-Id"] = BRIDGE_READER_ID
+    request.headers["X-Reader-Timestamp"] = timestamp
+    request.headers["X-Reader-Signature"] = hmac.new(BRIDGE_READER_KEY.encode(), canonical.encode(), hashlib.sha256).hexdigest()
+    return request
+
+async def post_to_api(url, payload, token):
+    if BRIDGE_READER_KEY:
+        return await client.send(signed_request("POST", url, json=payload))
+    return await client.post(url, json=payload, headers={"Authorization": f"Bearer {token}"})
 
 async def get_auth_token():
     """Fetches or returns the cached JWT token for the bridge."""
     global _auth_token
+    if BRIDGE_READER_KEY:
+        # Signed requests need no token
+        return None
     async with _token_lock:
         # Simple check: If we have a token, assume it's valid for now.
         if _auth_token:
@@ -57,33 +91,108 @@ async def get_auth_token():
         _auth_token = None
         return None
 
-async def process_rfid_scan(rfid_tag):
+def auth_error(response):
+    """Reason the server gave for refusing a signed request, or None."""
+    return response.headers.get("X-Reader-Auth-Error")
+
+def key_refused(response):
+    """True when the server refused the device key itself, so a retry cannot succeed."""
+    return bool(BRIDGE_READER_KEY) and response.status_code == 401 and auth_error(response) in PERMANENT_AUTH_ERRORS
+
+def back_off():
+    """Wait longer before each retry of the backlog."""
+    global _retry_delay, _retry_at
+    _retry_delay = min(max(_retry_delay * 2, RETRY_BASE_SECONDS), RETRY_MAX_SECONDS)
+    _retry_at = time.monotonic() + _retry_delay
+    print(f"Bridge: Retrying {len(_pending_scans)} pending scan(s) in {_retry_delay}s or later.")
+
+def buffer_scan(rfid_tag, scanned_at):
+    """Keep a scan for later delivery through /scan/batch."""
+    if len(_pending_scans) >= MAX_PENDING_SCANS:
+        dropped = _pending_scans.pop(0)
+        print(f"Bridge: ERROR: {MAX_PENDING_SCANS} scans pending, dropping the oldest ({dropped['rfid']} at {dropped['scanned_at']}).")
+    _pending_scans.append({
+        "rfid": rfid_tag,
+        "scanned_at": scanned_at.isoformat(),
+        "reader_id": BRIDGE_READER_ID,
+    })
+    print(f"Bridge: Buffered scan for {rfid_tag}. {len(_pending_scans)} scan(s) pending.")
+
+async def flush_pending_scans(token):
+    """
+    Deliver buffered scans in batches. Stops at the first failure, keeps the
+    rest and backs off; nothing is retried before the backoff has passed.
+    """
+    global _retry_delay, _retry_at
+    async with _flush_lock:
+        if time.monotonic() < _retry_at:
+            return
+        while _pending_scans:
+            chunk = _pending_scans[:BATCH_FLUSH_SIZE]
+            try:
+                response = await post_to_api("/scan/batch", {"scans": chunk}, token)
+                if key_refused(response):
+                    # A retry would be refused again
+                    print(f"Bridge: ERROR: Reader key refused ({auth_error(response)}), dropping {len(chunk)} buffered scan(s): {response.text}")
+                    del _pending_scans[:len(chunk)]
+                    continue
+                if response.status_code == 401 and BRIDGE_READER_KEY:
+                    print(f"Bridge: ERROR: Signed batch refused ({auth_error(response)}). Check this machine's clock and the "
+                          f"server's READER_MASTER_KEY; keeping {len(_pending_scans)} scan(s).")
+                response.raise_for_status()
+            except (httpx.RequestError, httpx.HTTPStatusError) as e:
+                print(f"Bridge: Could not flush {len(_pending_scans)} pending scan(s): {e}")
+                back_off()
+                return
+            del _pending_scans[:len(chunk)]
+            print(f"Bridge: Flushed {len(chunk)} buffered scan(s). Recorded: {response.json().get('recorded')}")
+        _retry_delay, _retry_at = 0, 0.0
+
+async def process_rfid_scan(rfid_tag, scanned_at=None):
     """Sends the scanned RFID tag to the central API /scan endpoint with auth."""
     global _auth_token # Use the global token variable
     rfid_tag = rfid_tag.strip()
     if not rfid_tag:
         print("Received empty tag, skipping.")
         return
+    scanned_at = scanned_at or datetime.datetime.now(timezone.utc)
 
     token = await get_auth_token()
-    if not token:
+    if not token and not BRIDGE_READER_KEY:
         print(f"Bridge: Cannot process scan for {rfid_tag}, failed to get auth token.")
+        buffer_scan(rfid_tag, scanned_at)
         return
 
+    if _pending_scans:
+        # Deliver the backlog first so the server sees scans in order
+        await flush_pending_scans(token)
+        if _pending_scans:
+            buffer_scan(rfid_tag, scanned_at)
+            return
+
     print(f"\nBridge Processing RFID: {rfid_tag}")
     scan_url = "/scan" # Relative to base_url
-    headers = {"Authorization": f"Bearer {token}"}
 
     try:
-        response = await client.post(scan_url, json={"rfid": rfid_tag}, headers=headers)
+        response = await post_to_api(scan_url, {"rfid": rfid_tag}, token)
 
         if 200 <= response.status_code < 300:
             print(f"Bridge: Scan processed successfully for {rfid_tag}. Response: {response.json()}")
+        elif key_refused(response):
+            # No token to renew: the key is wrong or the reader revoked, so a retry would be refused again
+            print(f"Bridge: ERROR: Scan for {rfid_tag} dropped. Reader key refused ({auth_error(response)}): {response.text}")
+        elif response.status_code == 401 and BRIDGE_READER_KEY:
+            # Expired or replayed signature, or the server cannot check keys: fixable, so keep the scan
+            print(f"Bridge: ERROR: Signed scan for {rfid_tag} refused ({auth_error(response)}). Check this machine's clock "
+                  f"and the server's READER_MASTER_KEY; keeping the scan for retry.")
+            buffer_scan(rfid_tag, scanned_at)
+            back_off()
         elif response.status_code == 401: # Unauthorized
-            print(f"Bridge: Scan failed for {rfid_tag}. Authorization failed (401). Token might be invalid/expired.")
-            # Invalidate the token
+            print(f"Bridge: Scan failed for {rfid_tag}. Authorization failed (401): {response.text}")
+            # Invalidate the token and keep the scan for delivery after the next login
             async with _token_lock:
                 _auth_token = None
+            buffer_scan(rfid_tag, scanned_at)
         elif response.status_code == 404:
             print(f"Bridge: Scan failed for {rfid_tag}. Employee not found (404).")
         elif response.status_code == 429:
@@ -93,6 +202,8 @@ async def process_rfid_scan(rfid_tag):
 
     except httpx.RequestError as e:
         print(f"Bridge: HTTP Request failed for {rfid_tag}: {e}")
+        buffer_scan(rfid_tag, scanned_at)
+        back_off()
     except Exception as e:
         print(f"Bridge: An unexpected error occurred during scan processing for {rfid_tag}: {e}")
 
@@ -106,7 +217,8 @@ async def read_serial(ser):
             if line:
                 rfid_tag_from_serial = line.decode('utf-8', errors='ignore').strip()
                 if rfid_tag_from_serial:
-                     asyncio.create_task(process_rfid_scan(rfid_tag_from_serial))
+                     scanned_at = datetime.datetime.now(timezone.utc)
+                     asyncio.create_task(process_rfid_scan(rfid_tag_from_serial, scanned_at))
                 else:
                     pass # Empty line
             else:
@@ -130,18 +242,21 @@ async def read_serial(ser):
 
 async def main():
     """Main async function to connect and start reading."""
-    # Ensure BRIDGE_USERNAME and BRIDGE_PASSWORD are set
-    if not BRIDGE_USERNAME or not BRIDGE_PASSWORD:
-        print("ERROR: BRIDGE_USERNAME or BRIDGE_PASSWORD environment variables are not set.")
+    # Ensure a device key or BRIDGE_USERNAME and BRIDGE_PASSWORD are set
+    if not BRIDGE_READER_KEY and (not BRIDGE_USERNAME or not BRIDGE_PASSWORD):
+        print("ERROR: Neither BRIDGE_READER_KEY nor BRIDGE_USERNAME and BRIDGE_PASSWORD environment variables are set.")
         print("The bridge cannot authenticate with the API and will exit.")
         sys.exit(1)
 
     print(f"Attempting to connect to serial port {SERIAL_PORT} at {BAUD_RATE} baud...")
 
     # Attempt initial authentication before starting serial read
-    print("Attempting initial authentication...")
+    if BRIDGE_READER_KEY:
+        print(f"Signing requests as reader '{BRIDGE_READER_ID}'.")
+    else:
+        print("Attempting initial authentication...")
     initial_token = await get_auth_token()
-    if not initial_token:
+    if not initial_token and not BRIDGE_READER_KEY:
          print("Initial authentication failed. Please check credentials and API status.")
          # Decide if you want to exit or proceed hoping it works later
          # sys.exit(1) # Optional: Exit if initial auth fails
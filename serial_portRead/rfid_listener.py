@@ -1,28 +1,60 @@
 # time_management/app/rfid_listener.py (Modified)
 import asyncio
+import hashlib
+import hmac
 import httpx
 import os # Import os to get credentials from environment variables
 import threading
 import time
+from datetime import datetime, timezone
 from fastapi import HTTPException # Needed for potential credential errors
 
 # --- Credentials Configuration (Use Environment Variables) ---
 LISTENER_USERNAME = os.getenv("LISTENER_USERNAME")
 LISTENER_PASSWORD = os.getenv("LISTENER_PASSWORD")
+BATCH_FLUSH_SIZE = 500 # Scans per /scan/batch request when flushing the backlog
+MAX_PENDING_SCANS = int(os.getenv("LISTENER_MAX_PENDING_SCANS", 50000)) # Per reader; oldest scans are dropped past this
+RETRY_BASE_SECONDS = 5 # First delay before retrying the backlog; doubles up to RETRY_MAX_SECONDS
+RETRY_MAX_SECONDS = 300
+# 401 reasons (X-Reader-Auth-Error, see app/reader_auth.py) that mean the device key itself is refused
+PERMANENT_AUTH_ERRORS = {"invalid_signature", "revoked"}
 # --- End Configuration ---
 
 class RFIDReader:
-    def __init__(self, reader_id, reader_url, api_base_url="http://localhost:8000/api"):
+    def __init__(self, reader_id, reader_url, api_base_url="http://localhost:8000/api", reader_key=None):
         self.reader_id = reader_id
         self.reader_url = reader_url
         self.api_base_url = api_base_url
+        # Device key from `python -m app.reader_auth <reader id>`; when set, requests are signed and no login is needed
+        self.reader_key = reader_key
         self.running = False
         self.client = httpx.AsyncClient()
         self._auth_token = None # To store the JWT token
         self._token_lock = asyncio.Lock() # Lock for token refresh
+        self._pending_scans = [] # Scans not delivered while the API was unreachable
+        self._retry_delay = 0
+        self._retry_at = 0.0 # time.monotonic() before which the backlog is not retried
+
+    def _signed_request(self, method, url, **kwargs):
+        """Build a request signed with the reader's device key (see app/reader_auth.py)."""
+        request = self.client.build_request(method, url, **kwargs)
+        timestamp = str(int(time.time()))
+        canonical = "\n".join([request.method, request.url.path, timestamp, hashlib.sha256(request.content).hexdigest()])
+        request.headers["X-Reader-Id"] = self.reader_id
+        request.headers["X-Reader-Timestamp"] = timestamp
+        request.headers["X-Reader-Signature"] = hmac.new(self.reader_key.encode(), canonical.encode(), hashlib.sha256).hexdigest()
+        return request
+
+    async def _post_to_api(self, url, payload, token, timeout):
+        if self.reader_key:
+            return await self.client.send(self._signed_request("POST", url, json=payload, timeout=timeout))
+        return await self.client.post(url, json=payload, headers={"Authorization": f"Bearer {token}"}, timeout=timeout)
 
     async def _get_auth_token(self):
         """Fetches or returns the cached JWT token."""
+        if self.reader_key:
+            # Signed requests need no token
+            return None
         async with self._token_lock: # Ensure only one task refreshes the token
             # Simple check: If we have a token, assume it's valid for now.
             # A robust implementation would check expiry or handle 401 errors.
@@ -70,27 +102,96 @@ class RFIDReader:
              print(f"Unexpected error polling reader {self.reader_id}: {e}")
         return None
 
-    async def process_scan(self, rfid):
+    def _key_refused(self, response):
+        """True when the server refused the device key itself, so a retry cannot succeed."""
+        return bool(self.reader_key) and response.status_code == 401 and response.headers.get("X-Reader-Auth-Error") in PERMANENT_AUTH_ERRORS
+
+    def _back_off(self):
+        """Wait longer before each retry of the backlog."""
+        self._retry_delay = min(max(self._retry_delay * 2, RETRY_BASE_SECONDS), RETRY_MAX_SECONDS)
+        self._retry_at = time.monotonic() + self._retry_delay
+        print(f"Listener {self.reader_id}: Retrying {len(self._pending_scans)} pending scan(s) in {self._retry_delay}s or later.")
+
+    def _buffer_scan(self, rfid, scanned_at):
+        """Keep a scan for later delivery through /scan/batch."""
+        if len(self._pending_scans) >= MAX_PENDING_SCANS:
+            dropped = self._pending_scans.pop(0)
+            print(f"Listener {self.reader_id}: ERROR: {MAX_PENDING_SCANS} scans pending, dropping the oldest ({dropped['rfid']} at {dropped['scanned_at']}).")
+        self._pending_scans.append({
+            "rfid": rfid,
+            "scanned_at": scanned_at.isoformat(),
+            "reader_id": self.reader_id,
+        })
+        print(f"Listener {self.reader_id}: Buffered scan for {rfid}. {len(self._pending_scans)} scan(s) pending.")
+
+    async def flush_pending_scans(self, token):
+        """
+        Deliver buffered scans in batches. Stops at the first failure, keeps the
+        rest and backs off; nothing is retried before the backoff has passed.
+        """
+        if time.monotonic() < self._retry_at:
+            return
+        while self._pending_scans:
+            chunk = self._pending_scans[:BATCH_FLUSH_SIZE]
+            try:
+                response = await self._post_to_api(f"{self.api_base_url}/scan/batch", {"scans": chunk}, token, timeout=30.0)
+                reason = response.headers.get("X-Reader-Auth-Error")
+                if self._key_refused(response):
+                    # A retry would be refused again
+                    print(f"Listener {self.reader_id}: ERROR: Reader key refused ({reason}), dropping {len(chunk)} buffered scan(s): {response.text}")
+                    del self._pending_scans[:len(chunk)]
+                    continue
+                if response.status_code == 401 and self.reader_key:
+                    print(f"Listener {self.reader_id}: ERROR: Signed batch refused ({reason}). Check this machine's clock and the "
+                          f"server's READER_MASTER_KEY; keeping {len(self._pending_scans)} scan(s).")
+                response.raise_for_status()
+            except (httpx.RequestError, httpx.HTTPStatusError) as e:
+                print(f"Listener {self.reader_id}: Could not flush {len(self._pending_scans)} pending scan(s): {e}")
+                self._back_off()
+                return
+            del self._pending_scans[:len(chunk)]
+            print(f"Listener {self.reader_id}: Flushed {len(chunk)} buffered scan(s). Recorded: {response.json().get('recorded')}")
+        self._retry_delay, self._retry_at = 0, 0.0
+
+    async def process_scan(self, rfid, scanned_at=None):
+        scanned_at = scanned_at or datetime.now(timezone.utc)
         token = await self._get_auth_token()
-        if not token:
+        if not token and not self.reader_key:
              print(f"Listener {self.reader_id}: Cannot process scan for {rfid}, failed to get auth token.")
-             # Optional: Attempt to re-authenticate after a delay?
+             self._buffer_scan(rfid, scanned_at)
              return # Stop processing if no token
 
-        headers = {"Authorization": f"Bearer {token}"}
+        if self._pending_scans:
+            # Deliver the backlog first so the server sees scans in order
+            await self.flush_pending_scans(token)
+            if self._pending_scans:
+                self._buffer_scan(rfid, scanned_at)
+                return
+
         scan_url = f"{self.api_base_url}/scan"
 
         try:
             print(f"Listener {self.reader_id}: Sending RFID {rfid} to {scan_url}")
-            response = await self.client.post(scan_url, json={"rfid": rfid}, headers=headers, timeout=5.0)
+            response = await self._post_to_api(scan_url, {"rfid": rfid}, token, timeout=5.0)
 
             if 200 <= response.status_code < 300:
                  print(f"Listener {self.reader_id}: Scan processed successfully for {rfid}. Response: {response.json()}")
+            elif self._key_refused(response):
+                 # No token to renew: the key is wrong or the reader revoked, so a retry would be refused again
+                 print(f"Listener {self.reader_id}: ERROR: Scan for {rfid} dropped. Reader key refused "
+                       f"({response.headers.get('X-Reader-Auth-Error')}): {response.text}")
+            elif response.status_code == 401 and self.reader_key:
+                 # Expired or replayed signature, or the server cannot check keys: fixable, so keep the scan
+                 print(f"Listener {self.reader_id}: ERROR: Signed scan for {rfid} refused ({response.headers.get('X-Reader-Auth-Error')}). "
+                       f"Check this machine's clock and the server's READER_MASTER_KEY; keeping the scan for retry.")
+                 self._buffer_scan(rfid, scanned_at)
+                 self._back_off()
             elif response.status_code == 401: # Unauthorized
-                 print(f"Listener {self.reader_id}: Scan failed for {rfid}. Authorization failed (401). Token might be invalid/expired.")
-                 # Invalidate the token so it's refreshed on the next attempt
+                 print(f"Listener {self.reader_id}: Scan failed for {rfid}. Authorization failed (401): {response.text}")
+                 # Invalidate the token so it's refreshed on the next attempt, and keep the scan
                  async with self._token_lock:
                      self._auth_token = None
+                 self._buffer_scan(rfid, scanned_at)
             elif response.status_code == 404:
                  print(f"Listener {self.reader_id}: Scan failed for {rfid}. Employee not found (404).")
             elif response.status_code == 429:
@@ -100,6 +201,8 @@ class RFIDReader:
 
         except httpx.RequestError as e:
             print(f"Listener {self.reader_id}: HTTP error processing scan for {rfid}: {e}")
+            self._buffer_scan(rfid, scanned_at)
+            self._back_off()
         except Exception as e:
             print(f"Listener {self.reader_id}: Unexpected error processing scan for {rfid}: {e}")
 
@@ -114,7 +217,7 @@ class RFIDReader:
             try:
                 rfid = await self.poll_reader()
                 if rfid:
-                    await self.process_scan(rfid)
+                    await self.process_scan(rfid, datetime.now(timezone.utc))
                 # Adjust sleep time as needed
                 await asyncio.sleep(1)
             except Exception as e:
@@ -129,18 +232,19 @@ class RFIDReader:
 
 # --- Example of running listeners (remains the same) ---
 async def main_listener_task():
-    # Ensure LISTENER_USERNAME and LISTENER_PASSWORD are set in your environment
-    if not LISTENER_USERNAME or not LISTENER_PASSWORD:
+    readers_config = [
+        # "key" is the reader's device key; readers without one log in with LISTENER_USERNAME/LISTENER_PASSWORD
+        {"id": "entrance", "url": "http://localhost:5000", "key": os.getenv("ENTRANCE_READER_KEY")}, # Using mock reader URL
+        # {"id": "exit", "url": "http://192.168.1.101", "key": os.getenv("EXIT_READER_KEY")}
+    ]
+
+    # Ensure LISTENER_USERNAME and LISTENER_PASSWORD are set in your environment when some reader has no key
+    if any(not config.get("key") for config in readers_config) and (not LISTENER_USERNAME or not LISTENER_PASSWORD):
         print("ERROR: LISTENER_USERNAME or LISTENER_PASSWORD environment variables are not set.")
         print("The RFID listener cannot authenticate with the API and will not run.")
         return # Prevent listeners from starting without credentials
 
-    readers_config = [
-        {"id": "entrance", "url": "http://localhost:5000"}, # Using mock reader URL
-        # {"id": "exit", "url": "http://192.168.1.101"}
-    ]
-
-    readers = [RFIDReader(config["id"], config["url"]) for config in readers_config]
+    readers = [RFIDReader(config["id"], config["url"], reader_key=config.get("key")) for config in readers_config]
     polling_tasks = [asyncio.create_task(reader.run_polling()) for reader in readers]
 
     try:
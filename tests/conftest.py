@@ -1,5 +1,6 @@
 import pytest
 import os
+from functools import lru_cache
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
@@ -7,9 +8,12 @@ from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sess
 from httpx import AsyncClient
 from sqlalchemy.sql import select
 
-from app.database import Base, get_db, get_async_db
+from app.database import Base, get_async_db, get_report_db
 from app.main import app
 from app.models import Employee
+from app.cache import principal_cache
+from app.daily_summary import summary_refresher
+from app.report_cache import report_cache
 from app.security import get_password_hash
 
 # Set environment variables for testing
@@ -40,6 +44,24 @@ def setup_database():
     yield
     Base.metadata.drop_all(bind=engine)
 
+@pytest.fixture(autouse=True)
+def clear_report_cache():
+    """Tests share one database, so cached downloads must not leak between them"""
+    report_cache.clear()
+    yield
+
+@pytest.fixture(autouse=True)
+def clear_principal_cache():
+    """Some tests change employee rows directly, bypassing crud's invalidation"""
+    principal_cache.clear()
+    yield
+
+@pytest.fixture(autouse=True)
+def summary_refresher_on_test_database(monkeypatch):
+    """Scans queue summary refreshes; run them against the test database"""
+    monkeypatch.setattr(summary_refresher, "session_factory", AsyncTestingSessionLocal)
+    yield
+
 @pytest.fixture
 def db_session():
     db = TestingSessionLocal()
@@ -48,6 +70,11 @@ def db_session():
     finally:
         db.close()
 
+@pytest.fixture
+def async_session_factory():
+    """Async session factory for tests that drive async code directly"""
+    return AsyncTestingSessionLocal
+
 @pytest.fixture
 async def test_db():
     """Async database session for testing"""
@@ -57,19 +84,12 @@ async def test_db():
 @pytest.fixture
 def client(db_session):
     # Override dependencies
-    def override_get_db():
-        try:
-            yield db_session
-        finally:
-            pass
-    
-    app.dependency_overrides[get_db] = override_get_db
-    
     async def override_get_async_db():
         async with AsyncTestingSessionLocal() as session:
             yield session
     
     app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_report_db] = override_get_async_db
     
     with TestClient(app) as test_client:
         yield test_client
@@ -85,6 +105,7 @@ async def async_client():
             yield session
     
     app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_report_db] = override_get_async_db
     
     async with AsyncClient(app=app, base_url="http://test") as test_client:
         yield test_client
@@ -156,6 +177,31 @@ def test_admin(db_session):
     db_session.refresh(admin)
     return admin
 
+@lru_cache(maxsize=None)
+def employee_password_hash():
+    """Hashed once per run; bcrypt at the default cost is slow"""
+    return get_password_hash("employeepassword")
+
+@pytest.fixture
+def employee_factory(db_session):
+    """Get-or-create a regular employee by username (the test database is shared)"""
+    def create(username, rfid):
+        employee = db_session.query(Employee).filter(Employee.username == username).first()
+        if employee:
+            return employee
+        employee = Employee(
+            username=username,
+            email=f"{username}@example.com",
+            rfid=rfid,
+            hashed_password=employee_password_hash(),
+            is_admin=False
+        )
+        db_session.add(employee)
+        db_session.commit()
+        db_session.refresh(employee)
+        return employee
+    return create
+
 @pytest.fixture
 async def async_test_admin():
     """Create a test admin with async operations"""
@@ -0,0 +1,148 @@
+import asyncio
+import io
+from datetime import datetime, timezone
+
+import pytest
+
+from app import archive, columnar_export, crud, daily_summary, reports
+from app.models import AttendanceEvent, DailyAttendanceSummary
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+# Old enough that archiving up to it cannot touch events from other tests
+NOW = datetime(2001, 6, 15, tzinfo=timezone.utc)
+EVENTS = [
+    ("checkin", datetime(2001, 1, 8, 9, 0, tzinfo=timezone.utc)),
+    ("checkout", datetime(2001, 1, 8, 17, 0, tzinfo=timezone.utc)),
+    ("checkin", datetime(2001, 2, 5, 9, 0, tzinfo=timezone.utc)),
+    ("checkout", datetime(2001, 2, 5, 13, 0, tzinfo=timezone.utc)),
+    ("checkin", datetime(2001, 6, 11, 9, 0, tzinfo=timezone.utc)),
+    ("checkout", datetime(2001, 6, 11, 12, 0, tzinfo=timezone.utc)),
+]
+FILTERS = reports.ReportFilters(
+    start_date=datetime(2001, 1, 1, tzinfo=timezone.utc),
+    end_date=datetime(2001, 6, 30, tzinfo=timezone.utc),
+    username="archive_user",
+)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive.archive_store, "directory", str(tmp_path))
+    return archive.archive_store
+
+
+@pytest.fixture
+def archive_employee(db_session, employee_factory):
+    employee = employee_factory("archive_user", "ARCHIVE-001")
+    db_session.query(AttendanceEvent).filter(AttendanceEvent.user_id == employee.id).delete()
+    for event_type, timestamp in EVENTS:
+        db_session.add(AttendanceEvent(user_id=employee.id, event_type=event_type, timestamp=timestamp, manual=False))
+    db_session.commit()
+    return employee
+
+
+def test_old_months_move_to_archive_files(archive_employee, store, db_session, async_session_factory):
+    archived = asyncio.run(archive.archive_old_events(async_session_factory, horizon_days=90, now=NOW))
+
+    assert archived == {"2001-01": 2, "2001-02": 2}
+    live = db_session.query(AttendanceEvent).filter(AttendanceEvent.user_id == archive_employee.id).all()
+    assert [event.timestamp.month for event in live] == [6, 6]
+    assert store.months() == [datetime(2001, 1, 1).date(), datetime(2001, 2, 1).date()]
+    assert store.manifest()["months"]["2001-01"]["rows"] == 2
+
+    # A second run has nothing left to move
+    assert asyncio.run(archive.archive_old_events(async_session_factory, horizon_days=90, now=NOW)) == {}
+
+
+def test_queries_fall_back_to_archived_months(archive_employee, store, async_session_factory):
+    asyncio.run(archive.archive_old_events(async_session_factory, horizon_days=90, now=NOW))
+
+    async def read_pages():
+        pages, cursor = [], None
+        async with async_session_factory() as session:
+            while True:
+                page = await crud.get_filtered_attendance_events(
+                    session, start_date=FILTERS.start_date, end_date=FILTERS.end_date,
+                    username="archive_user", limit=4, cursor=cursor,
+                )
+                pages.append(page.events)
+                cursor = page.next_cursor
+                if cursor is None:
+                    return pages
+
+    pages = asyncio.run(read_pages())
+    assert [len(page) for page in pages] == [4, 2]
+    # SQLite hands back naive UTC timestamps, the archive aware ones
+    timestamps = [event.timestamp.replace(tzinfo=timezone.utc) for page in pages for event in page]
+    assert timestamps == sorted((timestamp for _, timestamp in EVENTS), reverse=True)
+    assert all(event.employee.username == "archive_user" for page in pages for event in page)
+
+
+def test_unbounded_pages_read_the_archive_only_past_the_live_rows(archive_employee, store, async_session_factory, monkeypatch):
+    asyncio.run(archive.archive_old_events(async_session_factory, horizon_days=90, now=NOW))
+    reads = []
+    read_events = store.read_events
+    monkeypatch.setattr(store, "read_events", lambda *args, **kwargs: reads.append(args) or read_events(*args, **kwargs))
+
+    async def read_page(cursor):
+        async with async_session_factory() as session:
+            return await crud.get_filtered_attendance_events(session, username="archive_user", limit=1, cursor=cursor)
+
+    first = asyncio.run(read_page(None))
+    assert reads == []  # two live June rows fill the page
+
+    second = asyncio.run(read_page(first.next_cursor))
+    assert [event.timestamp.replace(tzinfo=timezone.utc) for event in second.events] == [EVENTS[4][1]]
+    # Only one live row was left, so the archive is read, bounded by the cursor
+    assert reads == [(None, EVENTS[5][1])]
+
+
+def test_reports_include_archived_events(archive_employee, store, async_session_factory):
+    asyncio.run(archive.archive_old_events(async_session_factory, horizon_days=90, now=NOW))
+
+    async def collect():
+        async with async_session_factory() as session:
+            totals = {
+                engine: (await reports.employee_totals(session, FILTERS, engine=engine))[archive_employee.id]
+                for engine in ("sql", "python", "numpy")
+            }
+            count = await reports.count_events(session, FILTERS)
+            rows = [row async for row in reports.export_csv_rows(session, FILTERS)]
+            parquet = b"".join([chunk async for chunk in columnar_export.stream_columnar(session, FILTERS, "parquet", batch_size=4)])
+            return totals, count, rows, parquet
+
+    totals, count, rows, parquet = asyncio.run(collect())
+
+    assert set(totals.values()) == {(6, 3, 15 * 3600.0)}
+    assert count == 6
+    details = rows[rows.index(['Employee Name', 'Event Type', 'Timestamp']) + 1:]
+    assert [detail[2] for detail in details] == [timestamp.strftime("%Y-%m-%d %H:%M:%S") for _, timestamp in EVENTS]
+    exported = pq.read_table(io.BytesIO(parquet))
+    assert exported.column("session_seconds").to_pylist() == [None, 8 * 3600.0, None, 4 * 3600.0, None, 3 * 3600.0]
+
+
+def test_summary_rebuild_keeps_archived_days(archive_employee, store, db_session, async_session_factory):
+    asyncio.run(archive.archive_old_events(async_session_factory, horizon_days=90, now=NOW))
+    asyncio.run(daily_summary.backfill(async_session_factory, user_id=archive_employee.id))
+
+    db_session.expire_all()
+    rows = (
+        db_session.query(DailyAttendanceSummary)
+        .filter(DailyAttendanceSummary.user_id == archive_employee.id)
+        .order_by(DailyAttendanceSummary.local_date)
+        .all()
+    )
+    assert [(row.local_date.month, row.worked_seconds, row.event_count) for row in rows] == [
+        (1, 8 * 3600.0, 2), (2, 4 * 3600.0, 2), (6, 3 * 3600.0, 2),
+    ]
+
+
+def test_merge_keeps_live_copy_of_duplicated_event():
+    timestamp = datetime(2001, 1, 8, 9, 0, tzinfo=timezone.utc)
+    archived = archive.ArchivedEvent(1, 7, "archive_user", "checkin", timestamp, False, None)
+    live = AttendanceEvent(id=1, user_id=7, event_type="checkin", timestamp=timestamp, manual=False, notes="edited")
+
+    merged = archive.merge_event_lists([live], [archived])
+
+    assert merged == [live]
@@ -0,0 +1,33 @@
+import asyncio
+
+from sqlalchemy import inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app import bootstrap
+from app.models import Employee
+
+
+def test_bootstrap_runs_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(bootstrap, "BOOTSTRAP_SCHEMA", "create_all")
+    monkeypatch.setattr(bootstrap, "DEFAULT_ADMIN_USERNAME", "bootstrap_admin")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'bootstrap.db'}")
+    session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def scenario():
+        try:
+            first = await bootstrap.bootstrap_database(engine, session_factory)
+            second = await bootstrap.bootstrap_database(engine, session_factory)
+            async with engine.connect() as connection:
+                tables = await connection.run_sync(lambda sync_connection: inspect(sync_connection).get_table_names())
+                admins = (await connection.execute(
+                    select(Employee.username, Employee.is_admin).where(Employee.username == "bootstrap_admin")
+                )).all()
+            return first, second, tables, admins
+        finally:
+            await engine.dispose()
+
+    first, second, tables, admins = asyncio.run(scenario())
+
+    assert (first, second) == (True, False)
+    assert {"employees", "attendance_events"} <= set(tables)
+    assert [tuple(row) for row in admins] == [("bootstrap_admin", True)]
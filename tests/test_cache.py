@@ -0,0 +1,167 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from app import crud, schemas, security
+from app.cache import EmployeeDirectory, EmployeeRoster, LastEventCache, LastEventState, employee_roster, principal_cache
+from app.models import AttendanceEvent, Employee
+from app.routes.admin import etag_matches
+
+
+def make_employee(id, username, rfid, is_admin=False):
+    return Employee(id=id, username=username, email=f"{username}@example.com", rfid=rfid, is_admin=is_admin)
+
+
+def test_directory_lookup_counts_hits_and_misses():
+    directory = EmployeeDirectory()
+    directory.put(make_employee(1, "alice", "RFID-A"))
+
+    assert directory.get_by_rfid("RFID-A").username == "alice"
+    assert directory.get_by_rfid("RFID-UNKNOWN") is None
+    assert directory.get_by_username("alice").id == 1
+
+    stats = directory.stats()
+    assert stats["entries"] == 1
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+
+
+def test_directory_put_replaces_stale_keys():
+    directory = EmployeeDirectory()
+    directory.put(make_employee(1, "alice", "RFID-A"))
+    # RFID card re-issued and username changed
+    directory.put(make_employee(1, "alice2", "RFID-B"))
+
+    assert directory.get_by_rfid("RFID-A") is None
+    assert directory.get_by_username("alice") is None
+    assert directory.get_by_rfid("RFID-B").username == "alice2"
+
+
+def test_directory_remove():
+    directory = EmployeeDirectory()
+    directory.put(make_employee(1, "alice", "RFID-A"))
+    directory.remove(1)
+    directory.remove(42)  # unknown ids are ignored
+
+    assert directory.get_by_id(1) is None
+    assert directory.get_by_rfid("RFID-A") is None
+    assert directory.stats()["entries"] == 0
+
+
+def make_event(id, user_id, event_type, timestamp):
+    return AttendanceEvent(id=id, user_id=user_id, event_type=event_type, timestamp=timestamp, manual=False)
+
+
+def test_last_event_cache_ignores_back_dated_events():
+    cache = LastEventCache()
+    now = datetime.now(timezone.utc)
+    cache.set(1, LastEventState(event_type="checkin", timestamp=now, event_id=10))
+
+    # An admin back-dates a checkout to yesterday: the newer checkin stays the latest
+    cache.record(make_event(11, 1, "checkout", now - timedelta(days=1)))
+    assert cache.get(1).event_id == 10
+
+    cache.record(make_event(12, 1, "checkout", now + timedelta(hours=8)))
+    assert cache.get(1).event_type == "checkout"
+
+
+def test_last_event_cache_unknown_users_stay_unknown():
+    cache = LastEventCache()
+    # Without a known state we cannot tell whether this is the latest event
+    cache.record(make_event(1, 7, "checkin", datetime.now(timezone.utc)))
+    assert cache.get(7) is None
+
+    cache.set(7, LastEventState())
+    cache.invalidate(7)
+    assert cache.get(7) is None
+    assert cache.stats()["misses"] == 2
+
+
+def test_last_event_state_normalizes_naive_timestamps():
+    state = LastEventState.from_event(make_event(1, 1, "checkin", datetime(2024, 1, 1, 8, 0)))
+    assert state.timestamp.tzinfo == timezone.utc
+
+
+def test_roster_snapshot_is_shared_until_an_employee_write(async_session_factory, test_admin):
+    roster = EmployeeRoster(ttl_seconds=0)
+
+    async def load():
+        async with async_session_factory() as session:
+            return await roster.get(session)
+
+    first = asyncio.run(load())
+    assert asyncio.run(load()) is first
+    assert roster.stats()["loads"] == 1
+    assert any(entry.username == "admin" for entry in first.employees)
+    assert not hasattr(first.employees[0], "hashed_password")
+
+    roster.invalidate()
+    second = asyncio.run(load())
+    assert second is not first
+    assert second.version == first.version + 1
+    assert second.etag == first.etag  # same content, same ETag
+
+
+def test_roster_endpoint_uses_etag_and_sees_new_employees(client, test_admin, async_session_factory):
+    client.cookies.set("admin_token", security.create_access_token(data={"sub": str(test_admin.id)}))
+    employee_roster.invalidate()
+
+    response = client.get("/admin/roster")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert client.get("/admin/roster", headers={"If-None-Match": etag}).status_code == 304
+
+    async def add_employee():
+        async with async_session_factory() as session:
+            await crud.create_employee(session, schemas.EmployeeCreate(
+                username="roster_user", email="roster_user@example.com", rfid="ROSTER-001", password="rosterpassword"
+            ))
+
+    asyncio.run(add_employee())
+    response = client.get("/admin/roster", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert "roster_user" in [entry["username"] for entry in response.json()]
+
+
+def test_etag_matching_compares_whole_tags():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('"old", W/"abc"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches(None, '"abc"')
+    # A substring of a longer tag is not a match
+    assert not etag_matches('"x"abc""', '"abc"')
+
+
+def test_principal_cache_serves_repeat_requests(client, test_admin):
+    headers = {"Authorization": f"Bearer {security.create_access_token(data={'sub': str(test_admin.id)})}"}
+    before = principal_cache.stats()
+
+    assert client.get("/api/users", headers=headers).status_code == 200
+    assert client.get("/api/users", headers=headers).status_code == 200
+
+    after = principal_cache.stats()
+    assert (after["hits"] - before["hits"], after["misses"] - before["misses"]) == (1, 1)
+    # A new token for the same user is a separate entry
+    other = {"Authorization": f"Bearer {security.create_access_token(data={'sub': str(test_admin.id)})}"}
+    assert client.get("/api/users", headers=other).status_code == 200
+    assert principal_cache.stats()["entries"] == 2
+
+
+def test_principal_cache_drops_user_when_admin_flag_changes(client, db_session, async_session_factory):
+    employee = db_session.query(Employee).filter(Employee.username == "principal_user").first()
+    if employee is None:
+        employee = Employee(username="principal_user", email="principal_user@example.com", rfid="PRINCIPAL-001")
+        db_session.add(employee)
+    employee.is_admin = True
+    db_session.commit()
+    headers = {"Authorization": f"Bearer {security.create_access_token(data={'sub': str(employee.id)})}"}
+    assert client.get("/api/users", headers=headers).status_code == 200
+
+    async def demote():
+        async with async_session_factory() as session:
+            await crud.update_employee(session, employee.id, schemas.EmployeeUpdate(
+                username="principal_user", email="principal_user@example.com", rfid="PRINCIPAL-001", is_admin=False
+            ))
+
+    asyncio.run(demote())
+    assert client.get("/api/users", headers=headers).status_code == 403
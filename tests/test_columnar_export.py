@@ -0,0 +1,68 @@
+import io
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import columnar_export, security
+from app.models import AttendanceEvent
+
+pa = pytest.importorskip("pyarrow")
+import pyarrow.ipc  # noqa: E402
+import pyarrow.parquet as pq  # noqa: E402
+
+DAY = datetime(2023, 11, 6, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def columnar_employee(db_session, employee_factory):
+    employee = employee_factory("columnar_user", "COLUMNAR-001")
+    if employee.attendance_events:
+        return employee
+    for day in range(3):
+        db_session.add(AttendanceEvent(user_id=employee.id, event_type="checkin", timestamp=DAY + timedelta(days=day, hours=8), manual=False))
+        db_session.add(AttendanceEvent(user_id=employee.id, event_type="checkout", timestamp=DAY + timedelta(days=day, hours=16), manual=True, notes=f"day {day}"))
+    db_session.commit()
+    return employee
+
+
+def export_params():
+    return {
+        "start_date": DAY.isoformat(),
+        "end_date": (DAY + timedelta(days=3)).isoformat(),
+        "username": "columnar_user",
+    }
+
+
+def test_parquet_export_is_typed_and_batched(client, test_admin, columnar_employee, monkeypatch):
+    monkeypatch.setattr(columnar_export, "COLUMNAR_ROW_GROUP_SIZE", 4)
+    client.cookies.set("admin_token", security.create_access_token(data={"sub": str(test_admin.id)}))
+
+    response = client.get("/api/export/csv", params={**export_params(), "format": "parquet"})
+    assert response.status_code == 200
+    assert response.headers["content-disposition"].endswith(".parquet")
+
+    parquet_file = pq.ParquetFile(io.BytesIO(response.content))
+    assert parquet_file.metadata.num_row_groups == 2  # 6 rows, 4 per cursor fetch
+    table = parquet_file.read()
+    assert table.schema.field("timestamp").type == pa.timestamp("us", tz="UTC")
+    assert table.column("user_id").to_pylist() == [columnar_employee.id] * 6
+    assert table.column("event_type").to_pylist() == ["checkin", "checkout"] * 3
+    # The session crossing the row group boundary is still paired
+    assert table.column("session_seconds").to_pylist() == [None, 8 * 3600.0] * 3
+    assert table.column("notes").to_pylist()[1] == "day 0"
+
+
+def test_arrow_report_export(client, test_admin, columnar_employee):
+    client.cookies.set("admin_token", security.create_access_token(data={"sub": str(test_admin.id)}))
+
+    response = client.get("/api/admin/report", params={**export_params(), "format": "arrow"})
+    assert response.status_code == 200
+    table = pa.ipc.open_file(pa.BufferReader(response.content)).read_all()
+    assert table.num_rows == 6
+    assert table.column("manual").to_pylist() == [False, True] * 3
+
+
+def test_unknown_export_format_is_rejected(client, test_admin):
+    client.cookies.set("admin_token", security.create_access_token(data={"sub": str(test_admin.id)}))
+    response = client.get("/api/export/csv", params={"format": "xlsx"})
+    assert response.status_code == 422
@@ -0,0 +1,112 @@
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import select
+
+from app import crud, daily_summary, reports, scan_engine
+from app.cache import last_event_cache
+from app.models import AttendanceEvent, DailyAttendanceSummary
+
+DAY = datetime(2023, 9, 11, tzinfo=timezone.utc)
+
+
+async def load_rows(session, user_id):
+    result = await session.execute(
+        select(
+            DailyAttendanceSummary.local_date,
+            DailyAttendanceSummary.worked_seconds,
+            DailyAttendanceSummary.session_count,
+            DailyAttendanceSummary.event_count,
+        )
+        .where(DailyAttendanceSummary.user_id == user_id)
+        .order_by(DailyAttendanceSummary.local_date)
+    )
+    return [tuple(row) for row in result.all()]
+
+
+def test_summarize_events_splits_at_midnight():
+    days = daily_summary.summarize_events(1, [
+        ("checkin", DAY + timedelta(hours=8)),
+        ("checkout", DAY + timedelta(hours=12)),
+        ("checkin", DAY + timedelta(hours=22)),
+        ("checkout", DAY + timedelta(days=1, hours=6)),
+    ])
+
+    first, second = days[date(2023, 9, 11)], days[date(2023, 9, 12)]
+    assert first["worked_seconds"] == 6 * 3600 and first["session_count"] == 2 and first["event_count"] == 3
+    assert first["first_in"] == DAY + timedelta(hours=8)
+    assert first["last_out"] == DAY + timedelta(hours=12)
+    assert second["worked_seconds"] == 6 * 3600 and second["session_count"] == 0
+    assert second["first_in"] is None and second["last_out"] == DAY + timedelta(days=1, hours=6)
+
+
+def test_summary_days_across_a_dst_change_hold_elapsed_time():
+    sofia = ZoneInfo("Europe/Sofia")  # Clocks go back at 01:00Z on 2025-10-26
+    days = daily_summary.summarize_events(1, [
+        ("checkin", datetime(2025, 10, 25, 19, 0, tzinfo=timezone.utc)),
+        ("checkout", datetime(2025, 10, 26, 4, 0, tzinfo=timezone.utc)),
+    ], tz=sofia)
+    assert sum(row["worked_seconds"] for row in days.values()) == 9 * 3600
+
+    changes = daily_summary.offset_changes(datetime(2025, 1, 1, tzinfo=timezone.utc), datetime(2025, 12, 31, tzinfo=timezone.utc), sofia)
+    assert [change.astimezone(sofia).date() for change in changes] == [date(2025, 3, 30), date(2025, 10, 26)]
+
+
+def test_crud_changes_keep_summary_in_sync(db_session, async_session_factory, employee_factory):
+    employee = employee_factory("summary_crud_user", "SUMMARY-CRUD-001")
+
+    def new_event(event_type, offset):
+        return AttendanceEvent(user_id=employee.id, event_type=event_type, timestamp=DAY + offset, manual=True)
+
+    async def edit_history():
+        async with async_session_factory() as session:
+            await crud.create_attendance_event(session, new_event("checkin", timedelta(hours=9)))
+            checkout = await crud.create_attendance_event(session, new_event("checkout", timedelta(hours=17)))
+            late_checkin = await crud.create_attendance_event(session, new_event("checkin", timedelta(days=1, hours=8)))
+            await crud.create_attendance_event(session, new_event("checkout", timedelta(days=1, hours=12)))
+            assert await load_rows(session, employee.id) == [
+                (date(2023, 9, 11), 8 * 3600.0, 1, 2),
+                (date(2023, 9, 12), 4 * 3600.0, 1, 2),
+            ]
+
+            # Back-date a checkout and drop a checkin: both days change
+            await crud.update_attendance_event(session, checkout.id, {"timestamp": DAY + timedelta(hours=15)})
+            await crud.delete_attendance_event(session, late_checkin.id)
+            incremental = await load_rows(session, employee.id)
+
+            await daily_summary.rebuild_user(session, employee.id)
+            await session.commit()
+            return incremental, await load_rows(session, employee.id)
+
+    incremental, rebuilt = asyncio.run(edit_history())
+    assert incremental == rebuilt
+    assert incremental == [
+        (date(2023, 9, 11), 6 * 3600.0, 1, 2),
+        (date(2023, 9, 12), 0.0, 0, 1),
+    ]
+
+
+def test_scans_update_summary_and_summary_engine(db_session, async_session_factory, employee_factory):
+    employee = employee_factory("summary_scan_user", "SUMMARY-SCAN-001")
+    last_event_cache.invalidate(employee.id)
+
+    async def scan_a_shift():
+        async with async_session_factory() as session:
+            await scan_engine.record_scan(session, employee.id, 10, scanned_at=DAY + timedelta(days=3, hours=7))
+            await scan_engine.record_scan(session, employee.id, 10, scanned_at=DAY + timedelta(days=3, hours=15, minutes=30))
+            # The scans only queued the refresh
+            assert await load_rows(session, employee.id) == []
+            await daily_summary.summary_refresher.flush()
+            filters = reports.ReportFilters(
+                start_date=DAY + timedelta(days=3), end_date=DAY + timedelta(days=3, hours=23), user_id=employee.id
+            )
+            return (
+                await load_rows(session, employee.id),
+                await reports.employee_totals(session, filters, engine="summary"),
+                await reports.employee_totals(session, filters, engine="python"),
+            )
+
+    rows, summary_totals, python_totals = asyncio.run(scan_a_shift())
+    assert rows == [(date(2023, 9, 14), 8.5 * 3600, 1, 2)]
+    assert summary_totals == python_totals == {employee.id: (2, 1, 8.5 * 3600)}
@@ -0,0 +1,40 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from app import dashboard
+from app.models import AttendanceEvent, Employee
+from app.security import get_password_hash
+
+DAY = datetime(2024, 3, 11, tzinfo=timezone.utc)
+
+
+def test_dashboard_data_counts_today_and_limits_recent_events(db_session, async_session_factory):
+    employee = Employee(
+        username="dashboard_user",
+        email="dashboard_user@example.com",
+        rfid="DASHBOARD-001",
+        hashed_password=get_password_hash("dashboardpassword"),
+        is_admin=False
+    )
+    db_session.add(employee)
+    db_session.commit()
+    db_session.refresh(employee)
+    for minute in range(15):
+        event_type = "checkin" if minute % 2 == 0 else "checkout"
+        db_session.add(AttendanceEvent(user_id=employee.id, event_type=event_type, timestamp=DAY + timedelta(hours=8, minutes=minute), manual=False))
+    # Yesterday's events are not counted
+    db_session.add(AttendanceEvent(user_id=employee.id, event_type="checkin", timestamp=DAY - timedelta(hours=1), manual=False))
+    db_session.commit()
+
+    async def load():
+        async with async_session_factory() as session:
+            return await dashboard.dashboard_data(session, now=DAY + timedelta(hours=12))
+
+    data = asyncio.run(load())
+
+    assert data.employee_count == db_session.query(Employee).count()
+    assert (data.checkin_count, data.checkout_count) == (8, 7)
+    assert len(data.recent_events) == dashboard.RECENT_EVENTS_LIMIT
+    assert data.recent_events[0].timestamp.replace(tzinfo=timezone.utc) == DAY + timedelta(hours=8, minutes=14)
+    assert data.recent_events[0].employee.username == "dashboard_user"
+
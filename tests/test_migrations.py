@@ -0,0 +1,118 @@
+from datetime import datetime, timezone
+
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine, inspect, select, text
+
+from app import migrations, models, pagination
+from app.database import Base
+
+NEW_INDEXES = {
+    "ix_attendance_events_user_ts", "ix_attendance_events_ts_brin", "ix_attendance_events_manual_ts",
+    "ix_attendance_events_ts_id", "ix_attendance_events_type_ts",
+}
+
+
+def attendance_indexes(engine):
+    return {index["name"] for index in inspect(engine).get_indexes("attendance_events")}
+
+
+def test_migrations_build_the_model_schema(tmp_path):
+    url = f"sqlite:///{tmp_path / 'migrated.db'}"
+    migrations.upgrade_database(url)
+    engine = create_engine(url)
+
+    assert NEW_INDEXES <= attendance_indexes(engine)
+    with engine.connect() as connection:
+        assert compare_metadata(MigrationContext.configure(connection), Base.metadata) == []
+
+    command.downgrade(migrations.alembic_config(url), migrations.BASELINE_REVISION)
+    assert not NEW_INDEXES & attendance_indexes(engine)
+
+
+def test_create_all_database_is_stamped_then_upgraded(tmp_path):
+    url = f"sqlite:///{tmp_path / 'legacy.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(text("DROP INDEX ix_attendance_events_user_ts"))
+
+    assert migrations.needs_baseline_stamp(url)
+    migrations.upgrade_database(url)
+
+    assert not migrations.needs_baseline_stamp(url)
+    assert NEW_INDEXES <= attendance_indexes(engine)
+
+
+def test_baseline_shaped_database_gets_the_later_tables(tmp_path):
+    url = f"sqlite:///{tmp_path / 'original.db'}"
+    engine = create_engine(url)
+    original = [Base.metadata.tables["employees"], Base.metadata.tables["attendance_events"]]
+    Base.metadata.create_all(engine, tables=original)
+    with engine.begin() as connection:
+        connection.execute(models.Employee.__table__.insert().values(
+            id=1, username="legacy", hashed_password="x", is_admin=False,
+        ))
+        connection.execute(models.AttendanceEvent.__table__.insert(), [
+            {"user_id": 1, "event_type": "checkin", "timestamp": datetime(2024, 3, 4, 9, tzinfo=timezone.utc)},
+            {"user_id": 1, "event_type": "checkout", "timestamp": datetime(2024, 3, 4, 17, tzinfo=timezone.utc)},
+        ])
+
+    migrations.upgrade_database(url)
+
+    assert set(Base.metadata.tables) <= set(inspect(engine).get_table_names())
+    with engine.connect() as connection:
+        assert compare_metadata(MigrationContext.configure(connection), Base.metadata) == []
+        summary = models.DailyAttendanceSummary
+        rows = connection.execute(select(summary.event_count, summary.session_count, summary.worked_seconds)).all()
+    assert [tuple(row) for row in rows] == [(2, 1, 8 * 3600.0)]
+
+
+def query_plan(db_session, query):
+    compiled = query.compile(db_session.get_bind(), compile_kwargs={"literal_binds": True})
+    rows = db_session.execute(text(f"EXPLAIN QUERY PLAN {compiled}")).all()
+    return " | ".join(row[-1] for row in rows)
+
+
+def test_latest_event_lookup_uses_user_timestamp_index(db_session):
+    events = models.AttendanceEvent
+    query = (
+        select(events.event_type)
+        .where(events.user_id == 1)
+        .order_by(events.timestamp.desc(), events.id.desc())
+        .limit(1)
+    )
+    plan = query_plan(db_session, query)
+    assert "ix_attendance_events_user_ts" in plan
+    assert "TEMP B-TREE" not in plan  # no sort step
+
+
+def test_manual_event_listing_uses_partial_index(db_session):
+    events = models.AttendanceEvent
+    query = select(events.id).where(events.manual == True).order_by(*pagination.newest_first()).limit(101)  # noqa: E712
+    plan = query_plan(db_session, query)
+    assert "ix_attendance_events_manual_ts" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_event_list_pages_walk_an_index_without_sorting(db_session):
+    events = models.AttendanceEvent
+    after = pagination.after_cursor(pagination.encode_cursor(datetime(2024, 1, 1, tzinfo=timezone.utc), 1000))
+    unfiltered = select(events.id).where(after).order_by(*pagination.newest_first()).limit(101)
+    by_type = select(events.id).where(events.event_type == "checkin", after).order_by(*pagination.newest_first()).limit(101)
+
+    # SQLite's stand-in for the BRIN index is a btree on (timestamp, rowid), which serves the same order
+    plan = query_plan(db_session, unfiltered)
+    assert "INDEX ix_attendance_events_ts_" in plan and "TEMP B-TREE" not in plan
+    plan = query_plan(db_session, by_type)
+    assert "ix_attendance_events_type_ts" in plan and "TEMP B-TREE" not in plan
+
+
+def test_report_range_scan_uses_timestamp_index(db_session):
+    events = models.AttendanceEvent
+    query = select(events.user_id, events.event_type, events.timestamp).where(
+        events.timestamp >= datetime(2024, 1, 1, tzinfo=timezone.utc),
+        events.timestamp <= datetime(2024, 1, 31, tzinfo=timezone.utc),
+    )
+    assert "ix_attendance_events_ts_brin" in query_plan(db_session, query)
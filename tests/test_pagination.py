@@ -0,0 +1,71 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import crud, pagination, security
+from app.models import AttendanceEvent
+
+DAY = datetime(2024, 4, 8, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def paged_employee(db_session, employee_factory):
+    employee = employee_factory("pagination_user", "PAGINATION-001")
+    if employee.attendance_events:
+        return employee
+    # Pairs of events share a timestamp, so the id has to break ties
+    for index in range(25):
+        event_type = "checkin" if index % 2 == 0 else "checkout"
+        timestamp = DAY + timedelta(minutes=index // 2)
+        db_session.add(AttendanceEvent(user_id=employee.id, event_type=event_type, timestamp=timestamp, manual=False))
+    db_session.commit()
+    return employee
+
+
+def test_keyset_pages_cover_every_event_once(paged_employee, async_session_factory):
+    async def all_pages():
+        pages = []
+        cursor = None
+        async with async_session_factory() as session:
+            while True:
+                page = await crud.get_filtered_attendance_events(session, username="pagination_user", limit=10, cursor=cursor)
+                pages.append(page.events)
+                cursor = page.next_cursor
+                if cursor is None:
+                    return pages
+
+    pages = asyncio.run(all_pages())
+
+    assert [len(page) for page in pages] == [10, 10, 5]
+    keys = [(event.timestamp, event.id) for page in pages for event in page]
+    assert keys == sorted(keys, reverse=True)
+    assert len(set(keys)) == 25
+
+
+def test_cursor_round_trip_and_rejects_garbage():
+    timestamp = datetime(2024, 4, 8, 9, 30, tzinfo=timezone.utc)
+    assert pagination.decode_cursor(pagination.encode_cursor(timestamp, 42)) == (timestamp, 42)
+    with pytest.raises(pagination.InvalidCursor):
+        pagination.decode_cursor("not-a-cursor")
+
+
+def test_filtered_api_returns_next_cursor_header(client, paged_employee, test_admin):
+    headers = {"Authorization": f"Bearer {security.create_access_token(data={'sub': str(test_admin.id)})}"}
+    params = {"username": "pagination_user", "limit": 20}
+
+    response = client.get("/api/filtered", params=params, headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()) == 20
+    cursor = response.headers["X-Next-Cursor"]
+    assert 'rel="next"' in response.headers["Link"]
+
+    response = client.get("/api/filtered", params={**params, "cursor": cursor}, headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()) == 5
+    assert "X-Next-Cursor" not in response.headers
+
+    response = client.get("/api/filtered", params={**params, "cursor": "garbage"}, headers=headers)
+    assert response.status_code == 400
+    response = client.get("/api/filtered", params={**params, "limit": pagination.MAX_PAGE_SIZE + 1}, headers=headers)
+    assert response.status_code == 422
@@ -0,0 +1,29 @@
+from datetime import date, datetime, timezone
+
+from app import partitions
+
+
+def test_month_arithmetic_and_names():
+    assert partitions.add_months(date(2024, 11, 1), 3) == date(2025, 2, 1)
+    assert partitions.add_months(date(2024, 1, 1), -1) == date(2023, 12, 1)
+    assert partitions.months_between(date(2024, 11, 15), date(2025, 1, 1)) == [
+        date(2024, 11, 1), date(2024, 12, 1), date(2025, 1, 1)
+    ]
+
+    name = partitions.partition_name(date(2024, 2, 1))
+    assert name == "attendance_events_y2024m02"
+    assert partitions.partition_month(name) == date(2024, 2, 1)
+    assert partitions.partition_month(partitions.DEFAULT_PARTITION) is None
+
+
+def test_month_bounds_are_utc_and_half_open():
+    start, end = partitions.month_bounds(date(2024, 12, 1))
+    assert start == datetime(2024, 12, 1, tzinfo=timezone.utc)
+    assert end == datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def test_partition_management_is_a_no_op_without_postgres(db_session):
+    connection = db_session.connection()
+    assert not partitions.is_partitioned(connection)
+    assert partitions.ensure_partitions(connection) == []
+    assert partitions.detach_partitions_before(connection, date(2020, 1, 1)) == []
@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+from app import passwords
+from app.models import Employee
+
+
+@pytest.fixture
+def cheap_hashing(monkeypatch):
+    """Cost 5 as the current setting, so hashes made at cost 4 are outdated"""
+    monkeypatch.setattr(passwords, "pwd_context", passwords.password_context(5))
+    return passwords.password_context(4)
+
+
+def test_verify_reports_replacement_for_outdated_cost(cheap_hashing):
+    current = passwords.hash_password_sync("secret")
+    outdated = cheap_hashing.hash("secret")
+
+    assert asyncio.run(passwords.verify_password("secret", current)) == (True, None)
+    assert asyncio.run(passwords.verify_password("wrong", outdated)) == (False, None)
+    matches, new_hash = asyncio.run(passwords.verify_password("secret", outdated))
+    assert matches and new_hash.startswith("$2b$05$")
+
+
+def test_missing_hash_does_not_verify():
+    assert asyncio.run(passwords.verify_password("anything", "")) == (False, None)
+    assert asyncio.run(passwords.verify_password("anything", None)) == (False, None)
+
+
+def test_login_rehashes_outdated_password(client, db_session, cheap_hashing):
+    employee = db_session.query(Employee).filter(Employee.username == "rehash_user").first()
+    if employee is None:
+        employee = Employee(username="rehash_user", email="rehash_user@example.com", rfid="REHASH-001", is_admin=False)
+        db_session.add(employee)
+    employee.hashed_password = cheap_hashing.hash("rehashpassword")
+    db_session.commit()
+
+    response = client.post("/api/token", data={"username": "rehash_user", "password": "rehashpassword"})
+    assert response.status_code == 200
+
+    db_session.expire_all()
+    stored = db_session.query(Employee).filter(Employee.username == "rehash_user").one().hashed_password
+    assert stored.startswith("$2b$05$")
+    assert passwords.pwd_context.verify("rehashpassword", stored)
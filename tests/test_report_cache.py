@@ -0,0 +1,128 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from app import crud, security
+from app import report_cache as report_cache_module
+from app.models import AttendanceEvent, Employee
+from app.report_cache import ReportResultCache, report_cache
+from app.security import get_password_hash
+
+DAY = datetime(2024, 2, 5, tzinfo=timezone.utc)
+
+
+def test_cache_evicts_least_recently_used_by_size():
+    cache = ReportResultCache(max_bytes=10, max_entry_bytes=6)
+    assert cache.put("a", b"aaaa", "text/csv", None, None, cache.generation)
+    assert cache.put("b", b"bbbb", "text/csv", None, None, cache.generation)
+    assert cache.get("a") is not None  # "b" is now the least recently used
+    assert cache.put("c", b"cccc", "text/csv", None, None, cache.generation)
+
+    assert cache.get("b") is None
+    assert cache.get("a").body == b"aaaa"
+    assert cache.size == 8
+    assert cache.evictions == 1
+    # Too big for a single entry
+    assert not cache.put("d", b"ddddddd", "text/csv", None, None, cache.generation)
+
+
+def test_cache_invalidates_overlapping_ranges_only():
+    cache = ReportResultCache()
+    january = (datetime(2024, 1, 1, tzinfo=timezone.utc), datetime(2024, 1, 31, tzinfo=timezone.utc))
+    february = (datetime(2024, 2, 1, tzinfo=timezone.utc), datetime(2024, 2, 29, tzinfo=timezone.utc))
+    cache.put("january", b"1", "text/csv", *january, cache.generation)
+    cache.put("february", b"2", "text/csv", *february, cache.generation)
+    cache.put("everything", b"3", "text/csv", None, None, cache.generation)
+
+    # Naive timestamps are UTC, like the ones the reports store
+    changed = datetime(2024, 2, 10, 9, 0)
+    assert cache.invalidate_range(changed, changed) == 2
+    assert cache.get("january") is not None
+    assert cache.get("february") is None
+    assert cache.get("everything") is None
+
+
+def test_cache_refuses_results_computed_across_a_write():
+    cache = ReportResultCache()
+    january = (datetime(2024, 1, 1, tzinfo=timezone.utc), datetime(2024, 1, 31, tzinfo=timezone.utc))
+    started = cache.generation
+
+    today = datetime(2024, 2, 10, tzinfo=timezone.utc)
+    cache.invalidate_range(today, today)
+    assert cache.put("january", b"1", "text/csv", *january, started)
+
+    mid_january = datetime(2024, 1, 15, tzinfo=timezone.utc)
+    cache.invalidate_range(mid_january, mid_january)
+    assert not cache.put("january", b"1", "text/csv", *january, started)
+
+
+def test_report_download_is_cached_until_an_event_in_range_changes(client, db_session, test_admin, async_session_factory):
+    employee = Employee(
+        username="report_cache_user",
+        email="report_cache_user@example.com",
+        rfid="REPORT-CACHE-001",
+        hashed_password=get_password_hash("reportcachepassword"),
+        is_admin=False
+    )
+    db_session.add(employee)
+    db_session.commit()
+    db_session.refresh(employee)
+    for event_type, hours in (("checkin", 8), ("checkout", 16)):
+        db_session.add(AttendanceEvent(user_id=employee.id, event_type=event_type, timestamp=DAY + timedelta(hours=hours), manual=False))
+    db_session.commit()
+
+    client.cookies.set("admin_token", security.create_access_token(data={"sub": str(test_admin.id)}))
+    params = {
+        "start_date": DAY.isoformat(),
+        "end_date": (DAY + timedelta(days=1)).isoformat(),
+        "username": "report_cache_user",
+    }
+
+    first = client.get("/api/admin/report", params=params)
+    assert first.status_code == 200
+    hits = report_cache.hits
+    second = client.get("/api/admin/report", params=params)
+    assert second.status_code == 200
+    assert report_cache.hits == hits + 1
+    assert second.text == first.text
+    assert second.headers["content-disposition"].startswith("attachment; filename=attendance_report_report_cache_user_")
+
+    async def add_event(timestamp):
+        async with async_session_factory() as session:
+            await crud.create_attendance_event(session, AttendanceEvent(user_id=employee.id, event_type="checkin", timestamp=timestamp, manual=True))
+
+    # A write outside the report's range leaves the entry alone
+    asyncio.run(add_event(DAY + timedelta(days=3)))
+    assert client.get("/api/admin/report", params=params).text == first.text
+    assert report_cache.hits == hits + 2
+
+    asyncio.run(add_event(DAY + timedelta(hours=18)))
+    third = client.get("/api/admin/report", params=params)
+    assert report_cache.hits == hits + 2
+    assert third.text.count("report_cache_user,checkin") == 2
+
+
+def test_cached_report_is_dropped_after_a_write_through_another_worker(client, test_admin, async_session_factory, employee_factory, monkeypatch):
+    employee = employee_factory("report_cache_peer", "REPORT-CACHE-002")
+    day = DAY + timedelta(days=10)
+    client.cookies.set("admin_token", security.create_access_token(data={"sub": str(test_admin.id)}))
+    params = {"start_date": day.isoformat(), "end_date": (day + timedelta(days=1)).isoformat(), "username": "report_cache_peer"}
+
+    first = client.get("/api/admin/report", params=params)
+    hits = report_cache.hits
+    assert client.get("/api/admin/report", params=params).text == first.text
+    assert report_cache.hits == hits + 1
+
+    async def add_event():
+        async with async_session_factory() as session:
+            await crud.create_attendance_event(session, AttendanceEvent(
+                user_id=employee.id, event_type="checkin", timestamp=day + timedelta(hours=9), manual=True
+            ))
+
+    # The other worker invalidates its own cache, not this one; only its change mark is shared
+    with monkeypatch.context() as other_worker:
+        other_worker.setattr(report_cache_module, "report_cache", ReportResultCache())
+        asyncio.run(add_event())
+
+    refreshed = client.get("/api/admin/report", params=params)
+    assert report_cache.hits == hits + 1
+    assert refreshed.text.count("report_cache_peer,checkin") == 1
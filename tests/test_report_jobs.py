@@ -0,0 +1,165 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import crud, event_changes, scan_engine, schemas, security
+from app.models import AttendanceEvent
+from app.report_jobs import report_runner
+
+DAY = datetime(2023, 12, 4, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def job_runner(async_session_factory, tmp_path, monkeypatch):
+    monkeypatch.setattr(report_runner, "session_factory", async_session_factory)
+    monkeypatch.setattr(report_runner, "read_session_factory", async_session_factory)
+    monkeypatch.setattr(report_runner, "directory", str(tmp_path))
+    return report_runner
+
+
+@pytest.fixture
+def admin_client(client, test_admin):
+    client.cookies.set("admin_token", security.create_access_token(data={"sub": str(test_admin.id)}))
+    return client
+
+
+@pytest.fixture
+def job_employee(db_session, employee_factory):
+    employee = employee_factory("report_job_user", "REPORT-JOB-001")
+    if employee.attendance_events:
+        return employee
+    for day in range(5):
+        db_session.add(AttendanceEvent(user_id=employee.id, event_type="checkin", timestamp=DAY + timedelta(days=day, hours=9), manual=False))
+        db_session.add(AttendanceEvent(user_id=employee.id, event_type="checkout", timestamp=DAY + timedelta(days=day, hours=17), manual=False))
+    db_session.commit()
+    return employee
+
+
+def job_body(**overrides):
+    body = {
+        "kind": "report",
+        "start_date": DAY.isoformat(),
+        "end_date": (DAY + timedelta(days=7)).isoformat(),
+        "username": "report_job_user",
+    }
+    body.update(overrides)
+    return body
+
+
+def wait_for_job(client, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/api/reports/jobs/{job_id}").json()
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"report job {job_id} did not finish")
+
+
+def test_report_job_lifecycle_and_range_download(admin_client, job_runner, job_employee):
+    response = admin_client.post("/api/reports/jobs", json=job_body())
+    assert response.status_code == 202
+    job = wait_for_job(admin_client, response.json()["id"])
+
+    assert job["status"] == "done"
+    assert job["rows_done"] == job["rows_total"] == 10
+    assert job["progress"] == 1.0
+
+    download = admin_client.get(job["download_url"])
+    assert download.status_code == 200
+    lines = download.text.splitlines()
+    assert lines[:2] == ["Username,RFID,Days Present,Total Hours", "report_job_user,REPORT-JOB-001,5,40.00"]
+    assert len(download.content) == job["file_size"]
+
+    partial = admin_client.get(job["download_url"], headers={"Range": "bytes=0-7"})
+    assert partial.status_code == 206
+    assert partial.content == download.content[:8]
+
+
+def test_identical_job_is_reused_until_range_changes(admin_client, job_runner, job_employee, async_session_factory):
+    first = admin_client.post("/api/reports/jobs", json=job_body(include_details=False))
+    wait_for_job(admin_client, first.json()["id"])
+
+    again = admin_client.post("/api/reports/jobs", json=job_body(include_details=False))
+    assert again.status_code == 200
+    assert again.json()["reused"] is True
+    assert again.json()["id"] == first.json()["id"]
+
+    # An event outside the range leaves the result alone
+    async def add_event(timestamp):
+        async with async_session_factory() as session:
+            await crud.create_attendance_event(session, AttendanceEvent(
+                user_id=job_employee.id, event_type="checkin", timestamp=timestamp, manual=True
+            ))
+
+    asyncio.run(add_event(DAY + timedelta(days=30)))
+    assert admin_client.get(f"/api/reports/jobs/{first.json()['id']}").json()["stale"] is False
+
+    # One inside the range makes it stale and the next request recomputes
+    asyncio.run(add_event(DAY + timedelta(days=2, hours=20)))
+    assert admin_client.get(f"/api/reports/jobs/{first.json()['id']}").json()["stale"] is True
+
+    fresh = admin_client.post("/api/reports/jobs", json=job_body(include_details=False))
+    assert fresh.status_code == 202
+    assert fresh.json()["id"] != first.json()["id"]
+    wait_for_job(admin_client, fresh.json()["id"])
+
+
+def test_running_job_with_expired_lease_is_requeued_not_reused(admin_client, job_runner, job_employee, async_session_factory):
+    body = job_body(include_details=False, username="report_job_user", end_date=(DAY + timedelta(days=6)).isoformat())
+    orphan = admin_client.post("/api/reports/jobs", json=body).json()
+    wait_for_job(admin_client, orphan["id"])
+
+    async def crash(job_id):
+        # As left behind by a process killed mid-report
+        await job_runner._set(
+            job_id, status="running", file_path=None, finished_at=None,
+            lease_expires_at=datetime.now(timezone.utc) - timedelta(seconds=1),
+        )
+
+    asyncio.run(crash(orphan["id"]))
+    fresh = admin_client.post("/api/reports/jobs", json=body)
+    assert fresh.status_code == 202
+    assert fresh.json()["id"] != orphan["id"]
+    wait_for_job(admin_client, fresh.json()["id"])
+
+    asyncio.run(crash(orphan["id"]))
+
+    async def resume():
+        await job_runner.resume()
+        await job_runner.join()
+
+    asyncio.run(resume())
+    assert admin_client.get(f"/api/reports/jobs/{orphan['id']}").json()["status"] == "done"
+
+
+def test_staleness_comes_from_live_events_and_backdated_marks(async_session_factory, job_employee):
+    backlog_day = DAY + timedelta(days=10)
+
+    async def scenario():
+        started = datetime.now(timezone.utc)
+        async with async_session_factory() as session:
+            quiet = await event_changes.changed_since(session, backlog_day, backlog_day + timedelta(days=1), started)
+            # A backlog replay writes an old timestamp, so it leaves a mark on its day
+            await scan_engine.record_scan_batch(session, [
+                schemas.BatchScanItem(rfid="REPORT-JOB-001", scanned_at=backlog_day + timedelta(hours=9)),
+            ], 10)
+            backlog = await event_changes.changed_since(session, backlog_day, backlog_day + timedelta(days=1), started)
+            # A live scan is found by its own timestamp
+            await scan_engine.record_scan(session, job_employee.id, 0)
+            live = await event_changes.changed_since(session, None, None, started)
+            untouched = await event_changes.changed_since(session, DAY, DAY + timedelta(days=1), started)
+        return quiet, backlog, live, untouched
+
+    assert asyncio.run(scenario()) == (False, True, True, False)
+
+
+def test_report_job_requires_range(admin_client, job_runner):
+    response = admin_client.post("/api/reports/jobs", json={"kind": "report"})
+    assert response.status_code == 400
+
+
+def test_unknown_report_job(admin_client):
+    assert admin_client.get("/api/reports/jobs/does-not-exist").status_code == 404
@@ -0,0 +1,62 @@
+import asyncio
+import gc
+
+from app import security
+from app.report_limiter import ReportLimiter
+from app.routes import attendance as attendance_routes
+
+
+async def chunks(*values):
+    for value in values:
+        yield value
+
+
+def test_limiter_turns_away_when_full_and_frees_slot_when_stream_ends():
+    async def scenario():
+        limiter = ReportLimiter(concurrency=1, queue_timeout=0.01)
+        assert await limiter.acquire(limiter.queue_timeout)
+        stream = await limiter.hold(chunks("a", "b"))
+        assert not await limiter.acquire(limiter.queue_timeout)
+
+        assert [chunk async for chunk in stream] == ["a", "b"]
+        assert limiter.active == 0
+        assert await limiter.acquire(limiter.queue_timeout)
+        return limiter.stats()
+
+    stats = asyncio.run(scenario())
+    assert (stats["admitted"], stats["rejected"], stats["active"]) == (2, 1, 1)
+
+
+def test_cancelled_or_dropped_waits_and_streams_give_their_slot_back():
+    async def scenario():
+        limiter = ReportLimiter(concurrency=1, queue_timeout=0.01)
+        assert await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire(1))
+        await asyncio.sleep(0)
+        limiter.release()  # The slot goes to the waiter...
+        waiter.cancel()  # ...which is cancelled before it runs again
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert await limiter.acquire(limiter.queue_timeout)
+
+        stream = await limiter.hold(chunks("a"))
+        del stream  # A response that never started its body
+        gc.collect()  # The event loop closes it, which runs its finally
+        return await limiter.acquire(limiter.queue_timeout), limiter.active
+
+    assert asyncio.run(scenario()) == (True, 1)
+
+
+def test_report_download_is_refused_while_reports_are_saturated(client, test_admin, monkeypatch):
+    client.cookies.set("admin_token", security.create_access_token(data={"sub": str(test_admin.id)}))
+    params = {"start_date": "2003-01-01T00:00:00", "end_date": "2003-01-02T00:00:00"}
+
+    limiter = ReportLimiter(concurrency=1, queue_timeout=0.01)
+    monkeypatch.setattr(attendance_routes, "report_limiter", limiter)
+    assert client.get("/api/admin/report", params=params).status_code == 200
+    assert limiter.active == 0
+
+    full = ReportLimiter(concurrency=0, queue_timeout=0.01)
+    monkeypatch.setattr(attendance_routes, "report_limiter", full)
+    response = client.get("/api/export/csv", params={**params, "username": "nobody"})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "10"
@@ -0,0 +1,109 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from app import reports, security
+from app.models import AttendanceEvent
+
+DAY = datetime(2023, 6, 5, tzinfo=timezone.utc)
+
+
+def add_events(db_session, employee, events):
+    for event_type, offset in events:
+        db_session.add(AttendanceEvent(user_id=employee.id, event_type=event_type, timestamp=DAY + offset, manual=False))
+    db_session.commit()
+
+
+def test_report_engines_agree(db_session, async_session_factory, employee_factory):
+    night_shift = employee_factory("report_night_user", "REPORT-NIGHT-001")
+    forgetful = employee_factory("report_forgetful_user", "REPORT-FORGET-001")
+    add_events(db_session, night_shift, [
+        ("checkin", timedelta(hours=22)),  # crosses midnight
+        ("checkout", timedelta(days=1, hours=6)),
+        ("checkin", timedelta(days=1, hours=20)),
+        ("checkout", timedelta(days=1, hours=21)),
+        ("checkout", timedelta(days=1, hours=23)),  # no open session
+    ])
+    add_events(db_session, forgetful, [
+        ("checkin", timedelta(hours=8)),
+        ("checkin", timedelta(hours=9)),  # earlier checkin is unmatched
+        ("checkout", timedelta(hours=17)),
+        ("checkin", timedelta(days=1, hours=8)),
+        ("checkout", timedelta(days=3, hours=8)),  # longer than MAX_SESSION_HOURS
+    ])
+    filters = reports.ReportFilters(start_date=DAY, end_date=DAY + timedelta(days=4))
+
+    async def all_engines():
+        async with async_session_factory() as session:
+            return (
+                await reports.employee_totals(session, filters, engine="sql"),
+                await reports.employee_totals(session, filters, engine="python"),
+                await reports.employee_totals(session, filters, engine="numpy"),
+            )
+
+    sql_totals, python_totals, numpy_totals = asyncio.run(all_engines())
+
+    assert sql_totals == python_totals == numpy_totals
+    assert sql_totals[night_shift.id] == (5, 2, 9 * 3600.0)
+    assert sql_totals[forgetful.id] == (5, 1, 8 * 3600.0)
+
+
+def test_admin_report_summary_and_details(client, db_session, test_admin, employee_factory):
+    employee = employee_factory("report_csv_user", "REPORT-CSV-001")
+    add_events(db_session, employee, [
+        ("checkin", timedelta(days=10, hours=8)),
+        ("checkout", timedelta(days=10, hours=12, minutes=30)),
+    ])
+    client.cookies.set("admin_token", security.create_access_token(data={"sub": str(test_admin.id)}))
+    params = {
+        "start_date": (DAY + timedelta(days=10)).isoformat(),
+        "end_date": (DAY + timedelta(days=11)).isoformat(),
+        "username": "report_csv_user",
+    }
+
+    response = client.get("/api/admin/report", params=params)
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert lines[0] == "Username,RFID,Days Present,Total Hours"
+    assert lines[1] == "report_csv_user,REPORT-CSV-001,1,4.50"
+    assert "Detailed Entries" in lines
+    assert lines[-2:] == [
+        "report_csv_user,checkin,2023-06-15 08:00:00",
+        "report_csv_user,checkout,2023-06-15 12:30:00",
+    ]
+
+    response = client.get("/api/admin/report", params={**params, "include_details": False})
+    assert response.status_code == 200
+    assert "Detailed Entries" not in response.text
+
+
+def test_csv_export_streams_details_in_chunks(client, db_session, test_admin, monkeypatch, employee_factory):
+    employee = employee_factory("report_stream_user", "REPORT-STREAM-001")
+    add_events(db_session, employee, [
+        ("checkin" if minute % 2 == 0 else "checkout", timedelta(days=20, minutes=minute))
+        for minute in range(300)
+    ])
+    monkeypatch.setattr(reports, "REPORT_STREAM_BATCH_SIZE", 7)
+    client.cookies.set("admin_token", security.create_access_token(data={"sub": str(test_admin.id)}))
+
+    response = client.get("/api/export/csv", params={
+        "start_date": (DAY + timedelta(days=20)).isoformat(),
+        "end_date": (DAY + timedelta(days=21)).isoformat(),
+        "username": "report_stream_user",
+    })
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert lines[:3] == ["Employee Summary", "Employee Name,Days Present,Total Hours", "report_stream_user,1,2.50"]
+    details = lines[lines.index("Employee Name,Event Type,Timestamp") + 1:]
+    assert len(details) == 300
+    assert details[0] == "report_stream_user,checkin,2023-06-25 00:00:00"
+    assert details[-1] == "report_stream_user,checkout,2023-06-25 04:59:00"
+
+
+def test_csv_chunks_flushes_at_chunk_size():
+    async def collect():
+        return [chunk async for chunk in reports.csv_chunks([["a" * 10]] * 5, chunk_size=25)]
+
+    chunks = asyncio.run(collect())
+    # 12 characters per row: the first chunk is flushed after three rows
+    assert [len(chunk) for chunk in chunks] == [36, 24]
+    assert "".join(chunks) == ("a" * 10 + "\r\n") * 5
@@ -0,0 +1,149 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import scan_engine, schemas
+from app.cache import employee_directory, last_event_cache
+from app.ingest_queue import QueueFull, ScanIngestQueue
+from app.routes import attendance
+from app.models import AttendanceEvent
+
+
+def test_scan_uses_employee_directory(client, db_session, employee_factory):
+    employee = employee_factory("scan_directory_user", "SCAN-DIR-001")
+    employee_directory.remove(employee.id)
+
+    # First scan misses the directory and loads the employee from the database
+    response = client.post("/api/scan", json={"rfid": "SCAN-DIR-001"})
+    assert response.status_code == 200
+    assert response.json()["event_type"] == "checkin"
+    assert employee_directory.get_by_id(employee.id) is not None
+
+    hits_before = employee_directory.hits
+    # Second scan is served from the directory (and rejected by the cooldown)
+    response = client.post("/api/scan", json={"rfid": "SCAN-DIR-001"})
+    assert response.status_code == 429
+    assert employee_directory.hits > hits_before
+
+
+def test_scan_unknown_rfid(client):
+    response = client.post("/api/scan", json={"rfid": "SCAN-DOES-NOT-EXIST"})
+    assert response.status_code == 404
+
+
+def test_scan_toggles_from_cached_last_event(client, db_session, monkeypatch, employee_factory):
+    monkeypatch.setattr(attendance, "ACTION_COOLDOWN_SECONDS", 0)
+    employee = employee_factory("scan_toggle_user", "SCAN-TOGGLE-001")
+
+    response = client.post("/api/scan", json={"rfid": "SCAN-TOGGLE-001"})
+    assert response.status_code == 200
+    assert response.json()["event_type"] == "checkin"
+    assert last_event_cache.get(employee.id).event_type == "checkin"
+
+    hits_before = last_event_cache.hits
+    response = client.post("/api/scan", json={"rfid": "SCAN-TOGGLE-001"})
+    assert response.status_code == 200
+    assert response.json()["event_type"] == "checkout"
+    assert last_event_cache.hits > hits_before
+    assert last_event_cache.get(employee.id).event_id == response.json()["id"]
+
+
+def test_parallel_scans_record_single_event(db_session, async_session_factory, employee_factory):
+    employee = employee_factory("scan_parallel_user", "SCAN-PARALLEL-001")
+    last_event_cache.invalidate(employee.id)
+
+    async def scan_once():
+        async with async_session_factory() as session:
+            try:
+                return await scan_engine.record_scan(session, employee.id, cooldown_seconds=10)
+            except scan_engine.CooldownActive:
+                return None
+
+    async def fire_parallel_scans():
+        return await asyncio.gather(*(scan_once() for _ in range(8)))
+
+    results = asyncio.run(fire_parallel_scans())
+
+    recorded = [event for event in results if event is not None]
+    assert len(recorded) == 1
+    assert recorded[0].event_type == "checkin"
+    stored = db_session.query(AttendanceEvent).filter(AttendanceEvent.user_id == employee.id).count()
+    assert stored == 1
+
+
+def test_scan_batch_applies_rules_in_timestamp_order(client, db_session, employee_factory):
+    employee = employee_factory("scan_batch_user", "SCAN-BATCH-001")
+    day = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(days=3)
+    morning = day.replace(hour=8, minute=0, second=0)
+
+    # Sent out of order, as a reader flushing its backlog might
+    payload = {"scans": [
+        {"rfid": "SCAN-BATCH-001", "scanned_at": (morning + timedelta(hours=9)).isoformat(), "reader_id": "entrance"},
+        {"rfid": "SCAN-BATCH-001", "scanned_at": morning.isoformat(), "reader_id": "entrance"},
+        {"rfid": "SCAN-BATCH-001", "scanned_at": (morning + timedelta(seconds=3)).isoformat(), "reader_id": "entrance"},
+        {"rfid": "SCAN-BATCH-UNKNOWN", "scanned_at": morning.isoformat()},
+        {"rfid": "  ", "scanned_at": morning.isoformat()},
+    ]}
+    response = client.post("/api/scan/batch", json=payload)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["recorded"] == 2
+
+    results = data["results"]
+    assert [result["index"] for result in results] == [0, 1, 2, 3, 4]
+    assert results[1]["status"] == "recorded" and results[1]["event_type"] == "checkin"
+    assert results[0]["status"] == "recorded" and results[0]["event_type"] == "checkout"
+    assert results[2]["status"] == "cooldown"
+    assert results[3]["status"] == "unknown_rfid"
+    assert results[4]["status"] == "invalid"
+
+    stored = db_session.query(AttendanceEvent).filter(AttendanceEvent.user_id == employee.id).count()
+    assert stored == 2
+
+    # Replaying the same backlog is idempotent thanks to the cooldown
+    response = client.post("/api/scan/batch", json=payload)
+    assert response.json()["recorded"] == 0
+
+
+def test_ingest_queue_group_commits_and_drains_on_stop(db_session, async_session_factory, employee_factory):
+    first = employee_factory("scan_queue_user_1", "SCAN-QUEUE-001")
+    second = employee_factory("scan_queue_user_2", "SCAN-QUEUE-002")
+    now = datetime.now(timezone.utc)
+
+    async def run_queue():
+        queue = ScanIngestQueue(async_session_factory, batch_size=50, max_latency_ms=1000)
+        await queue.start(cooldown_seconds=10)
+        queue.enqueue(schemas.BatchScanItem(rfid="SCAN-QUEUE-001", scanned_at=now))
+        queue.enqueue(schemas.BatchScanItem(rfid="SCAN-QUEUE-002", scanned_at=now))
+        # Duplicate read inside the cooldown, rejected at flush time
+        queue.enqueue(schemas.BatchScanItem(rfid="SCAN-QUEUE-001", scanned_at=now + timedelta(seconds=1)))
+        # Stopping must flush what is still waiting for the latency window
+        await queue.stop()
+        return queue.stats()
+
+    stats = asyncio.run(run_queue())
+
+    assert stats["depth"] == 0
+    assert stats["enqueued"] == 3
+    assert stats["recorded"] == 2
+    assert stats["rejected"] == 1
+    assert stats["batches"] == 1
+    for employee in (first, second):
+        stored = db_session.query(AttendanceEvent).filter(AttendanceEvent.user_id == employee.id).count()
+        assert stored == 1
+
+
+def test_ingest_queue_rejects_when_full(async_session_factory):
+    async def fill_queue():
+        queue = ScanIngestQueue(async_session_factory, max_depth=1)
+        with pytest.raises(QueueFull):
+            queue.enqueue(schemas.BatchScanItem(rfid="SCAN-QUEUE-X", scanned_at=datetime.now(timezone.utc)))
+        await queue.start(cooldown_seconds=10)
+        queue._queue.put_nowait(("placeholder", 0))  # Occupy the only slot without a worker racing us
+        with pytest.raises(QueueFull):
+            queue.enqueue(schemas.BatchScanItem(rfid="SCAN-QUEUE-X", scanned_at=datetime.now(timezone.utc)))
+        queue._queue.get_nowait()
+        await queue.stop()
+
+    asyncio.run(fill_queue())
@@ -0,0 +1,69 @@
+import random
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from app.models import AttendanceEvent
+from app.work_sessions import pair_events
+
+np = pytest.importorskip("numpy")
+from app import vector_sessions  # noqa: E402
+
+# Covers the end of daylight saving time in Europe (last Sunday of October)
+START = datetime(2023, 10, 20, tzinfo=timezone.utc)
+
+
+def random_events(seed, count=3000, users=12):
+    rng = random.Random(seed)
+    events = []
+    clock = {user: START + timedelta(seconds=rng.randrange(86400)) for user in range(1, users + 1)}
+    for event_id in range(1, count + 1):
+        user = rng.randrange(1, users + 1)
+        # Mostly shift-like gaps, sometimes very long ones (forgotten checkouts)
+        gap = rng.choice([rng.randrange(10, 3600), rng.randrange(3600, 12 * 3600), rng.randrange(20 * 3600, 40 * 3600)])
+        clock[user] += timedelta(seconds=gap)
+        event_type = rng.choice(["checkin", "checkout", "checkin", "checkout", "break"])
+        events.append(AttendanceEvent(id=event_id, user_id=user, event_type=event_type, timestamp=clock[user], manual=False))
+    rng.shuffle(events)
+    return events
+
+
+def python_totals(events, tz, max_session_hours):
+    return {
+        user_id: (result.event_count, result.total_days, result.total_seconds)
+        for user_id, result in pair_events(events, max_session_hours=max_session_hours, tz=tz).items()
+    }
+
+
+def numpy_totals(events, tz, max_session_hours):
+    rows = [(event.id, event.user_id, event.event_type, event.timestamp) for event in events]
+    return vector_sessions.compute_totals(
+        *vector_sessions.arrays_from_rows(rows), max_session_hours=max_session_hours, tz=tz
+    )
+
+
+@pytest.mark.parametrize("tz", [ZoneInfo("UTC"), ZoneInfo("Europe/Sofia"), ZoneInfo("America/New_York")])
+@pytest.mark.parametrize("max_session_hours", [24, 0])
+def test_numpy_engine_matches_python_engine(tz, max_session_hours):
+    events = random_events(seed=len(tz.key) + max_session_hours)
+    assert numpy_totals(events, tz, max_session_hours) == python_totals(events, tz, max_session_hours)
+
+
+def test_engines_agree_on_a_shift_across_a_dst_change():
+    sofia = ZoneInfo("Europe/Sofia")  # Clocks go back at 01:00Z on 2025-10-26
+    events = [
+        AttendanceEvent(id=1, user_id=1, event_type="checkin", timestamp=datetime(2025, 10, 25, 19, 0, tzinfo=timezone.utc), manual=False),
+        AttendanceEvent(id=2, user_id=1, event_type="checkout", timestamp=datetime(2025, 10, 26, 4, 0, tzinfo=timezone.utc), manual=False),
+    ]
+    expected = {1: (2, 2, 9 * 3600.0)}  # Elapsed time, as the SQL engine's epoch difference gives
+    assert numpy_totals(events, sofia, 24) == python_totals(events, sofia, 24) == expected
+
+
+def test_utc_offsets_locate_transitions():
+    sofia = ZoneInfo("Europe/Sofia")
+    # 29 October 2023, 01:00 UTC: EEST (+3) -> EET (+2)
+    transition = vector_sessions.to_epoch_us(datetime(2023, 10, 29, 1, 0, tzinfo=timezone.utc))
+    times = np.array([transition - 1, transition, transition + 1], dtype=np.int64)
+    hour = 3600 * 1_000_000
+    assert vector_sessions.utc_offsets(times, sofia).tolist() == [3 * hour, 2 * hour, 2 * hour]
@@ -0,0 +1,102 @@
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from app.models import AttendanceEvent
+from app.work_sessions import SessionBuilder, pair_events, split_by_day
+
+DAY = datetime(2024, 3, 4, tzinfo=timezone.utc)
+
+
+def event(event_id, event_type, timestamp, user_id=1):
+    return AttendanceEvent(id=event_id, user_id=user_id, event_type=event_type, timestamp=timestamp, manual=False)
+
+
+def test_simple_pairs_and_days():
+    events = [
+        event(1, "checkin", DAY + timedelta(hours=8)),
+        event(2, "checkout", DAY + timedelta(hours=16)),
+        event(3, "checkin", DAY + timedelta(days=1, hours=9)),
+        event(4, "checkout", DAY + timedelta(days=1, hours=12, minutes=30)),
+    ]
+    result = pair_events(events)[1]
+
+    assert len(result.sessions) == 2
+    assert result.total_days == 2
+    assert result.total_hours == 11.5
+    assert result.unmatched_checkins == 0 and result.unmatched_checkouts == 0
+
+
+def test_checkins_never_share_a_checkout():
+    # The old nested loop paired both checkins with the same checkout (8h + 2h)
+    events = [
+        event(1, "checkin", DAY + timedelta(hours=8)),
+        event(2, "checkin", DAY + timedelta(hours=14)),
+        event(3, "checkout", DAY + timedelta(hours=16)),
+    ]
+    result = pair_events(events)[1]
+
+    assert [s.duration_seconds for s in result.sessions] == [2 * 3600]
+    assert result.unmatched_checkins == 1
+
+
+def test_unordered_input_and_unmatched_events():
+    events = [
+        event(3, "checkout", DAY + timedelta(hours=17)),
+        event(1, "checkout", DAY + timedelta(hours=7)),  # no open session
+        event(2, "checkin", DAY + timedelta(hours=9)),
+        event(4, "checkin", DAY + timedelta(hours=20)),  # never closed
+    ]
+    result = pair_events(events)[1]
+
+    assert result.total_hours == 8
+    assert result.unmatched_checkouts == 1
+    assert result.unmatched_checkins == 1
+    assert result.event_count == 4
+
+
+def test_shift_crossing_midnight_is_split_per_day():
+    events = [
+        event(1, "checkin", DAY + timedelta(hours=22)),
+        event(2, "checkout", DAY + timedelta(days=1, hours=6)),
+    ]
+    result = pair_events(events)[1]
+
+    assert result.total_hours == 8
+    assert result.daily_seconds == {date(2024, 3, 4): 2 * 3600, date(2024, 3, 5): 6 * 3600}
+    assert result.total_days == 2
+
+
+def test_forgotten_checkout_over_max_session_length():
+    events = [
+        event(1, "checkin", DAY + timedelta(hours=8)),
+        event(2, "checkout", DAY + timedelta(days=2, hours=17)),
+    ]
+    result = pair_events(events, max_session_hours=24)[1]
+
+    assert result.sessions == []
+    assert result.unmatched_checkins == 1 and result.unmatched_checkouts == 1
+
+
+def test_split_by_day_uses_local_timezone():
+    sofia = ZoneInfo("Europe/Sofia")  # UTC+2 in March
+    start = DAY + timedelta(hours=21)  # 23:00 local
+    pieces = split_by_day(start, start + timedelta(hours=2), sofia)
+    assert pieces == [(date(2024, 3, 4), 3600.0), (date(2024, 3, 5), 3600.0)]
+
+
+def test_days_add_up_to_elapsed_time_across_a_dst_change():
+    sofia = ZoneInfo("Europe/Sofia")  # Clocks go back from UTC+3 to UTC+2 at 01:00Z on 2025-10-26
+    start = datetime(2025, 10, 25, 19, 0, tzinfo=timezone.utc)  # 22:00 local
+    end = datetime(2025, 10, 26, 4, 0, tzinfo=timezone.utc)  # 06:00 local
+    assert split_by_day(start, end, sofia) == [(date(2025, 10, 25), 2 * 3600.0), (date(2025, 10, 26), 7 * 3600.0)]
+
+    result = pair_events([event(1, "checkin", start), event(2, "checkout", end)], tz=sofia)[1]
+    assert result.total_seconds == result.sessions[0].duration_seconds == 9 * 3600
+
+
+def test_session_builder_accepts_naive_timestamps():
+    builder = SessionBuilder(user_id=5)
+    builder.feed("checkin", datetime(2024, 3, 4, 8, 0))
+    session = builder.feed("checkout", datetime(2024, 3, 4, 12, 0))
+    assert session.duration_seconds == 4 * 3600
+    assert builder.finish().total_days == 1